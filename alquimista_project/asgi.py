@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alquimista_project.settings')
 
 application = get_asgi_application()
+
+# 103 Early Hints con los recursos críticos si el servidor los admite (p. ej. Hypercorn)
+from core.early_hints import EarlyHintsASGIMiddleware  # noqa: E402  (necesita Django configurado)
+
+application = EarlyHintsASGIMiddleware(application)
@@ -102,11 +102,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.timing.ServerTimingMiddleware',  # Primero: mide el stack completo
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.early_hints.EarlyHintsMiddleware',  # Link: rel=preload de las vistas con @critical_assets
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',  # Solo actúa con un token de perfilado de staff
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -115,7 +118,8 @@ ROOT_URLCONF = 'alquimista_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates con medición de tiempos y minificación opcional (HTML_MINIFY)
+        'BACKEND': 'core.minify.MinifyingDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -208,6 +212,22 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media direccionada por contenido: archivos idénticos se guardan una sola vez
+# (cas/<h[:2]>/<sha256><ext>) y sus URLs son inmutables. Ver core/storage.py.
+# Desactivada por defecto: cambia los nombres de los archivos (activar y luego dedupe_media)
+MEDIA_CONTENT_ADDRESSED = os.getenv('MEDIA_CONTENT_ADDRESSED', 'False') == 'True'
+# Destino de `manage.py gc_media --quarantine` (fuera de MEDIA_ROOT)
+MEDIA_QUARANTINE_ROOT = Path(os.getenv('MEDIA_QUARANTINE_ROOT', BASE_DIR / 'media_quarantine'))
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.storage.ContentAddressedStorage' if MEDIA_CONTENT_ADDRESSED
+        else 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -221,6 +241,24 @@ CACHES = {
     }
 }
 
+# Fragmentos HTML de cada faceta (portada y /faceta/<slug>/). Se invalidan por
+# versión al guardar la faceta, sus hitos o sus imágenes; el timeout es solo una
+# red de seguridad (al caducar se recalcula sin estampida, ver core/caching.py)
+FACET_CACHE_TIMEOUT = int(os.getenv('FACET_CACHE_TIMEOUT', '86400'))  # segundos
+
+# Caché local de cada proceso delante de CACHES para claves muy leídas (configuración
+# del sitio, catálogos). Una entrada se usa sin consultar CACHES durante
+# LOCAL_CACHE_TTL segundos: es lo que puede tardar un worker en ver un cambio de otro
+LOCAL_CACHE_MAXSIZE = int(os.getenv('LOCAL_CACHE_MAXSIZE', '256'))
+LOCAL_CACHE_TTL = float(os.getenv('LOCAL_CACHE_TTL', '5'))
+
+# Minificar el HTML de las plantillas al renderizarlas (antes de guardarlo en caché)
+HTML_MINIFY = os.getenv('HTML_MINIFY', 'False') == 'True'
+
+# Páginas públicas anónimas guardadas ya comprimidas (gzip y Brotli si está instalado).
+# Se invalidan por versión; el timeout acota lo que ocupan las que ya nadie pide
+COMPRESSED_PAGE_CACHE_TIMEOUT = int(os.getenv('COMPRESSED_PAGE_CACHE_TIMEOUT', '3600'))  # segundos
+
 # Email Configuration
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
@@ -240,4 +278,48 @@ if EMAIL_BACKEND == 'django.core.mail.backends.smtp.EmailBackend':
 else:
     logger.warning(f"Email usando backend: {EMAIL_BACKEND}")
 
+# Tiempos por petición: cabecera Server-Timing y una línea JSON por petición
+# en el logger 'core.timing' (escrita desde un hilo aparte mediante una cola)
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'True') == 'True'
+# La cabecera solo se envía al staff; con True, a cualquier visitante (solo en desarrollo)
+SERVER_TIMING_PUBLIC = os.getenv('SERVER_TIMING_PUBLIC', 'False') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_line': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'request_timing': {
+            '()': 'core.timing.QueueStreamHandler',
+            'formatter': 'json_line',
+        },
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['request_timing'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Perfilado bajo demanda (panel de staff > Perfiles)
+PROFILING_ROOT = Path(os.getenv('PROFILING_ROOT', BASE_DIR / 'profiles'))
+PROFILING_TOKEN_MAX_AGE = int(os.getenv('PROFILING_TOKEN_MAX_AGE', '3600'))  # segundos
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', '50'))
+
+# Transcodificación de videos subidos (MP4/WebM comprimidos + póster JPEG/WebP)
+# 'auto' usa ffmpeg si está instalado; 'fake' es un doble para desarrollo/tests; 'none' lo desactiva
+VIDEO_TRANSCODER = os.getenv('VIDEO_TRANSCODER', 'auto')
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+VIDEO_TRANSCODE_WORKERS = int(os.getenv('VIDEO_TRANSCODE_WORKERS', '1'))
+VIDEO_MAX_WIDTH = int(os.getenv('VIDEO_MAX_WIDTH', '1280'))
+
+# Normalización de imágenes subidas (orientación EXIF, sin metadatos, lado mayor acotado)
+IMAGE_MAX_EDGE = int(os.getenv('IMAGE_MAX_EDGE', '2400'))  # píxeles
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '82'))  # JPEG/WebP
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', '40000000'))  # rechaza bombas de descompresión
+
 # Note: Error handlers are defined in urls.py, not in settings.py
@@ -0,0 +1,256 @@
+"""
+Utilidades de caché compartidas.
+
+Cada espacio de nombres (``'material'``, ...) tiene un número de versión en la
+caché de Django. Las claves derivadas incluyen esa versión, así que invalidar
+todo lo de un espacio es tan barato como ``bump_version(namespace)``: las
+entradas antiguas dejan de leerse y caducan solas.
+
+``get_or_set`` protege los cálculos caros frente a estampidas (muchas peticiones
+que fallan la caché a la vez tras una edición):
+
+- *single-flight*: un lock en la propia caché (``cache.add``) garantiza que solo
+  un proceso recalcula cada clave;
+- *stale-while-revalidate*: la entrada guarda la versión con la que se calculó,
+  así que mientras uno recalcula el resto sigue sirviendo el valor anterior;
+- expiración temprana probabilística opcional (``early_beta``, "XFetch"): cerca
+  de caducar, alguna petición recalcula antes de tiempo, con más probabilidad
+  cuanto más caro fue el cálculo.
+
+``local_get_or_set`` antepone a todo lo anterior una LRU en memoria del proceso
+(``local_cache``) para claves que se leen varias veces por petición: durante
+``LOCAL_CACHE_TTL`` segundos se sirven sin salir del proceso; después se
+comprueba la versión de su espacio en la caché compartida y solo se recalculan
+si otro worker la incrementó.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .timing import count
+
+LOCK_KEY = 'lock:{}'
+LOCK_TIMEOUT = 30  # segundos: si quien recalcula muere, otro puede intentarlo
+WAIT_TIMEOUT = 5.0  # segundos que se espera a otro proceso cuando no hay valor viejo
+POLL_INTERVAL = 0.05
+# Tiempo extra que una entrada caducada se conserva para servirla mientras se recalcula
+STALE_TTL = 60 * 60
+
+VERSION_KEY = 'version:{}'
+
+
+def get_version(namespace):
+    """Versión actual de ``namespace`` (se inicializa con la hora si no existe)."""
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        # add() no pisa la versión si otro proceso la creó a la vez
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(namespaces):
+    """``{namespace: versión}`` con una sola lectura de la caché para los existentes."""
+    keys = {VERSION_KEY.format(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for namespace in namespaces:
+        if namespace not in versions:
+            versions[namespace] = get_version(namespace)
+    return versions
+
+
+def bump_version(namespace):
+    """Invalida todas las claves de ``namespace``."""
+    key = VERSION_KEY.format(namespace)
+    # Los demás procesos lo notan al revalidar su copia local (LOCAL_CACHE_TTL)
+    local_cache.invalidate(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # La clave no existía (caché recién arrancada): cualquier valor nuevo sirve
+        version = int(time.time() * 1000)
+        cache.set(key, version, None)
+        return version
+
+
+def versioned_key(namespace, *parts):
+    return ':'.join([namespace, str(get_version(namespace)), *map(str, parts)])
+
+
+# ==================== SINGLE-FLIGHT / STALE-WHILE-REVALIDATE ====================
+
+def is_fresh(entry, version=None, early_beta=None):
+    """
+    True si ``entry`` (``(versión, valor, caduca, duración)``) sirve tal cual.
+    Con ``early_beta`` puede dar False un poco antes de caducar (XFetch).
+    """
+    if entry is None or entry[0] != version:
+        return False
+    expires_at, delta = entry[2], entry[3]
+    if expires_at is None:
+        return True
+    now = time.time()
+    if early_beta:
+        now -= delta * early_beta * math.log(1.0 - random.random())
+    return now < expires_at
+
+
+def store(key, value, timeout=None, version=None, delta=0.0):
+    """Guarda ``value`` como entrada de ``get_or_set`` (``timeout`` None = hasta cambiar de versión)."""
+    expires_at = None if timeout is None else time.time() + timeout
+    cache.set(key, (version, value, expires_at, delta), None if timeout is None else timeout + STALE_TTL)
+
+
+def acquire_lock(key, lock_timeout=LOCK_TIMEOUT):
+    return cache.add(LOCK_KEY.format(key), 1, lock_timeout)
+
+
+def release_lock(key):
+    cache.delete(LOCK_KEY.format(key))
+
+
+def wait_for(key, version=None, wait=WAIT_TIMEOUT):
+    """Espera a que otro proceso guarde ``key`` con ``version``; None si no llega a tiempo."""
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry
+        if cache.get(LOCK_KEY.format(key)) is None:
+            break  # quien recalculaba terminó (o falló) sin dejar valor
+    return None
+
+
+def compute_and_store(key, compute, timeout=None, version=None):
+    started = time.perf_counter()
+    value = compute()
+    store(key, value, timeout, version, time.perf_counter() - started)
+    return value
+
+
+def get_or_set(key, compute, timeout=None, version=None, early_beta=None,
+               lock_timeout=LOCK_TIMEOUT, wait=WAIT_TIMEOUT):
+    """
+    Valor de ``key``; si no está o es de otra ``version`` (o caducó), lo recalcula
+    con ``compute()`` un único proceso a la vez. Los demás reciben el valor
+    anterior si existe, o esperan hasta ``wait`` segundos a que esté listo.
+    """
+    entry = cache.get(key)
+    if is_fresh(entry, version, early_beta):
+        return entry[1]
+    if acquire_lock(key, lock_timeout):
+        try:
+            return compute_and_store(key, compute, timeout, version)
+        finally:
+            release_lock(key)
+    if entry is not None:
+        return entry[1]
+    entry = wait_for(key, version, wait)
+    if entry is not None:
+        return entry[1]
+    # Quien tenía el lock tarda demasiado o falló: mejor calcular que no responder
+    return compute()
+
+
+# ==================== CACHÉ LOCAL (DOS NIVELES) ====================
+
+class LocalCache:
+    """
+    LRU en memoria del proceso, limitada en número de entradas (``maxsize``) y
+    en el tiempo que una entrada se usa sin revalidar su versión (``ttl``).
+    Es segura entre hilos; los valores se comparten, no se copian.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self.maxsize = maxsize if maxsize is not None else getattr(settings, 'LOCAL_CACHE_MAXSIZE', 256)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'LOCAL_CACHE_TTL', 5)
+        self._entries = OrderedDict()  # clave -> [namespace, versión, valor, revisada]
+        self._lock = threading.Lock()
+        self.hits = self.revalidations = self.misses = self.evictions = 0
+
+    def get(self, namespace, key):
+        """``(versión, valor, revisada)`` de ``key`` o None; la marca como usada."""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            self._entries.move_to_end((namespace, key))
+            return entry[1], entry[2], entry[3]
+
+    def set(self, namespace, key, version, value):
+        with self._lock:
+            self._entries[(namespace, key)] = [namespace, version, value, time.monotonic()]
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def touch(self, namespace, key):
+        """La versión sigue vigente: otro ``ttl`` sin consultar la caché compartida."""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None:
+                entry[3] = time.monotonic()
+
+    def invalidate(self, namespace):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.revalidations = self.misses = self.evictions = 0
+
+    def record(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+        count(f'local_{outcome}')
+
+    def stats(self):
+        """Contadores acumulados del proceso."""
+        with self._lock:
+            lookups = self.hits + self.revalidations + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'revalidations': self.revalidations,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.revalidations) / lookups if lookups else None,
+            }
+
+
+local_cache = LocalCache()
+
+
+def local_get_or_set(namespace, key, compute, timeout=None):
+    """
+    Valor de ``key`` en el espacio ``namespace`` pasando por los dos niveles:
+    la LRU del proceso y, si falla, ``get_or_set`` en la caché compartida
+    (bajo la versión de ``namespace``). El valor devuelto es compartido: quien
+    lo vaya a modificar debe copiarlo.
+    """
+    entry = local_cache.get(namespace, key)
+    if entry is not None and time.monotonic() - entry[2] < local_cache.ttl:
+        local_cache.record('hits')
+        return entry[1]
+    version = get_version(namespace)
+    if entry is not None and entry[0] == version:
+        local_cache.touch(namespace, key)
+        local_cache.record('revalidations')
+        return entry[1]
+    local_cache.record('misses')
+    value = get_or_set(f'{namespace}:{key}', compute, timeout, version=version)
+    local_cache.set(namespace, key, version, value)
+    return value
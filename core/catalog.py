@@ -0,0 +1,65 @@
+"""
+Catálogo de facetas activas compartido por formularios, vistas y sitemap.
+
+Registro, gestión de facetas, el menú de ``/faceta/<slug>/`` y el sitemap solo
+necesitan unos pocos campos de cada faceta activa. ``get_catalog`` los devuelve
+en un objeto inmutable que pasa por la caché local del proceso
+(``core.caching.local_get_or_set``), de modo que esas páginas no consultan la
+tabla de facetas. ``core.signals`` incrementa la versión del espacio
+``'facet_catalog'`` al guardar o borrar facetas y hitos (la fecha de
+actualización incluye la de sus hitos).
+"""
+from collections import namedtuple
+
+from django.db.models import Max
+
+from .caching import get_version, local_get_or_set
+from .models import Facet
+
+NAMESPACE = 'facet_catalog'
+
+FacetEntry = namedtuple('FacetEntry', ['id', 'titulo', 'slug', 'orden', 'color_fondo', 'descripcion', 'actualizado'])
+
+
+class FacetCatalog:
+    """Facetas activas (``FacetEntry``) en orden de página, con la versión con que se construyó."""
+
+    __slots__ = ('version', 'facets', '_by_id')
+
+    def __init__(self, version, facets):
+        self.version = version
+        self.facets = tuple(facets)
+        self._by_id = {facet.id: facet for facet in self.facets}
+
+    def __reduce__(self):
+        return FacetCatalog, (self.version, self.facets)
+
+    def __iter__(self):
+        return iter(self.facets)
+
+    def __len__(self):
+        return len(self.facets)
+
+    def __contains__(self, facet_id):
+        return facet_id in self._by_id
+
+    def get(self, facet_id):
+        return self._by_id.get(facet_id)
+
+
+def build_catalog():
+    rows = (
+        Facet.objects.filter(activo=True)
+        .annotate(hitos_actualizacion=Max('hitos__fecha_actualizacion'))
+        .order_by('orden')
+        .values_list('id', 'titulo', 'slug', 'orden', 'color_fondo', 'descripcion',
+                     'fecha_actualizacion', 'hitos_actualizacion')
+    )
+    return FacetCatalog(get_version(NAMESPACE), [
+        FacetEntry(*row[:6], actualizado=max(filter(None, row[6:]))) for row in rows
+    ])
+
+
+def get_catalog():
+    """Catálogo actual; compartido entre peticiones, no debe modificarse."""
+    return local_get_or_set(NAMESPACE, 'active', build_catalog)
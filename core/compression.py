@@ -0,0 +1,172 @@
+"""
+Caché de páginas públicas ya comprimidas.
+
+``compressed_page`` guarda la respuesta que reciben los visitantes anónimos
+junto con sus versiones gzip y Brotli (si el paquete ``brotli`` está
+instalado), comprimidas una sola vez al máximo nivel. Cada petición recibe la
+variante que admite su ``Accept-Encoding`` (con ``Vary: Accept-Encoding``) sin
+comprimir nada en el momento.
+
+La entrada se recalcula cuando cambian las versiones de caché de las que
+depende la página (``versions(request)``) usando ``core.caching.get_or_set``,
+así que tras una edición solo una petición vuelve a renderizarla. No se guardan
+respuestas que usan el token CSRF, mensajes flash o cookies propias.
+
+La clave sale del host, la ruta y solo los parámetros de ``query_params``: una
+petición con cualquier otro parámetro se sirve sin caché ni compresión, para
+que ``/?x=1``, ``/?x=2``... no llenen la caché ni gasten CPU comprimiendo.
+"""
+import gzip
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from .caching import get_or_set
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Brotli es opcional: sin él solo se sirve gzip
+
+CACHE_KEY = 'compressed_page:{}'
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# Por debajo de este tamaño la compresión no compensa
+MIN_SIZE = 256
+# Orden de preferencia cuando el cliente admite varias
+ENCODINGS = ('br', 'gzip')
+# Cabeceras de la respuesta original que no se guardan (dependen de la variante o de la petición)
+SKIP_HEADERS = {'content-length', 'content-encoding', 'vary', 'etag', 'set-cookie', 'server-timing'}
+
+
+class Uncacheable(Exception):
+    """La respuesta no se puede compartir: se sirve tal cual y no se guarda."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def compress(body):
+    """``{codificación: bytes}`` de las variantes que ocupan menos que ``body``."""
+    if len(body) < MIN_SIZE:
+        return {}
+    variants = {'gzip': gzip.compress(body, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+def accepted_encodings(header):
+    """Codificaciones con ``q`` mayor que cero en ``Accept-Encoding``."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        q = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding.strip() and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def negotiate(request, variants):
+    """Mejor codificación de ``variants`` para la petición, o None (sin comprimir)."""
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoding in ENCODINGS:
+        if encoding in variants and (encoding in accepted or '*' in accepted):
+            return encoding
+    return None
+
+
+def is_storable(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return False  # el HTML lleva el token CSRF de este visitante
+    storage = getattr(request, '_messages', None)
+    if storage is not None and storage.used:
+        return False  # la página mostró mensajes flash de este visitante
+    return 'private' not in response.get('Cache-Control', '') and 'no-store' not in response.get('Cache-Control', '')
+
+
+def build_entry(response):
+    body = response.content
+    return {
+        'status': response.status_code,
+        'headers': [(name, value) for name, value in response.items() if name.lower() not in SKIP_HEADERS],
+        'etag': hashlib.md5(body).hexdigest(),
+        'body': body,
+        'variants': compress(body),
+    }
+
+
+def build_response(request, entry):
+    encoding = negotiate(request, entry['variants'])
+    etag = '"{}{}"'.format(entry['etag'], f'-{encoding}' if encoding else '')
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(entry['variants'][encoding] if encoding else entry['body'], status=entry['status'])
+        for name, value in entry['headers']:
+            response[name] = value
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Content-Length'] = len(response.content)
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def cache_url(request, query_params):
+    """URL que identifica la entrada, o None si la petición lleva parámetros no admitidos."""
+    if any(name not in query_params for name in request.GET):
+        return None
+    query = urlencode(sorted((name, request.GET[name]) for name in request.GET))
+    return f'{request.scheme}://{request.get_host()}{request.path}' + (f'?{query}' if query else '')
+
+
+def compressed_page(versions, timeout=None, query_params=()):
+    """
+    Decorador de vistas públicas. Las peticiones GET/HEAD anónimas se sirven
+    desde la caché comprimida; ``versions(request)`` devuelve las versiones de
+    caché de las que depende el contenido (cualquier cambio la invalida).
+    ``query_params`` son los parámetros que cambian la página (y entran en la clave).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            url = cache_url(request, query_params)
+            if url is None:
+                return view(request, *args, **kwargs)
+            key = CACHE_KEY.format(hashlib.md5(url.encode()).hexdigest())
+
+            def render():
+                # La respuesta se va a guardar: las vistas en streaming la generan completa
+                request._buffer_streaming = True
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render') and not response.is_rendered:
+                    response.render()
+                if not is_storable(request, response):
+                    raise Uncacheable(response)
+                return build_entry(response)
+
+            try:
+                entry = get_or_set(
+                    key, render, timeout or settings.COMPRESSED_PAGE_CACHE_TIMEOUT, version=tuple(versions(request)),
+                )
+            except Uncacheable as uncacheable:
+                return uncacheable.response
+            return build_response(request, entry)
+        return wrapper
+    return decorator
@@ -0,0 +1,96 @@
+"""
+Cabeceras ``Link: rel=preload`` y 103 Early Hints para los recursos críticos.
+
+Una vista declara sus recursos críticos con ``@critical_assets(...)``: URLs
+fijas (``(url, as)``) o funciones que reciben la ``SiteSettings`` en caché y
+devuelven pares ``(url, as)`` (imágenes de la pantalla de carga y del hero).
+
+- ``EarlyHintsMiddleware`` añade la cabecera ``Link`` a la respuesta (WSGI y
+  ASGI), de modo que un proxy o CDN que la entienda puede adelantar la descarga.
+- ``EarlyHintsASGIMiddleware`` envuelve la aplicación ASGI: si el servidor
+  admite la extensión ``http.response.early_hint`` (p. ej. Hypercorn), manda un
+  103 con esos enlaces antes de llamar a Django, mientras la vista aún genera el
+  HTML.
+"""
+from asgiref.sync import sync_to_async
+from django.urls import Resolver404, resolve
+
+from .models import SiteSettings
+
+EARLY_HINT = 'http.response.early_hint'
+
+
+def critical_assets(*assets):
+    """Decorador: recursos a precargar para la vista."""
+    def decorator(view):
+        view.critical_assets = assets
+        return view
+    return decorator
+
+
+def loading_image(site_settings):
+    """Imagen de la pantalla de carga (o el logo si no hay)."""
+    image = site_settings.imagen_loading or site_settings.logo
+    return [(image.url, 'image')] if image else []
+
+
+def hero_image(site_settings):
+    return [(site_settings.imagen_hero.url, 'image')] if site_settings.imagen_hero else []
+
+
+def get_links(view, site_settings):
+    """Valores ``Link`` de los recursos críticos de ``view`` (lista vacía si no declara)."""
+    links = []
+    for asset in getattr(view, 'critical_assets', ()):
+        for url, kind in (asset(site_settings) if callable(asset) else [asset]):
+            links.append(f'<{url}>; rel=preload; as={kind}')
+    return list(dict.fromkeys(links))
+
+
+class EarlyHintsMiddleware:
+    """Añade ``Link: rel=preload`` a las respuestas de vistas con ``@critical_assets``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        links = getattr(request, '_critical_links', None)
+        if links and response.status_code == 200:
+            existing = response.get('Link')
+            response['Link'] = ', '.join([existing, *links] if existing else links)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'critical_assets', None) and request.method in ('GET', 'HEAD'):
+            request._critical_links = get_links(view_func, SiteSettings.load())
+
+
+class EarlyHintsASGIMiddleware:
+    """Envoltorio ASGI que manda un 103 Early Hints con los enlaces de la vista."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD')
+                and EARLY_HINT in scope.get('extensions', {})):
+            links = await self.links_for(scope)
+            if links:
+                await send({'type': EARLY_HINT, 'links': [link.encode('latin-1') for link in links]})
+        await self.app(scope, receive, send)
+
+    async def links_for(self, scope):
+        path = scope['path']
+        root_path = scope.get('root_path', '')
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        try:
+            view = resolve(path).func
+        except Resolver404:
+            return []
+        if not getattr(view, 'critical_assets', None):
+            return []
+        # SiteSettings.load pasa por la caché local: normalmente no toca la base de datos
+        site_settings = await sync_to_async(SiteSettings.load)()
+        return get_links(view, site_settings)
@@ -0,0 +1,55 @@
+"""
+Análisis de URLs de video externo (YouTube, Vimeo).
+
+Las expresiones se compilan una sola vez al importar el módulo. Los modelos
+guardan el resultado en columnas propias al hacer ``save()``, de modo que las
+plantillas leen atributos planos en lugar de volver a analizar la URL en cada
+render. La migración de datos que rellenó las filas existentes lleva su propia
+copia congelada de este análisis.
+"""
+import re
+
+YOUTUBE = 'youtube'
+VIMEO = 'vimeo'
+
+PROVIDER_CHOICES = [
+    (YOUTUBE, 'YouTube'),
+    (VIMEO, 'Vimeo'),
+]
+
+_YOUTUBE_PATTERNS = (
+    re.compile(r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([a-zA-Z0-9_-]{11})'),
+    re.compile(r'youtube\.com\/embed\/([a-zA-Z0-9_-]{11})'),
+)
+_VIMEO_PATTERN = re.compile(r'vimeo\.com\/(?:.*\/)?(\d+)')
+
+EMBED_URLS = {
+    YOUTUBE: 'https://www.youtube.com/embed/{}',
+    VIMEO: 'https://player.vimeo.com/video/{}',
+}
+
+
+def parse_video_url(url):
+    """Devuelve ``(proveedor, id)`` o ``('', '')`` si la URL no es de un proveedor conocido."""
+    if not url:
+        return '', ''
+    if 'youtube.com' in url or 'youtu.be' in url:
+        for pattern in _YOUTUBE_PATTERNS:
+            match = pattern.search(url)
+            if match:
+                return YOUTUBE, match.group(1)
+    elif 'vimeo.com' in url:
+        match = _VIMEO_PATTERN.search(url)
+        if match:
+            return VIMEO, match.group(1)
+    return '', ''
+
+
+def video_embed_fields(url):
+    """Valores de ``video_provider``, ``video_id`` y ``video_embed_url`` para una URL."""
+    provider, video_id = parse_video_url(url)
+    return {
+        'video_provider': provider,
+        'video_id': video_id,
+        'video_embed_url': EMBED_URLS[provider].format(video_id) if provider else '',
+    }
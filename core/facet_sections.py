@@ -0,0 +1,98 @@
+"""
+HTML en caché de las diapositivas de cada faceta (``includes/facet_section.html``).
+
+El bloque de una faceta es idéntico para todos los usuarios; lo personal (menú,
+cuenta, mensajes) queda fuera, en la plantilla de la página. Cada faceta tiene
+su versión en el espacio ``facet:<pk>`` que ``core.signals`` incrementa al
+guardar o borrar la faceta, sus hitos o sus imágenes.
+
+``iter_facet_sections`` resuelve todas las facetas de la página con un único
+``get_many`` y solo consulta hitos e imágenes de las que no estaban en caché,
+una faceta cada vez (la portada lo envía en streaming, ``core.streaming``).
+Tras una edición, solo una petición vuelve a renderizar la faceta (lock en
+``core.caching``); las demás siguen sirviendo el HTML anterior mientras tanto.
+
+La entrada es una por faceta, esté donde esté en la página: el HTML se guarda
+con ``POSITION_SLOT`` en lugar del índice y ``iter_facet_sections`` lo sustituye
+al servirlo.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .caching import acquire_lock, get_versions, is_fresh, release_lock, store, wait_for
+from .models import Milestone, MilestoneImage
+
+SECTION_TEMPLATE = 'core/includes/facet_section.html'
+
+# Hueco para la posición en el HTML cacheado; el contenido escapado nunca contiene "<"
+POSITION_SLOT = mark_safe('<facet-position>')
+
+
+def facet_namespace(facet_id):
+    return f'facet:{facet_id}'
+
+
+def active_milestones_prefetch():
+    return Prefetch(
+        'hitos',
+        queryset=Milestone.objects.filter(activo=True).order_by('orden', 'año').prefetch_related(
+            Prefetch('imagenes', queryset=MilestoneImage.objects.filter(activo=True).order_by('orden'))
+        ),
+        to_attr='hitos_activos',
+    )
+
+
+def iter_facet_sections(facets):
+    """
+    Genera el HTML de cada faceta de ``facets`` en orden de página. Las que no
+    están en caché se renderizan (consultando sus hitos) al llegarles el turno,
+    de modo que las anteriores ya pueden enviarse en streaming.
+    """
+    facets = list(facets)
+    versions = get_versions([facet_namespace(facet.pk) for facet in facets])
+    # La versión va dentro de la entrada (no en la clave) para poder servir la anterior
+    keys = [section_key(facet.pk) for facet in facets]
+    entries = cache.get_many(keys)
+
+    for position, (facet, key) in enumerate(zip(facets, keys)):
+        version = versions[facet_namespace(facet.pk)]
+        entry = entries.get(key)
+        if is_fresh(entry, version):
+            html = entry[1]
+        elif acquire_lock(key):
+            try:
+                html = _render_section(facet, key, version)
+            finally:
+                release_lock(key)
+        elif entry is not None:
+            html = entry[1]  # otra petición la está renderizando: se sirve la anterior
+        else:
+            entry = wait_for(key, version)
+            html = entry[1] if entry is not None else _render_section(facet, key, version)
+        yield html.replace(POSITION_SLOT, str(position))
+
+
+def section_key(facet_id):
+    return f'facet_section:{facet_id}'
+
+
+def _render_section(facet, key, version):
+    prefetch_related_objects([facet], active_milestones_prefetch())
+    facet.total_slides = 1 + len(facet.hitos_activos)
+    html = render_to_string(SECTION_TEMPLATE, {'facet': facet, 'position': POSITION_SLOT})
+    store(key, html, settings.FACET_CACHE_TIMEOUT, version)
+    return html
+
+
+def render_facet_sections(facets):
+    """
+    Asigna ``facet.section_html`` a cada faceta de ``facets`` (en orden de página)
+    y devuelve la lista.
+    """
+    facets = list(facets)
+    for facet, html in zip(facets, iter_facet_sections(facets)):
+        facet.section_html = mark_safe(html)
+    return facets
@@ -1,7 +1,8 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Facet, UserFacetPreference
+from .catalog import get_catalog
+from .models import UserFacetPreference
 
 
 class CustomUserCreationForm(UserCreationForm):
@@ -103,8 +104,8 @@ class CustomUserCreationForm(UserCreationForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Obtener facetas activas para el formulario
-        self.facets = Facet.objects.filter(activo=True).order_by('orden')
+        # Facetas activas para el formulario
+        self.facets = get_catalog()
         
     def save(self, commit=True):
         from .models import UserProfile
@@ -127,7 +128,7 @@ class FacetSelectionForm(forms.Form):
     """Formulario para seleccionar facetas durante el registro."""
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        facets = Facet.objects.filter(activo=True).order_by('orden')
+        facets = get_catalog()
         self.facets = facets  # Hacer las facetas accesibles en el template
         for facet in facets:
             self.fields[f'facet_{facet.id}'] = forms.BooleanField(
@@ -173,7 +174,7 @@ class FacetManagementForm(forms.Form):
     def __init__(self, user, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = user
-        facets = Facet.objects.filter(activo=True).order_by('orden')
+        facets = get_catalog()
         user_preferences = {
             pref.faceta_id: pref.prioridad 
             for pref in UserFacetPreference.objects.filter(usuario=user)
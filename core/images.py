@@ -0,0 +1,171 @@
+"""
+Normalización de imágenes en el momento de la subida.
+
+Las fotos que sube el staff suelen venir directamente del móvil (12 MP, EXIF
+con GPS, orientación en metadatos). ``validate_image`` es el validador de los
+campos de imagen (lo ejecutan los formularios, el admin y las vistas del staff
+antes de crear filas): rechaza archivos que no son imágenes y bombas de
+descompresión (más de ``IMAGE_MAX_PIXELS`` píxeles). ``process_image_field`` se
+llama desde el ``save()`` de los modelos y, solo para archivos recién subidos,
+se limita a normalizar:
+
+- aplica la orientación EXIF a los píxeles,
+- limita el lado mayor a ``IMAGE_MAX_EDGE``,
+- vuelve a codificar con calidad ``IMAGE_QUALITY`` sin EXIF/XMP (se conserva
+  el perfil ICC para no alterar los colores).
+
+Los GIF/WebP animados solo pasan por la comprobación de tamaño.
+
+En la misma pasada se calculan ancho, alto y un placeholder diminuto (WebP de
+``PLACEHOLDER_EDGE`` px en base64) que se guardan en ``<campo>_ancho``,
+``<campo>_alto`` y ``<campo>_placeholder`` para que las plantillas reserven el
+espacio y muestren una vista previa borrosa mientras carga la imagen real.
+"""
+import base64
+import io
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Campos normalizados al subir (y por ``manage.py normalize_images`` para lo ya existente)
+IMAGE_FIELDS = (
+    ('core.Facet', 'imagen_hero'),
+    ('core.Milestone', 'imagen'),
+    ('core.MilestoneImage', 'imagen'),
+)
+
+# Formato de salida según el formato de entrada; el resto se convierte a JPEG (o PNG si hay transparencia)
+OUTPUT_FORMATS = {'JPEG': 'JPEG', 'PNG': 'PNG', 'WEBP': 'WEBP'}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+PLACEHOLDER_EDGE = 16
+PLACEHOLDER_QUALITY = 40
+
+
+def get_limits():
+    return (
+        getattr(settings, 'IMAGE_MAX_EDGE', 2400),
+        getattr(settings, 'IMAGE_QUALITY', 82),
+        getattr(settings, 'IMAGE_MAX_PIXELS', 40_000_000),
+    )
+
+
+def validate_image(value):
+    """Validador de campo: el archivo subido es una imagen con un número de píxeles razonable."""
+    if getattr(value, '_committed', False):
+        return  # ya estaba guardada: no se vuelve a leer del storage
+    max_pixels = get_limits()[2]
+    value.seek(0)
+    try:
+        with Image.open(value) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        raise ValidationError('La imagen es demasiado grande para procesarla.')
+    except (OSError, SyntaxError, ValueError):
+        raise ValidationError('El archivo no es una imagen válida.')
+    finally:
+        value.seek(0)
+    if width * height > max_pixels:
+        raise ValidationError(
+            f'La imagen tiene {width}x{height} píxeles; el máximo permitido es {max_pixels:,} píxeles.'
+        )
+
+
+def _open(file):
+    """Abre la imagen leyendo solo la cabecera; None si no se puede normalizar."""
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        return None
+    if image.width * image.height > get_limits()[2]:
+        return None
+    return image
+
+
+def make_placeholder(image):
+    """Data URI con una versión WebP de ``PLACEHOLDER_EDGE`` px de la imagen."""
+    thumb = image.copy()
+    if thumb.mode not in ('RGB', 'RGBA'):
+        thumb = thumb.convert('RGBA' if 'A' in thumb.getbands() or 'transparency' in thumb.info else 'RGB')
+    thumb.thumbnail((PLACEHOLDER_EDGE, PLACEHOLDER_EDGE), Image.BILINEAR)
+    buffer = io.BytesIO()
+    thumb.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def process_image(file, name):
+    """
+    Devuelve ``(contenido, nombre, ancho, alto, placeholder)``. ``contenido`` es
+    None si conviene conservar el original (animaciones, ya optimizada y sin
+    metadatos, o un archivo que no superó ``validate_image``); en ese caso
+    ``nombre`` es el original.
+    """
+    max_edge, quality, _ = get_limits()
+    image = _open(file)
+    if image is None:
+        return None, name, None, None, ''
+    if getattr(image, 'is_animated', False):
+        return None, name, image.width, image.height, make_placeholder(image)
+
+    source_format = image.format
+    has_metadata = bool(image.info.get('exif') or image.info.get('xmp') or image.getexif())
+    icc_profile = image.info.get('icc_profile')
+    try:
+        transposed = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError, ValueError):
+        return None, name, None, None, ''
+    # La orientación vive en el EXIF: si hay que rotar, ``has_metadata`` ya es True
+    changed = has_metadata or max(transposed.size) > max_edge
+    image = transposed
+    if max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    output_format = OUTPUT_FORMATS.get(source_format) or ('PNG' if has_alpha else 'JPEG')
+    if output_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        if image.mode == 'CMYK':
+            icc_profile = None  # el perfil CMYK ya no describe los píxeles convertidos
+        image = image.convert('RGB')
+
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if output_format == 'JPEG':
+        options.update(quality=quality, optimize=True, progressive=True)
+    elif output_format == 'WEBP':
+        options.update(quality=quality, method=6)
+    else:
+        options.update(optimize=True)
+
+    buffer = io.BytesIO()
+    image.save(buffer, output_format, **options)
+    file.seek(0, io.SEEK_END)
+    original_size = file.tell()
+    file.seek(0)
+    placeholder = make_placeholder(image)
+    if not changed and output_format == source_format and buffer.tell() >= original_size:
+        return None, name, image.width, image.height, placeholder
+
+    new_name = str(Path(name).with_suffix(EXTENSIONS[output_format]))
+    return ContentFile(buffer.getvalue(), name=new_name), new_name, image.width, image.height, placeholder
+
+
+def process_image_field(instance, field_name):
+    """
+    Llamado desde ``save()``: normaliza la imagen si se acaba de subir y mantiene
+    ``<campo>_ancho``, ``<campo>_alto`` y ``<campo>_placeholder`` al día.
+    """
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        values = (None, None, '')
+    elif field_file._committed:
+        return
+    else:
+        content, name, width, height, placeholder = process_image(field_file.file, field_file.name)
+        if content is not None:
+            field_file.file, field_file.name = content, name
+        values = (width, height, placeholder)
+    for suffix, value in zip(('ancho', 'alto', 'placeholder'), values):
+        setattr(instance, f'{field_name}_{suffix}', value)
@@ -0,0 +1,428 @@
+"""
+Benchmark de extremo a extremo de las rutas críticas públicas y del panel de staff.
+
+Por defecto crea una base de datos de pruebas desechable, la puebla con datos
+sintéticos a varias escalas y mide cada escenario con el cliente de pruebas de
+Django (latencia por percentiles, número de consultas y bytes de la respuesta).
+Con ``--url`` mide en cambio un servidor local ya levantado (solo rutas públicas
+anónimas, sin conteo de consultas).
+
+Ejemplos:
+    python manage.py benchmark
+    python manage.py benchmark --scales 5,20,50 --iterations 30
+    python manage.py benchmark --baseline benchmarks/baseline.json --threshold 0.2
+    python manage.py benchmark --update-baseline
+    python manage.py benchmark --url http://127.0.0.1:8000
+"""
+import json
+import math
+import platform
+import statistics
+import time
+import urllib.request
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core.embeds import video_embed_fields
+from core.minify import minify_html
+from core.models import (
+    ContactMessage, Facet, Material, MaterialPDF, MaterialPresentacion, MaterialVideo,
+    Milestone, MilestoneImage, SiteSettings, Tematica, UserFacetPreference, UserProfile,
+)
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+DEFAULT_OUTPUT = Path(settings.BASE_DIR) / 'benchmarks' / 'results.json'
+
+# Tamaño del dataset por unidad de escala
+HITOS_POR_FACETA = 8
+IMAGENES_POR_HITO = 2
+MATERIALES_POR_TEMATICA = 4
+MENSAJES_POR_ESCALA = 5
+USUARIOS_POR_ESCALA = 2
+YOUTUBE_URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+VIMEO_URL = 'https://vimeo.com/76979871'
+
+
+def _video_fields(url):
+    """bulk_create no llama a save(): se rellenan a mano los campos de inserción."""
+    return {'video_url': url, **video_embed_fields(url)}
+
+
+# (nombre, método, url name, usuario) - usuario: None, 'visitante', 'estudiante' o 'staff'
+SCENARIOS = [
+    ('index_anon', 'get', 'core:index', None),
+    ('index_auth', 'get', 'core:index', 'visitante'),
+    ('material_clase', 'get', 'core:material_clase', 'estudiante'),
+    ('contact_post', 'post', 'core:contact', None),
+    ('register', 'get', 'core:register', None),
+    ('register_post', 'post', 'core:register', None),
+    ('sitemap', 'get', 'core:django.contrib.sitemaps.views.sitemap', None),
+    ('staff_dashboard', 'get', 'core:staff_dashboard', 'staff'),
+    ('staff_facets_list', 'get', 'core:staff_facets_list', 'staff'),
+    ('staff_milestones_list', 'get', 'core:staff_milestones_list', 'staff'),
+    ('staff_messages_list', 'get', 'core:staff_messages_list', 'staff'),
+    ('staff_tematicas_list', 'get', 'core:staff_tematicas_list', 'staff'),
+    ('staff_materiales_list', 'get', 'core:staff_materiales_list', 'staff'),
+    ('staff_users_list', 'get', 'core:staff_users_list', 'staff'),
+]
+
+# Escenarios que se pueden medir contra un servidor externo sin sesión
+URL_SCENARIOS = ('index_anon', 'register', 'sitemap')
+
+BENCH_PASSWORD = 'bench-Passw0rd!'
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano (valores ya ordenados)."""
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarize(timings, queries, sizes, status, template=None, minified_bytes=None):
+    """Resume las muestras de un escenario en un diccionario serializable."""
+    timings = sorted(t * 1000 for t in timings)
+    return {
+        'template': template,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p90_ms': round(percentile(timings, 90), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'min_ms': round(timings[0], 3),
+        'max_ms': round(timings[-1], 3),
+        'queries': max(queries) if queries else None,
+        'bytes': max(sizes) if sizes else 0,
+        'minified_bytes': minified_bytes,
+        'status': status,
+        'samples': len(timings),
+    }
+
+
+def minified_size(headers, body):
+    """Bytes del HTML tras ``minify_html`` (None si la respuesta no es HTML sin comprimir)."""
+    if not headers.get('Content-Type', '').startswith('text/html') or headers.get('Content-Encoding'):
+        return None
+    return len(minify_html(body.decode('utf-8', 'replace')).encode('utf-8'))
+
+
+def consume(response):
+    """Devuelve el cuerpo completo de una respuesta, sea normal o streaming."""
+    if getattr(response, 'streaming', False):
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia, consultas y bytes de las rutas críticas y compara contra una línea base.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='5,20,50',
+                            help='Escalas del dataset separadas por coma (número de facetas/temáticas).')
+        parser.add_argument('--iterations', type=int, default=20, help='Muestras por escenario.')
+        parser.add_argument('--warmup', type=int, default=2, help='Peticiones descartadas antes de medir.')
+        parser.add_argument('--only', default='', help='Limitar a estos escenarios (separados por coma).')
+        parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help='Archivo JSON de resultados.')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Archivo JSON de línea base.')
+        parser.add_argument('--threshold', type=float, default=0.15,
+                            help='Regresión tolerada sobre la línea base (0.15 = 15%%).')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Guardar los resultados como nueva línea base en lugar de comparar.')
+        parser.add_argument('--url', default='',
+                            help='Medir un servidor local ya levantado (ej. http://127.0.0.1:8000).')
+        parser.add_argument('--keepdb', action='store_true', help='Reutilizar la base de datos de pruebas.')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Poblar y medir la base de datos ya configurada sin crear otra (tests).')
+
+    def handle(self, *args, **options):
+        only = {name.strip() for name in options['only'].split(',') if name.strip()}
+        scenarios = [s for s in SCENARIOS if not only or s[0] in only]
+        if not scenarios:
+            raise CommandError('Ningún escenario coincide con --only.')
+
+        if options['url']:
+            results = {'live': self.run_url(options['url'], scenarios, options)}
+            mode = 'url'
+        else:
+            scales = [int(s) for s in options['scales'].split(',') if s.strip()]
+            results = self.run_client(scales, scenarios, options)
+            mode = 'client'
+
+        report = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'mode': mode,
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'results': results,
+        }
+        self.print_table(results)
+
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        self.stdout.write(f'Resultados escritos en {output}')
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Línea base actualizada en {baseline_path}'))
+            return
+
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(
+                f'No existe línea base en {baseline_path}; usa --update-baseline para crearla.'
+            ))
+            return
+
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+        regressions = self.compare(results, baseline.get('results', {}), options['threshold'])
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f'{len(regressions)} regresiones sobre la línea base.')
+        self.stdout.write(self.style.SUCCESS('Sin regresiones respecto a la línea base.'))
+
+    # ==================== MODO CLIENTE DE PRUEBAS ====================
+
+    def run_client(self, scales, scenarios, options):
+        if options['current_db']:
+            # Dentro de un test: el entorno y la base de datos ya son los de pruebas
+            return self.run_scales(scales, scenarios, options)
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb']
+        )
+        try:
+            return self.run_scales(scales, scenarios, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+    def run_scales(self, scales, scenarios, options):
+        results = {}
+        for scale in scales:
+            self.stdout.write(f'Escala {scale}: poblando dataset...')
+            users = self.seed(scale)
+            clients = self.build_clients(users)
+            results[str(scale)] = {}
+            for name, method, url_name, user_key in scenarios:
+                results[str(scale)][name] = self.measure(
+                    name, method, reverse(url_name), clients.get(user_key), options
+                )
+        return results
+
+    def build_clients(self, users):
+        clients = {None: Client()}
+        for key, user in users.items():
+            client = Client()
+            client.force_login(user)
+            clients[key] = client
+        return clients
+
+    def measure(self, name, method, path, client, options):
+        timings, queries, sizes = [], [], []
+        status = None
+        total = options['warmup'] + options['iterations']
+        for i in range(total):
+            request_client, data, extra = self.prepare_request(name, client, i)
+            # El log de consultas es un deque acotado: lleno, el conteo saldría 0
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = getattr(request_client, method)(path, data, **extra)
+                body = consume(response)
+                elapsed = time.perf_counter() - start
+            if i < options['warmup']:
+                continue
+            timings.append(elapsed)
+            queries.append(len(ctx.captured_queries))
+            sizes.append(len(body))
+            status = response.status_code
+        # Plantilla principal y ahorro de la minificación (medido sobre la última respuesta)
+        templates = getattr(response, 'templates', None)
+        template = templates[0].name if templates and body else None
+        return summarize(timings, queries, sizes, status, template, minified_size(response.headers, body))
+
+    def prepare_request(self, name, client, i):
+        """Datos y cabeceras específicas de cada escenario."""
+        if name == 'contact_post':
+            # IP distinta por petición para no tropezar con el rate limiting
+            data = {
+                'nombre': f'Benchmark {i}',
+                'email': f'bench{i}@example.com',
+                'mensaje': 'Mensaje de prueba generado por el benchmark.',
+            }
+            return client, data, {'REMOTE_ADDR': f'10.{i // 65025 % 255}.{i // 255 % 255}.{i % 255}'}
+        if name == 'register_post':
+            stamp = f'{time.time_ns()}{i}'
+            data = {
+                'username': f'bench_{stamp}',
+                'email': f'bench_{stamp}@example.com',
+                'password1': BENCH_PASSWORD,
+                'password2': BENCH_PASSWORD,
+                'rol': 'visitante',
+            }
+            return Client(), data, {}
+        return client, None, {}
+
+    def seed(self, scale):
+        """Borra el contenido y crea un dataset sintético proporcional a la escala."""
+        for model in (UserFacetPreference, Facet, Tematica, ContactMessage, UserProfile):
+            model.objects.all().delete()
+        User.objects.all().delete()
+
+        site_settings = SiteSettings.load()
+        site_settings.nombre_sitio = 'ALQUIMISTA BENCH'
+        site_settings.descripcion_general = 'Dataset sintético de benchmark.'
+        site_settings.logo = 'site/bench-logo.png'
+        site_settings.imagen_hero = 'site/hero/bench-hero.jpg'
+        site_settings.save()
+
+        # Se vuelve a consultar tras cada bulk_create: MySQL no devuelve las PKs
+        Facet.objects.bulk_create([
+            Facet(titulo=f'Faceta {f}', slug=f'faceta-{f}', descripcion='Descripción ' * 20, orden=f,
+                  imagen_hero=f'facetas/hero/faceta-{f}.jpg',
+                  color_fondo='blanco' if f % 2 else 'negro')
+            for f in range(scale)
+        ])
+        facets = list(Facet.objects.order_by('orden'))
+        Milestone.objects.bulk_create([
+            Milestone(faceta=facet, titulo=f'Hito {facet.orden}-{h}', descripcion='Texto del hito. ' * 30,
+                      año=1950 + h, orden=h, imagen=f'hitos/hito-{facet.orden}-{h}.jpg',
+                      **_video_fields(YOUTUBE_URL if h % 4 == 3 else None))
+            for facet in facets for h in range(HITOS_POR_FACETA)
+        ])
+        milestones = list(Milestone.objects.only('pk'))
+        MilestoneImage.objects.bulk_create([
+            MilestoneImage(hito=hito, imagen=f'hitos/imagenes/hito-{hito.pk}-{i}.jpg', orden=i)
+            for hito in milestones for i in range(IMAGENES_POR_HITO)
+        ])
+
+        Tematica.objects.bulk_create([
+            Tematica(titulo=f'Temática {t}', descripcion='Descripción de la temática.', orden=t)
+            for t in range(scale)
+        ])
+        tematicas = list(Tematica.objects.order_by('orden'))
+        Material.objects.bulk_create([
+            Material(tematica=tematica, titulo=f'Material {tematica.orden}-{m}',
+                     descripcion='Descripción del material.', orden=m)
+            for tematica in tematicas for m in range(MATERIALES_POR_TEMATICA)
+        ])
+        materiales = list(Material.objects.only('pk'))
+        MaterialPDF.objects.bulk_create([
+            MaterialPDF(material=material, archivo=f'materiales/pdfs/material-{material.pk}-{i}.pdf',
+                        nombre=f'PDF {i}', orden=i)
+            for material in materiales for i in range(2)
+        ])
+        MaterialVideo.objects.bulk_create([
+            MaterialVideo(material=material, nombre='Video', orden=0, **_video_fields(VIMEO_URL))
+            for material in materiales
+        ])
+        MaterialPresentacion.objects.bulk_create([
+            MaterialPresentacion(material=material, nombre='Presentación', orden=0,
+                                 archivo=f'materiales/presentaciones/material-{material.pk}.pptx')
+            for material in materiales
+        ])
+
+        ContactMessage.objects.bulk_create([
+            ContactMessage(nombre=f'Contacto {i}', email=f'contacto{i}@example.com',
+                           mensaje='Mensaje de contacto de prueba.', leido=bool(i % 3))
+            for i in range(scale * MENSAJES_POR_ESCALA)
+        ])
+        for i in range(scale * USUARIOS_POR_ESCALA):
+            user = User.objects.create(username=f'relleno_{i}', email=f'relleno{i}@example.com')
+            UserProfile.objects.create(usuario=user, rol='estudiante' if i % 2 else 'visitante')
+
+        visitante = User.objects.create_user('bench_visitante', 'visitante@example.com', BENCH_PASSWORD)
+        UserProfile.objects.create(usuario=visitante, rol='visitante')
+        UserFacetPreference.objects.bulk_create([
+            UserFacetPreference(usuario=visitante, faceta=facet, prioridad=scale - facet.orden)
+            for facet in facets[::2]
+        ])
+        estudiante = User.objects.create_user('bench_estudiante', 'estudiante@example.com', BENCH_PASSWORD)
+        UserProfile.objects.create(usuario=estudiante, rol='estudiante')
+        staff = User.objects.create_user('bench_staff', 'staff@example.com', BENCH_PASSWORD, is_staff=True)
+        UserProfile.objects.create(usuario=staff, rol='visitante')
+        return {'visitante': visitante, 'estudiante': estudiante, 'staff': staff}
+
+    # ==================== MODO SERVIDOR LOCAL ====================
+
+    def run_url(self, base_url, scenarios, options):
+        results = {}
+        for name, method, url_name, user_key in scenarios:
+            if name not in URL_SCENARIOS:
+                continue
+            url = base_url.rstrip('/') + reverse(url_name)
+            timings, sizes = [], []
+            status = None
+            for i in range(options['warmup'] + options['iterations']):
+                start = time.perf_counter()
+                with urllib.request.urlopen(url) as response:
+                    body = response.read()
+                    status = response.status
+                    headers = response.headers
+                elapsed = time.perf_counter() - start
+                if i >= options['warmup']:
+                    timings.append(elapsed)
+                    sizes.append(len(body))
+            results[name] = summarize(timings, [], sizes, status, minified_bytes=minified_size(headers, body))
+        if not results:
+            raise CommandError(f'Con --url solo se pueden medir: {", ".join(URL_SCENARIOS)}.')
+        return results
+
+    # ==================== REPORTE Y COMPARACIÓN ====================
+
+    def print_table(self, results):
+        header = (
+            f'{"escala":>7} {"escenario":<24} {"p50 ms":>9} {"p95 ms":>9} {"consultas":>10} {"bytes":>10} '
+            f'{"minificado":>10} {"ahorro":>7}  plantilla'
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for scale, scenarios in results.items():
+            for name, m in scenarios.items():
+                queries = '-' if m['queries'] is None else m['queries']
+                minified = m.get('minified_bytes')
+                saving = f'{1 - minified / m["bytes"]:.1%}' if minified is not None and m['bytes'] else '-'
+                self.stdout.write(
+                    f'{scale:>7} {name:<24} {m["p50_ms"]:>9.2f} {m["p95_ms"]:>9.2f} {queries:>10} {m["bytes"]:>10} '
+                    f'{"-" if minified is None else minified:>10} {saving:>7}  {m.get("template") or "-"}'
+                )
+
+    def compare(self, results, baseline, threshold):
+        """
+        Compara contra la línea base. La latencia y los bytes admiten el umbral
+        relativo; el número de consultas no puede crecer.
+        """
+        regressions = []
+        for scale, scenarios in results.items():
+            for name, current in scenarios.items():
+                base = baseline.get(scale, {}).get(name)
+                if not base:
+                    continue
+                for metric in ('p50_ms', 'bytes'):
+                    if base.get(metric) and current[metric] > base[metric] * (1 + threshold):
+                        regressions.append(
+                            f'[{scale}] {name}: {metric} {current[metric]} > {base[metric]} (+{threshold:.0%})'
+                        )
+                if current['queries'] is not None and base.get('queries') is not None \
+                        and current['queries'] > base['queries']:
+                    regressions.append(f'[{scale}] {name}: consultas {current["queries"]} > {base["queries"]}')
+        return regressions
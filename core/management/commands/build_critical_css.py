@@ -0,0 +1,147 @@
+"""
+Genera el CSS crítico de la portada a partir de ``static/core/css/index.css``.
+
+Extrae las reglas que pintan la primera vista (variables, estilos base,
+pantalla de carga, menú cerrado, hero e intro) junto con los ``@keyframes`` que
+usan, y escribe ``templates/core/includes/index_styles.html``: esas reglas en
+un ``<style>`` en línea y la hoja completa cargada de forma diferida (``preload``
++ ``onload``) con su hash en la URL para que pueda cachearse indefinidamente.
+
+Hay que ejecutarlo tras editar ``index.css``:
+    python manage.py build_critical_css
+    python manage.py build_critical_css --check   # falla si el include está desactualizado
+"""
+import hashlib
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.minify import minify_css
+
+SOURCE = Path(settings.BASE_DIR) / 'static' / 'core' / 'css' / 'index.css'
+STATIC_PATH = 'core/css/index.css'
+OUTPUT = Path(settings.BASE_DIR) / 'templates' / 'core' / 'includes' / 'index_styles.html'
+
+# Clases e ids (prefijos) visibles u ocultos en la primera vista
+CRITICAL_PREFIXES = (
+    'loading', 'hero', 'skip-link', 'sr-only', 'hamburger', 'menu-overlay',
+    'custom-cursor', 'intro-pin', 'sticky-wrapper', 'video-reveal',
+)
+# Selectores sin clase ni id que siempre son críticos
+GLOBAL_ELEMENTS = {'', '*', 'html', 'body'}
+
+COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+NAME_RE = re.compile(r'[.#]([\w-]+)')
+PSEUDO_RE = re.compile(r'::?[\w-]+(\([^)]*\))?')
+ANIMATION_RE = re.compile(r'animation(?:-name)?\s*:([^;}]*)')
+
+TEMPLATE = """{{% load static %}}{{# Generado con `python manage.py build_critical_css` desde static/core/css/index.css: no editar a mano #}}
+<style>{{% verbatim %}}{critical}{{% endverbatim %}}</style>
+<link rel="preload" href="{{% static '{path}' %}}?v={digest}" as="style" onload="this.onload=null;this.rel='stylesheet'">
+<noscript><link rel="stylesheet" href="{{% static '{path}' %}}?v={digest}"></noscript>
+"""
+
+
+def split_blocks(css):
+    """
+    Reglas de primer nivel de ``css`` como ``(prelude, cuerpo)``; el cuerpo es
+    None en sentencias sin bloque (``@import ...;``).
+    """
+    blocks = []
+    start = depth = 0
+    prelude_end = None
+    i = 0
+    while i < len(css):
+        if css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            i = len(css) if end == -1 else end + 2
+            continue
+        char = css[i]
+        if char in '"\'':
+            i += 1
+            while i < len(css) and css[i] != char:
+                i += 2 if css[i] == '\\' else 1
+        elif char == '{':
+            if depth == 0:
+                prelude_end = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((COMMENT_RE.sub('', css[start:prelude_end]).strip(), css[prelude_end + 1:i]))
+                start = i + 1
+        elif char == ';' and depth == 0:
+            blocks.append((COMMENT_RE.sub('', css[start:i]).strip(), None))
+            start = i + 1
+        i += 1
+    return blocks
+
+
+def is_critical_selector(selector):
+    names = NAME_RE.findall(selector)
+    if names:
+        return any(name.startswith(CRITICAL_PREFIXES) for name in names)
+    return PSEUDO_RE.sub('', selector).strip() in GLOBAL_ELEMENTS
+
+
+def critical_rules(blocks):
+    """``(reglas críticas, nombres de animación que usan)``."""
+    rules, animations = [], set()
+    for prelude, body in blocks:
+        if body is None:
+            if prelude.startswith(('@import', '@charset')):
+                rules.append(f'{prelude};')
+        elif prelude.startswith(('@media', '@supports')):
+            inner, inner_animations = critical_rules(split_blocks(body))
+            if inner:
+                rules.append(f'{prelude} {{ {" ".join(inner)} }}')
+                animations |= inner_animations
+        elif prelude.startswith('@font-face'):
+            rules.append(f'{prelude} {{{body}}}')
+        elif prelude.startswith('@'):
+            continue  # @keyframes se añaden después según su uso
+        elif any(is_critical_selector(selector) for selector in prelude.split(',')):
+            rules.append(f'{prelude} {{{body}}}')
+            for value in ANIMATION_RE.findall(body):
+                animations.update(re.findall(r'[\w-]+', value))
+    return rules, animations
+
+
+def build(css):
+    blocks = split_blocks(css)
+    rules, animations = critical_rules(blocks)
+    keyframes = [
+        f'{prelude} {{{body}}}' for prelude, body in blocks
+        if body is not None and re.match(r'@(-\w+-)?keyframes\s', prelude) and prelude.split()[-1] in animations
+    ]
+    # Va en una sola línea: en CSS un salto de línea equivale a un espacio (y no cabe en cadenas)
+    return minify_css('\n'.join(rules + keyframes)).replace('\n', ' ')
+
+
+class Command(BaseCommand):
+    help = 'Genera el CSS crítico en línea y el enlace diferido a la hoja completa de la portada.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='No escribir; terminar con error si el include no está al día.')
+
+    def handle(self, *args, **options):
+        if not SOURCE.exists():
+            raise CommandError(f'No existe {SOURCE}.')
+        css = SOURCE.read_text(encoding='utf-8')
+        critical = build(css)
+        output = TEMPLATE.format(
+            critical=critical, path=STATIC_PATH, digest=hashlib.md5(css.encode()).hexdigest()[:12],
+        )
+        if options['check']:
+            current = OUTPUT.read_text(encoding='utf-8') if OUTPUT.exists() else ''
+            if current != output:
+                raise CommandError(f'{OUTPUT} está desactualizado: ejecuta manage.py build_critical_css.')
+            self.stdout.write(self.style.SUCCESS('CSS crítico al día.'))
+            return
+        OUTPUT.write_text(output, encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(
+            f'{OUTPUT.name}: {len(critical.encode())} bytes en línea de {len(css.encode())} bytes de {SOURCE.name}.'
+        ))
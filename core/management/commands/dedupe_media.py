@@ -0,0 +1,99 @@
+"""
+Migra la media existente al almacenamiento direccionado por contenido
+(``core.storage.ContentAddressedStorage``): calcula el SHA-256 de cada archivo
+referenciado, lo mueve a ``cas/``, actualiza las filas que lo usan y registra
+los blobs en ``MediaBlob``.
+
+Las filas se reescriben con ``update()``, que no emite señales, así que al
+terminar se invalidan las cachés que guardan URLs de media (fragmentos de
+facetas, portada y sitemap comprimidos, línea de tiempo, manifiesto de
+precaché, configuración del sitio). Con ``LocMemCache`` esto solo alcanza al
+proceso actual: conviene reiniciar los workers después.
+
+Uso:
+    python manage.py dedupe_media --dry-run   # solo informa
+    python manage.py dedupe_media
+"""
+import os
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from core import offline, sitemaps, timeline
+from core.caching import bump_version
+from core.facet_sections import facet_namespace
+from core.models import Facet, SiteSettings
+from core.storage import ContentAddressedStorage, cas_name, file_fields, hash_file, is_cas_name, iter_references
+
+
+def _mb(size):
+    return f'{size / (1024 * 1024):.2f} MB'
+
+
+class Command(BaseCommand):
+    help = 'Mueve la media existente a cas/ (deduplicada por contenido) y registra los blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Solo informa, no modifica nada')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError('El storage por defecto no es ContentAddressedStorage (revisa MEDIA_CONTENT_ADDRESSED).')
+        dry_run = options['dry_run']
+
+        # Nombre antiguo -> campos que lo referencian
+        legacy = defaultdict(set)
+        for model, field in file_fields():
+            queryset = model._default_manager.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+            for name in queryset.values_list(field.name, flat=True).distinct().iterator():
+                if not is_cas_name(name):
+                    legacy[name].add((model, field.name))
+
+        size_before = 0
+        sizes_after = {}
+        missing = migrated = 0
+        for old_name, usages in sorted(legacy.items()):
+            if not storage.exists(old_name):
+                missing += 1
+                self.stderr.write(f'No existe en disco: {old_name}')
+                continue
+            size = storage.size(old_name)
+            size_before += size
+            if dry_run:
+                with storage.open(old_name, 'rb') as fh:
+                    new_name = cas_name(hash_file(fh), old_name)
+            else:
+                new_name = storage.adopt(old_name)
+                for model, field_name in usages:
+                    rows = model._default_manager.filter(**{field_name: old_name})
+                    if field_name == 'archivo' and hasattr(model, 'nombre_archivo'):
+                        # El nombre en cas/ es el hash: se guarda el original para la descarga
+                        rows.filter(nombre_archivo='').update(nombre_archivo=os.path.basename(old_name)[:255])
+                    rows.update(**{field_name: new_name})
+                storage.delete(old_name)
+            sizes_after[new_name] = size
+            migrated += 1
+
+        self.stdout.write(
+            f'{migrated} archivos {"a migrar" if dry_run else "migrados"} ({missing} no encontrados): '
+            f'{_mb(size_before)} -> {_mb(sum(sizes_after.values()))} '
+            f'(ahorro {_mb(size_before - sum(sizes_after.values()))})'
+        )
+        if dry_run:
+            return
+
+        names = {name for name in iter_references() if is_cas_name(name)}
+        for name in names:
+            if storage.exists(name):
+                storage.register(name)
+
+        # Las filas ya apuntan a cas/: nada en caché debe seguir sirviendo las URLs antiguas
+        namespaces = [offline.NAMESPACE, sitemaps.NAMESPACE, timeline.NAMESPACE, SiteSettings.CACHE_NAMESPACE]
+        namespaces += [facet_namespace(pk) for pk in Facet.objects.values_list('pk', flat=True)]
+        for namespace in namespaces:
+            bump_version(namespace)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(names)} blobs referenciados; {len(namespaces)} espacios de caché invalidados.'
+        ))
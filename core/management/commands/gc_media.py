@@ -0,0 +1,162 @@
+"""
+Recolector de media huérfana: archivos en MEDIA_ROOT que ya no referencia
+ningún FileField/ImageField (hitos o facetas borrados, imágenes y videos
+reemplazados desde el panel de staff, versiones antiguas de videos...).
+
+Por defecto solo informa. Únicamente se tocan archivos con más antigüedad que
+el periodo de gracia, para no llevarse una subida cuya fila aún no se ha
+confirmado en la base de datos.
+
+Uso:
+    python manage.py gc_media                       # informe (dry-run)
+    python manage.py gc_media --quarantine          # mueve a MEDIA_QUARANTINE_ROOT
+    python manage.py gc_media --delete --grace-hours 72
+"""
+import os
+import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import MediaBlob
+from core.storage import CAS_PREFIX, is_cas_name, iter_references
+
+
+def _walk(directory):
+    """Lista ``(ruta, tamaño, mtime)`` de todos los archivos bajo ``directory``."""
+    found = []
+    stack = [directory]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    found.append((entry.path, stat.st_size, stat.st_mtime))
+    return found
+
+
+def _split(media_root):
+    """
+    Directorios que se recorren en paralelo y archivos sueltos de los niveles
+    superiores. ``cas/`` se reparte por sus subdirectorios ``cas/<xx>/``: es
+    donde está casi toda la media.
+    """
+    directories, files = [], []
+    pending = [media_root]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if Path(entry.path).relative_to(media_root).as_posix() + '/' == CAS_PREFIX:
+                        pending.append(entry.path)
+                    else:
+                        directories.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append((entry.path, stat.st_size, stat.st_mtime))
+    return directories, files
+
+
+def _mb(size):
+    return f'{size / (1024 * 1024):.2f} MB'
+
+
+class Command(BaseCommand):
+    help = 'Borra o pone en cuarentena los archivos de MEDIA_ROOT que ya no referencia la base de datos'
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--delete', action='store_true', help='Borra los archivos huérfanos')
+        action.add_argument('--quarantine', action='store_true',
+                            help='Mueve los archivos huérfanos a MEDIA_QUARANTINE_ROOT')
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Ignora archivos modificados hace menos de estas horas (por defecto 24)')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Hilos para recorrer MEDIA_ROOT en paralelo')
+
+    def handle(self, *args, **options):
+        media_root = Path(settings.MEDIA_ROOT).resolve()
+        quarantine_root = Path(getattr(settings, 'MEDIA_QUARANTINE_ROOT', settings.BASE_DIR / 'media_quarantine')).resolve()
+        if not media_root.is_dir():
+            raise CommandError(f'MEDIA_ROOT no existe: {media_root}')
+        if options['quarantine'] and (quarantine_root == media_root or media_root in quarantine_root.parents):
+            raise CommandError('MEDIA_QUARANTINE_ROOT no puede estar dentro de MEDIA_ROOT.')
+
+        # Referencias de la base de datos: se leen en streaming mientras se recorre el disco
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            directories, files = _split(media_root)
+            walks = [pool.submit(_walk, directory) for directory in directories]
+            referenced = set(iter_references())
+            for walk in walks:
+                files.extend(walk.result())
+
+        cutoff = time.time() - options['grace_hours'] * 3600
+        orphans = []
+        recent = 0
+        for path, size, mtime in files:
+            name = Path(path).relative_to(media_root).as_posix()
+            if name in referenced:
+                continue
+            if mtime > cutoff:
+                recent += 1
+                continue
+            orphans.append((name, size))
+
+        by_dir = defaultdict(lambda: [0, 0])
+        for name, size in orphans:
+            bucket = by_dir[name.split('/', 1)[0] if '/' in name else '.']
+            bucket[0] += 1
+            bucket[1] += size
+        total = sum(size for _, size in orphans)
+
+        self.stdout.write(f'{len(files)} archivos en disco, {len(referenced)} referencias en la base de datos.')
+        for directory, (count, size) in sorted(by_dir.items(), key=lambda item: -item[1][1]):
+            self.stdout.write(f'  {directory:<20} {count:>6} huérfanos  {_mb(size):>12}')
+        self.stdout.write(f'{recent} huérfanos dentro del periodo de gracia ({options["grace_hours"]:g} h) se conservan.')
+
+        if not (options['delete'] or options['quarantine']):
+            self.stdout.write(self.style.SUCCESS(
+                f'Recuperables: {len(orphans)} archivos, {_mb(total)} (usa --delete o --quarantine).'
+            ))
+            return
+
+        removed = []
+        reclaimed = 0
+        for name, size in orphans:
+            source = media_root / name
+            try:
+                # Un blob reutilizado desde el inventario tiene la fecha actualizada (ContentAddressedStorage.touch)
+                if source.stat().st_mtime > cutoff:
+                    continue
+                if options['quarantine']:
+                    target = quarantine_root / name
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.move(source, target)
+                else:
+                    source.unlink()
+            except OSError as e:
+                self.stderr.write(f'{name}: {e}')
+                continue
+            removed.append(name)
+            reclaimed += size
+
+        cas_names = [name for name in removed if is_cas_name(name)]
+        if cas_names:
+            MediaBlob.objects.filter(nombre__in=cas_names).delete()
+
+        verb = 'movidos a cuarentena' if options['quarantine'] else 'borrados'
+        failed = len(orphans) - len(removed)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(removed)} archivos {verb} ({_mb(reclaimed)})'
+            + (f'; {failed} no se tocaron (errores o modificados durante el recorrido).' if failed else '.')
+        ))
@@ -0,0 +1,82 @@
+"""
+Informe (y opcionalmente aplicación) de la normalización de imágenes sobre la
+media ya subida: orientación EXIF, sin metadatos y lado mayor acotado. Con
+``--apply`` también rellena ancho, alto y placeholder de las filas que no los
+tienen.
+
+Uso:
+    python manage.py normalize_images            # solo informa de los bytes que se ahorrarían
+    python manage.py normalize_images --apply    # reescribe los archivos y rellena dimensiones
+"""
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from core.images import IMAGE_FIELDS, process_image, validate_image
+
+
+def _human(size):
+    return f'{size / (1024 * 1024):.2f} MB'
+
+
+class Command(BaseCommand):
+    help = 'Muestra los bytes que ahorraría normalizar las imágenes existentes (--apply para reescribirlas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true',
+                            help='Reescribe las imágenes normalizadas y rellena dimensiones y placeholders')
+
+    def handle(self, *args, **options):
+        apply = options['apply']
+        total_before = total_after = 0
+
+        for label, field_name in IMAGE_FIELDS:
+            model = apps.get_model(label)
+            meta_fields = [f'{field_name}_ancho', f'{field_name}_alto', f'{field_name}_placeholder']
+            before = after = processed = missing_meta = skipped = 0
+            rows = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for instance in rows.only('pk', field_name, *meta_fields).iterator():
+                field_file = getattr(instance, field_name)
+                try:
+                    with field_file.open('rb') as fh:
+                        size = field_file.size
+                        validate_image(fh.file)
+                        content, new_name, width, height, placeholder = process_image(fh, field_file.name)
+                except (OSError, ValidationError) as e:
+                    skipped += 1
+                    self.stderr.write(f'{label} #{instance.pk} ({field_file.name}): {e}')
+                    continue
+
+                before += size
+                after += size if content is None else content.size
+                processed += content is not None
+                needs_meta = (getattr(instance, meta_fields[0]), getattr(instance, meta_fields[1])) != (width, height) \
+                    or not getattr(instance, meta_fields[2])
+                missing_meta += needs_meta
+                if not apply or (content is None and not needs_meta):
+                    continue
+
+                update_fields = list(meta_fields)
+                if hasattr(instance, 'fecha_actualizacion'):
+                    update_fields.append('fecha_actualizacion')
+                if content is not None:
+                    old_name = field_file.name
+                    field_file.save(new_name.rsplit('/', 1)[-1], content, save=False)
+                    update_fields.append(field_name)
+                for meta_field, value in zip(meta_fields, (width, height, placeholder)):
+                    setattr(instance, meta_field, value)
+                instance.save(update_fields=update_fields)
+                if content is not None and field_file.name != old_name:
+                    field_file.storage.delete(old_name)
+
+            total_before += before
+            total_after += after
+            self.stdout.write(
+                f'{label}.{field_name}: {processed} a normalizar, {missing_meta} sin dimensiones/placeholder, '
+                f'{skipped} con errores, {_human(before)} -> {_human(after)} (ahorro {_human(before - after)})'
+            )
+
+        verb = 'Ahorrado' if apply else 'Ahorro estimado'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: {_human(total_before - total_after)} de {_human(total_before)}'
+        ))
@@ -0,0 +1,19 @@
+"""
+Reconstruye desde cero el índice de búsqueda del material de clase
+(``core.search``). Normalmente no hace falta: el índice se actualiza al guardar,
+pero sí tras cargar datos con ``loaddata`` o cambios hechos con ``update()``.
+
+Uso:
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de temáticas y materiales'
+
+    def handle(self, *args, **options):
+        total = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Índice reconstruido: {total} entradas.'))
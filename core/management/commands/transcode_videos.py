@@ -0,0 +1,46 @@
+"""
+Genera las versiones comprimidas (MP4/WebM + póster) de los videos subidos
+que aún no las tienen o cuyo video cambió.
+
+Uso:
+    python manage.py transcode_videos
+    python manage.py transcode_videos --force
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from core.transcoding import VIDEO_SOURCES, TranscodeError, get_transcoder, process
+
+
+class Command(BaseCommand):
+    help = 'Genera MP4/WebM comprimidos y pósters JPEG/WebP para los videos subidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenera también los videos que ya tienen versiones')
+
+    def handle(self, *args, **options):
+        transcoder = get_transcoder()
+        if transcoder is None:
+            raise CommandError('No hay transcodificador disponible: instala ffmpeg o revisa VIDEO_TRANSCODER.')
+
+        updated = failed = 0
+        for label, (source_field, prefix) in VIDEO_SOURCES.items():
+            model = apps.get_model(label)
+            # Filas con video o con versiones de un video que ya no está
+            pending = (
+                model.objects.exclude(**{source_field: ''}).exclude(**{f'{source_field}__isnull': True})
+                | model.objects.exclude(**{f'{prefix}origen': ''})
+            )
+            for pk in pending.values_list('pk', flat=True).distinct():
+                try:
+                    changed = process(label, pk, force=options['force'], transcoder=transcoder)
+                except TranscodeError as e:
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f'{label} #{pk}: {e}'))
+                    continue
+                if changed:
+                    updated += 1
+                    self.stdout.write(f'{label} #{pk} actualizado')
+
+        self.stdout.write(self.style.SUCCESS(f'{updated} videos procesados, {failed} con errores.'))
@@ -0,0 +1,99 @@
+# Generated by Django 4.2.27 on 2026-10-19 17:12
+
+import re
+
+from django.db import migrations, models
+
+# Copia congelada de core.embeds: la migración no debe cambiar si el módulo evoluciona
+YOUTUBE_PATTERNS = (
+    re.compile(r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([a-zA-Z0-9_-]{11})'),
+    re.compile(r'youtube\.com\/embed\/([a-zA-Z0-9_-]{11})'),
+)
+VIMEO_PATTERN = re.compile(r'vimeo\.com\/(?:.*\/)?(\d+)')
+EMBED_URLS = {
+    'youtube': 'https://www.youtube.com/embed/{}',
+    'vimeo': 'https://player.vimeo.com/video/{}',
+}
+
+
+def parse_video_url(url):
+    if 'youtube.com' in url or 'youtu.be' in url:
+        for pattern in YOUTUBE_PATTERNS:
+            match = pattern.search(url)
+            if match:
+                return 'youtube', match.group(1)
+    elif 'vimeo.com' in url:
+        match = VIMEO_PATTERN.search(url)
+        if match:
+            return 'vimeo', match.group(1)
+    return '', ''
+
+
+def video_embed_fields(url):
+    provider, video_id = parse_video_url(url)
+    return {
+        'video_provider': provider,
+        'video_id': video_id,
+        'video_embed_url': EMBED_URLS[provider].format(video_id) if provider else '',
+    }
+
+
+def backfill_video_embeds(apps, schema_editor):
+    """Rellena los campos de inserción de las filas que ya tienen URL de video."""
+    for model_name in ('Milestone', 'MaterialVideo'):
+        model = apps.get_model('core', model_name)
+        rows = []
+        for row in model.objects.exclude(video_url__isnull=True).exclude(video_url='').only('pk', 'video_url').iterator():
+            for field, value in video_embed_fields(row.video_url).items():
+                setattr(row, field, value)
+            rows.append(row)
+        model.objects.bulk_update(rows, ['video_provider', 'video_id', 'video_embed_url'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_add_materialpresentacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materialvideo',
+            name='video_embed_url',
+            field=models.URLField(blank=True, editable=False, help_text='Calculado al guardar a partir de la URL de video', verbose_name='URL de Inserción'),
+        ),
+        migrations.AddField(
+            model_name='materialvideo',
+            name='video_id',
+            field=models.CharField(blank=True, editable=False, help_text='Calculado al guardar a partir de la URL de video', max_length=32, verbose_name='ID de Video'),
+        ),
+        migrations.AddField(
+            model_name='materialvideo',
+            name='video_provider',
+            field=models.CharField(blank=True, choices=[('youtube', 'YouTube'), ('vimeo', 'Vimeo')], editable=False, help_text='Calculado al guardar a partir de la URL de video', max_length=10, verbose_name='Proveedor de Video'),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='video_embed_url',
+            field=models.URLField(blank=True, editable=False, help_text='Calculado al guardar a partir de la URL de video', verbose_name='URL de Inserción'),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='video_id',
+            field=models.CharField(blank=True, editable=False, help_text='Calculado al guardar a partir de la URL de video', max_length=32, verbose_name='ID de Video'),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='video_provider',
+            field=models.CharField(blank=True, choices=[('youtube', 'YouTube'), ('vimeo', 'Vimeo')], editable=False, help_text='Calculado al guardar a partir de la URL de video', max_length=10, verbose_name='Proveedor de Video'),
+        ),
+        migrations.AddIndex(
+            model_name='materialvideo',
+            index=models.Index(fields=['video_provider', 'video_id'], name='core_materi_video_p_f132c2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='milestone',
+            index=models.Index(fields=['video_provider', 'video_id'], name='core_milest_video_p_20c8d0_idx'),
+        ),
+        migrations.RunPython(backfill_video_embeds, migrations.RunPython.noop),
+    ]
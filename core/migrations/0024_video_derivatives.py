@@ -0,0 +1,63 @@
+# Generated by Django 4.2.27 on 2026-10-19 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_video_embed_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='milestone',
+            name='video_mp4',
+            field=models.FileField(blank=True, editable=False, help_text='Versión H.264 comprimida, generada automáticamente', null=True, upload_to='hitos/videos/derivados/', verbose_name='Video MP4'),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='video_origen',
+            field=models.CharField(blank=True, editable=False, help_text='Archivo de video a partir del cual se generaron las versiones comprimidas', max_length=255, verbose_name='Origen de las versiones'),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='video_poster',
+            field=models.ImageField(blank=True, editable=False, help_text='Fotograma de portada, generado automáticamente', null=True, upload_to='hitos/videos/derivados/', verbose_name='Póster JPEG'),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='video_poster_webp',
+            field=models.FileField(blank=True, editable=False, help_text='Fotograma de portada en WebP, generado automáticamente', null=True, upload_to='hitos/videos/derivados/', verbose_name='Póster WebP'),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='video_webm',
+            field=models.FileField(blank=True, editable=False, help_text='Versión VP9 comprimida, generada automáticamente', null=True, upload_to='hitos/videos/derivados/', verbose_name='Video WebM'),
+        ),
+        migrations.AddField(
+            model_name='sitesettings',
+            name='video_hero_mp4',
+            field=models.FileField(blank=True, editable=False, help_text='Versión H.264 comprimida, generada automáticamente', null=True, upload_to='site/hero/videos/derivados/', verbose_name='Video Hero MP4'),
+        ),
+        migrations.AddField(
+            model_name='sitesettings',
+            name='video_hero_origen',
+            field=models.CharField(blank=True, editable=False, help_text='Archivo de video a partir del cual se generaron las versiones comprimidas', max_length=255, verbose_name='Origen de las versiones'),
+        ),
+        migrations.AddField(
+            model_name='sitesettings',
+            name='video_hero_poster',
+            field=models.ImageField(blank=True, editable=False, help_text='Fotograma de portada, generado automáticamente', null=True, upload_to='site/hero/videos/derivados/', verbose_name='Póster JPEG'),
+        ),
+        migrations.AddField(
+            model_name='sitesettings',
+            name='video_hero_poster_webp',
+            field=models.FileField(blank=True, editable=False, help_text='Fotograma de portada en WebP, generado automáticamente', null=True, upload_to='site/hero/videos/derivados/', verbose_name='Póster WebP'),
+        ),
+        migrations.AddField(
+            model_name='sitesettings',
+            name='video_hero_webm',
+            field=models.FileField(blank=True, editable=False, help_text='Versión VP9 comprimida, generada automáticamente', null=True, upload_to='site/hero/videos/derivados/', verbose_name='Video Hero WebM'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.27 on 2026-10-19 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_video_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facet',
+            name='imagen_hero_alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Alto de la imagen'),
+        ),
+        migrations.AddField(
+            model_name='facet',
+            name='imagen_hero_ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ancho de la imagen'),
+        ),
+        migrations.AddField(
+            model_name='facet',
+            name='imagen_hero_placeholder',
+            field=models.TextField(blank=True, editable=False, help_text='Vista previa diminuta (data URI) que se muestra mientras carga la imagen', verbose_name='Placeholder'),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Alto de la imagen'),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ancho de la imagen'),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='imagen_placeholder',
+            field=models.TextField(blank=True, editable=False, help_text='Vista previa diminuta (data URI) que se muestra mientras carga la imagen', verbose_name='Placeholder'),
+        ),
+        migrations.AddField(
+            model_name='milestoneimage',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Alto de la imagen'),
+        ),
+        migrations.AddField(
+            model_name='milestoneimage',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ancho de la imagen'),
+        ),
+        migrations.AddField(
+            model_name='milestoneimage',
+            name='imagen_placeholder',
+            field=models.TextField(blank=True, editable=False, help_text='Vista previa diminuta (data URI) que se muestra mientras carga la imagen', verbose_name='Placeholder'),
+        ),
+    ]
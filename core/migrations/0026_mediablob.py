@@ -0,0 +1,29 @@
+# Generated by Django 4.2.27 on 2026-10-19 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_image_dimensions_placeholders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(help_text='Ruta dentro de MEDIA_ROOT (cas/<h[:2]>/<sha256><ext>)', max_length=255, unique=True, verbose_name='Nombre')),
+                ('hash', models.CharField(db_index=True, max_length=64, verbose_name='SHA-256')),
+                ('tamaño', models.BigIntegerField(verbose_name='Tamaño (bytes)')),
+                ('referencias', models.PositiveIntegerField(default=0, verbose_name='Referencias')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+            ],
+            options={
+                'verbose_name': 'Blob de Media',
+                'verbose_name_plural': 'Blobs de Media',
+                'ordering': ['nombre'],
+            },
+        ),
+    ]
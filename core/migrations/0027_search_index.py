@@ -0,0 +1,86 @@
+# Generated by Django 4.2.27 on 2026-10-19 17:27
+
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import migrations, models
+
+# Copia congelada de core.search: la migración no debe cambiar si el módulo evoluciona
+WEIGHTS = {'titulo': 5, 'nombre': 3, 'descripcion': 1}
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+STOPWORDS = {
+    'al', 'como', 'con', 'de', 'del', 'el', 'en', 'es', 'la', 'las', 'lo', 'los',
+    'mas', 'no', 'or', 'para', 'por', 'que', 'se', 'sin', 'su', 'sus', 'un', 'una', 'y',
+}
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+    return [
+        token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text)
+        if len(token) >= MIN_TERM_LENGTH and token not in STOPWORDS
+    ]
+
+
+def entries(SearchIndexEntry, tipo, pk, fields):
+    weights = Counter()
+    for text, field in fields:
+        for token in tokenize(text):
+            weights[token] += WEIGHTS[field]
+    return [SearchIndexEntry(termino=term, tipo=tipo, objeto_id=pk, peso=peso) for term, peso in weights.items()]
+
+
+def material_fields(material):
+    fields = [(material.titulo, 'titulo'), (material.descripcion, 'descripcion')]
+    for related in ('pdfs', 'videos', 'presentaciones'):
+        for nombre in getattr(material, related).filter(activo=True).exclude(nombre='').values_list('nombre', flat=True):
+            fields.append((nombre, 'nombre'))
+    return fields
+
+
+def build_search_index(apps, schema_editor):
+    SearchIndexEntry = apps.get_model('core', 'SearchIndexEntry')
+    Tematica = apps.get_model('core', 'Tematica')
+    Material = apps.get_model('core', 'Material')
+    rows = []
+    for tematica in Tematica.objects.filter(activo=True).iterator():
+        rows.extend(entries(SearchIndexEntry, 'tematica', tematica.pk,
+                            [(tematica.titulo, 'titulo'), (tematica.descripcion, 'descripcion')]))
+    for material in Material.objects.filter(activo=True, tematica__activo=True):
+        rows.extend(entries(SearchIndexEntry, 'material', material.pk, material_fields(material)))
+    SearchIndexEntry.objects.all().delete()
+    SearchIndexEntry.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_mediablob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=64, verbose_name='Término')),
+                ('tipo', models.CharField(choices=[('tematica', 'Temática'), ('material', 'Material')], max_length=10, verbose_name='Tipo de documento')),
+                ('objeto_id', models.PositiveIntegerField(verbose_name='ID del documento')),
+                ('peso', models.PositiveIntegerField(default=1, verbose_name='Peso')),
+            ],
+            options={
+                'verbose_name': 'Entrada del Índice de Búsqueda',
+                'verbose_name_plural': 'Entradas del Índice de Búsqueda',
+                'indexes': [models.Index(fields=['tipo', 'objeto_id'], name='core_search_tipo_3039b8_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchindexentry',
+            constraint=models.UniqueConstraint(fields=('termino', 'tipo', 'objeto_id'), name='core_searchindex_unique_term'),
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.27 on 2026-10-19 17:59
+
+import os
+
+from django.db import migrations, models
+
+
+def fill_original_names(apps, schema_editor):
+    """Los archivos subidos antes de la media direccionada por contenido conservan su nombre."""
+    for model_name in ('MaterialPDF', 'MaterialPresentacion'):
+        model = apps.get_model('core', model_name)
+        for row in model.objects.exclude(archivo='').exclude(archivo__startswith='cas/').only('archivo'):
+            model.objects.filter(pk=row.pk).update(nombre_archivo=os.path.basename(row.archivo.name)[:255])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_search_index_milestones'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='mediablob',
+            name='referencias',
+        ),
+        migrations.AddField(
+            model_name='materialpdf',
+            name='nombre_archivo',
+            field=models.CharField(blank=True, editable=False, help_text='Nombre original del archivo (con media direccionada por contenido la ruta es su hash)', max_length=255, verbose_name='Nombre del archivo subido'),
+        ),
+        migrations.AddField(
+            model_name='materialpresentacion',
+            name='nombre_archivo',
+            field=models.CharField(blank=True, editable=False, help_text='Nombre original del archivo (con media direccionada por contenido la ruta es su hash)', max_length=255, verbose_name='Nombre del archivo subido'),
+        ),
+        migrations.RunPython(fill_original_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:13
+
+import core.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_media_original_names'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='facet',
+            name='imagen_hero',
+            field=models.ImageField(blank=True, help_text='Imagen principal de la faceta (recomendado: 1920x1080px)', null=True, upload_to='facetas/hero/', validators=[core.images.validate_image], verbose_name='Imagen Hero'),
+        ),
+        migrations.AlterField(
+            model_name='milestone',
+            name='imagen',
+            field=models.ImageField(blank=True, help_text='Imagen del hito (recomendado: 1200x800px)', null=True, upload_to='hitos/', validators=[core.images.validate_image], verbose_name='Imagen'),
+        ),
+        migrations.AlterField(
+            model_name='milestoneimage',
+            name='imagen',
+            field=models.ImageField(help_text='Imagen adicional del hito (recomendado: 1920x1080px)', upload_to='hitos/imagenes/', validators=[core.images.validate_image], verbose_name='Imagen'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+"""
+Minificación del HTML renderizado (opcional, ``HTML_MINIFY``).
+
+Las plantillas grandes (``index.html``, ``contact.html``, ``register.html``,
+``material_clase.html``) llevan mucha indentación, comentarios y espacios.
+``MinifyingDjangoTemplates`` pasa por ``minify_html`` el resultado de cada
+plantilla ``.html`` en el momento de renderizarla, así que todo lo que se
+guarda en caché a partir de ella (fragmentos de facetas, páginas comprimidas)
+ya está minificado.
+
+``minify_html`` es conservador: quita comentarios HTML (salvo los condicionales)
+y reduce cada tramo de espacios a uno solo, o a un salto de línea si lo había.
+El contenido de ``<pre>``, ``<textarea>`` y ``<script>`` no se toca; en
+``<style>`` solo se quitan comentarios y espacios repetidos fuera de cadenas.
+"""
+import re
+
+from django.conf import settings
+
+from .timing import TimedDjangoTemplates, phase
+
+PROTECTED_RE = re.compile(
+    r'(<(pre|textarea|script)\b.*?</\2\s*>)|(<style\b[^>]*>)(.*?)(</style\s*>)', re.S | re.I,
+)
+COMMENT_RE = re.compile(r'<!--(?!\[if|<!\[endif).*?-->', re.S)
+WHITESPACE_RE = re.compile(r'\s+')
+CSS_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(?:\s|/\*.*?\*/)+', re.S)
+
+
+def _collapse(match):
+    return '\n' if '\n' in match.group() else ' '
+
+
+def _minify_markup(text):
+    return WHITESPACE_RE.sub(_collapse, COMMENT_RE.sub('', text))
+
+
+def _minify_css_token(match):
+    if match.group(1):
+        return match.group(1)  # cadena: intacta
+    # Espacios y comentarios seguidos: un separador (el comentario también separa tokens en CSS)
+    return _collapse(match)
+
+
+def minify_css(css):
+    return CSS_RE.sub(_minify_css_token, css).strip()
+
+
+def minify_html(html):
+    parts = []
+    position = 0
+    for match in PROTECTED_RE.finditer(html):
+        parts.append(_minify_markup(html[position:match.start()]))
+        if match.group(1):
+            parts.append(match.group(1))
+        else:
+            parts.append(match.group(3) + minify_css(match.group(4)) + match.group(5))
+        position = match.end()
+    parts.append(_minify_markup(html[position:]))
+    return ''.join(parts)
+
+
+class _MinifiedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        html = self.template.render(context, request)
+        with phase('tpl'):
+            return minify_html(html)
+
+
+class MinifyingDjangoTemplates(TimedDjangoTemplates):
+    """``TimedDjangoTemplates`` que minifica las plantillas ``.html`` si ``HTML_MINIFY`` está activo."""
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        if getattr(settings, 'HTML_MINIFY', False) and template_name.endswith('.html'):
+            return _MinifiedTemplate(template)
+        return template
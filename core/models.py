@@ -1,8 +1,17 @@
+import copy
+import os
+
 from django.db import models
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
 
+from .caching import local_get_or_set
+from .embeds import PROVIDER_CHOICES, VIMEO, YOUTUBE, video_embed_fields
+from .images import process_image_field, validate_image
+
+VIDEO_EMBED_FIELDS = {'video_provider', 'video_id', 'video_embed_url'}
+
 
 class SiteSettings(models.Model):
     """
@@ -36,6 +45,45 @@ class SiteSettings(models.Model):
         verbose_name="Video Hero",
         help_text="Video para la sección hero (opcional, formatos: mp4, webm, mov). Se mostrará después de la imagen al hacer scroll."
     )
+    video_hero_mp4 = models.FileField(
+        upload_to='site/hero/videos/derivados/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Video Hero MP4",
+        help_text="Versión H.264 comprimida, generada automáticamente"
+    )
+    video_hero_webm = models.FileField(
+        upload_to='site/hero/videos/derivados/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Video Hero WebM",
+        help_text="Versión VP9 comprimida, generada automáticamente"
+    )
+    video_hero_poster = models.ImageField(
+        upload_to='site/hero/videos/derivados/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Póster JPEG",
+        help_text="Fotograma de portada, generado automáticamente"
+    )
+    video_hero_poster_webp = models.FileField(
+        upload_to='site/hero/videos/derivados/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Póster WebP",
+        help_text="Fotograma de portada en WebP, generado automáticamente"
+    )
+    video_hero_origen = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name="Origen de las versiones",
+        help_text="Archivo de video a partir del cual se generaron las versiones comprimidas"
+    )
     imagen_loading = models.ImageField(
         upload_to='site/loading/',
         blank=True,
@@ -93,6 +141,8 @@ class SiteSettings(models.Model):
         verbose_name="Fecha de actualización"
     )
 
+    CACHE_NAMESPACE = 'site_settings'
+
     class Meta:
         verbose_name = "Configuración del Sitio"
         verbose_name_plural = "Configuración del Sitio"
@@ -107,9 +157,14 @@ class SiteSettings(models.Model):
 
     @classmethod
     def load(cls):
-        """Carga o crea la instancia única."""
-        obj, created = cls.objects.get_or_create(pk=1)
-        return obj
+        """
+        Carga o crea la instancia única. Se lee varias veces por petición, así que
+        pasa por la caché local del proceso (``core.caching.local_get_or_set``);
+        ``core.signals`` la invalida al guardar.
+        """
+        obj = local_get_or_set(cls.CACHE_NAMESPACE, 'instance', lambda: cls.objects.get_or_create(pk=1)[0])
+        # Copia: quien la edite (panel de staff) no debe alterar la compartida
+        return copy.copy(obj)
 
 
 class Facet(models.Model):
@@ -132,7 +187,26 @@ class Facet(models.Model):
         verbose_name="Imagen Hero",
         help_text="Imagen principal de la faceta (recomendado: 1920x1080px)",
         blank=True,
-        null=True
+        null=True,
+        validators=[validate_image]
+    )
+    imagen_hero_ancho = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Ancho de la imagen"
+    )
+    imagen_hero_alto = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Alto de la imagen"
+    )
+    imagen_hero_placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="Placeholder",
+        help_text="Vista previa diminuta (data URI) que se muestra mientras carga la imagen"
     )
     orden = models.IntegerField(
         default=0,
@@ -185,9 +259,10 @@ class Facet(models.Model):
         return self.titulo
 
     def save(self, *args, **kwargs):
-        """Auto-genera el slug desde el título si no se proporciona."""
+        """Auto-genera el slug desde el título si no se proporciona y normaliza la imagen subida."""
         if not self.slug:
             self.slug = slugify(self.titulo)
+        process_image_field(self, 'imagen_hero')
         super().save(*args, **kwargs)
 
 
@@ -229,7 +304,26 @@ class Milestone(models.Model):
         verbose_name="Imagen",
         help_text="Imagen del hito (recomendado: 1200x800px)",
         blank=True,
-        null=True
+        null=True,
+        validators=[validate_image]
+    )
+    imagen_ancho = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Ancho de la imagen"
+    )
+    imagen_alto = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Alto de la imagen"
+    )
+    imagen_placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="Placeholder",
+        help_text="Vista previa diminuta (data URI) que se muestra mientras carga la imagen"
     )
     TAMAÑO_IMAGEN_CHOICES = [
         ('grande', 'Grande'),
@@ -250,12 +344,72 @@ class Milestone(models.Model):
         blank=True,
         null=True
     )
+    video_mp4 = models.FileField(
+        upload_to='hitos/videos/derivados/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Video MP4",
+        help_text="Versión H.264 comprimida, generada automáticamente"
+    )
+    video_webm = models.FileField(
+        upload_to='hitos/videos/derivados/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Video WebM",
+        help_text="Versión VP9 comprimida, generada automáticamente"
+    )
+    video_poster = models.ImageField(
+        upload_to='hitos/videos/derivados/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Póster JPEG",
+        help_text="Fotograma de portada, generado automáticamente"
+    )
+    video_poster_webp = models.FileField(
+        upload_to='hitos/videos/derivados/',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Póster WebP",
+        help_text="Fotograma de portada en WebP, generado automáticamente"
+    )
+    video_origen = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name="Origen de las versiones",
+        help_text="Archivo de video a partir del cual se generaron las versiones comprimidas"
+    )
     video_url = models.URLField(
         verbose_name="URL de Video",
         help_text="URL de video externo (YouTube, Vimeo, etc.) - Opcional",
         blank=True,
         null=True
     )
+    video_provider = models.CharField(
+        max_length=10,
+        choices=PROVIDER_CHOICES,
+        blank=True,
+        editable=False,
+        verbose_name="Proveedor de Video",
+        help_text="Calculado al guardar a partir de la URL de video"
+    )
+    video_id = models.CharField(
+        max_length=32,
+        blank=True,
+        editable=False,
+        verbose_name="ID de Video",
+        help_text="Calculado al guardar a partir de la URL de video"
+    )
+    video_embed_url = models.URLField(
+        blank=True,
+        editable=False,
+        verbose_name="URL de Inserción",
+        help_text="Calculado al guardar a partir de la URL de video"
+    )
     video_activo = models.BooleanField(
         default=True,
         verbose_name="Video Activo",
@@ -288,6 +442,7 @@ class Milestone(models.Model):
         indexes = [
             models.Index(fields=['faceta', 'orden', 'activo']),
             models.Index(fields=['año']),
+            models.Index(fields=['video_provider', 'video_id']),
         ]
 
     def __str__(self):
@@ -296,39 +451,36 @@ class Milestone(models.Model):
 
     @property
     def imagenes_activas(self):
-        """Retorna todas las imágenes activas del hito, ordenadas por orden."""
+        """
+        Retorna todas las imágenes activas del hito, ordenadas por orden.
+        Si ya se precargaron (``Prefetch('imagenes', ...)``) no vuelve a consultar.
+        """
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('imagenes')
+        if prefetched is not None:
+            return [imagen for imagen in prefetched if imagen.activo]
         return self.imagenes.filter(activo=True).order_by('orden')
     
+    def update_video_embed(self):
+        """Recalcula proveedor, ID y URL de inserción a partir de ``video_url``."""
+        for field, value in video_embed_fields(self.video_url).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        """Analiza la URL de video una sola vez, al guardar, y normaliza la imagen subida."""
+        self.update_video_embed()
+        process_image_field(self, 'imagen')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'video_url' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | VIDEO_EMBED_FIELDS
+        super().save(*args, **kwargs)
+
     def get_youtube_video_id(self):
-        """Extrae el ID del video de YouTube desde la URL."""
-        if not self.video_url or 'youtube.com' not in self.video_url and 'youtu.be' not in self.video_url:
-            return None
-        
-        import re
-        # Patrones para diferentes formatos de YouTube
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([a-zA-Z0-9_-]{11})',
-            r'youtube\.com\/embed\/([a-zA-Z0-9_-]{11})',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, self.video_url)
-            if match:
-                return match.group(1)
-        return None
-    
+        """ID del video de YouTube (precalculado al guardar)."""
+        return self.video_id if self.video_provider == YOUTUBE else None
+
     def get_vimeo_video_id(self):
-        """Extrae el ID del video de Vimeo desde la URL."""
-        if not self.video_url or 'vimeo.com' not in self.video_url:
-            return None
-        
-        import re
-        # Patrón para Vimeo
-        pattern = r'vimeo\.com\/(?:.*\/)?(\d+)'
-        match = re.search(pattern, self.video_url)
-        if match:
-            return match.group(1)
-        return None
+        """ID del video de Vimeo (precalculado al guardar)."""
+        return self.video_id if self.video_provider == VIMEO else None
 
 
 class MilestoneImage(models.Model):
@@ -346,7 +498,26 @@ class MilestoneImage(models.Model):
     imagen = models.ImageField(
         upload_to='hitos/imagenes/',
         verbose_name="Imagen",
-        help_text="Imagen adicional del hito (recomendado: 1920x1080px)"
+        help_text="Imagen adicional del hito (recomendado: 1920x1080px)",
+        validators=[validate_image]
+    )
+    imagen_ancho = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Ancho de la imagen"
+    )
+    imagen_alto = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Alto de la imagen"
+    )
+    imagen_placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="Placeholder",
+        help_text="Vista previa diminuta (data URI) que se muestra mientras carga la imagen"
     )
     orden = models.IntegerField(
         default=0,
@@ -375,6 +546,11 @@ class MilestoneImage(models.Model):
     def __str__(self):
         return f"Imagen {self.orden} - {self.hito.titulo}"
 
+    def save(self, *args, **kwargs):
+        """Normaliza la imagen recién subida antes de guardarla."""
+        process_image_field(self, 'imagen')
+        super().save(*args, **kwargs)
+
 
 class ContactMessage(models.Model):
     """
@@ -634,17 +810,35 @@ class Material(models.Model):
 
     @property
     def pdfs_activos(self):
-        """Retorna todos los PDFs activos del material, ordenados por orden."""
+        """
+        Retorna todos los PDFs activos del material, ordenados por orden.
+        Si ya se precargaron (``Prefetch('pdfs', ...)``) no vuelve a consultar.
+        """
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('pdfs')
+        if prefetched is not None:
+            return [item for item in prefetched if item.activo]
         return self.pdfs.filter(activo=True).order_by('orden')
     
     @property
     def videos_activos(self):
-        """Retorna todos los videos activos del material, ordenados por orden."""
+        """
+        Retorna todos los videos activos del material, ordenados por orden.
+        Si ya se precargaron (``Prefetch('videos', ...)``) no vuelve a consultar.
+        """
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('videos')
+        if prefetched is not None:
+            return [item for item in prefetched if item.activo]
         return self.videos.filter(activo=True).order_by('orden')
     
     @property
     def presentaciones_activas(self):
-        """Retorna todas las presentaciones activas del material, ordenadas por orden."""
+        """
+        Retorna todas las presentaciones activas del material, ordenadas por orden.
+        Si ya se precargaron (``Prefetch('presentaciones', ...)``) no vuelve a consultar.
+        """
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('presentaciones')
+        if prefetched is not None:
+            return [item for item in prefetched if item.activo]
         return self.presentaciones.filter(activo=True).order_by('orden')
 
 
@@ -671,6 +865,13 @@ class MaterialPDF(models.Model):
         help_text="Nombre descriptivo del PDF (opcional, si no se proporciona se usará el nombre del archivo)",
         blank=True
     )
+    nombre_archivo = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name="Nombre del archivo subido",
+        help_text="Nombre original del archivo (con media direccionada por contenido la ruta es su hash)"
+    )
     orden = models.IntegerField(
         default=0,
         verbose_name="Orden",
@@ -696,8 +897,20 @@ class MaterialPDF(models.Model):
         ]
 
     def __str__(self):
-        nombre = self.nombre if self.nombre else self.archivo.name.split('/')[-1]
-        return f"{nombre} - {self.material.titulo}"
+        return f"{self.nombre or self.nombre_descarga} - {self.material.titulo}"
+
+    def save(self, *args, **kwargs):
+        """Recuerda el nombre original del archivo al subir uno nuevo."""
+        if self.archivo and not self.archivo._committed:
+            self.nombre_archivo = os.path.basename(self.archivo.name)[:255]
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'nombre_archivo'}
+        super().save(*args, **kwargs)
+
+    @property
+    def nombre_descarga(self):
+        """Nombre con que se descarga el archivo (el original si se conoce)."""
+        return self.nombre_archivo or os.path.basename(self.archivo.name)
 
 
 class MaterialVideo(models.Model):
@@ -719,6 +932,27 @@ class MaterialVideo(models.Model):
         blank=True,
         null=True
     )
+    video_provider = models.CharField(
+        max_length=10,
+        choices=PROVIDER_CHOICES,
+        blank=True,
+        editable=False,
+        verbose_name="Proveedor de Video",
+        help_text="Calculado al guardar a partir de la URL de video"
+    )
+    video_id = models.CharField(
+        max_length=32,
+        blank=True,
+        editable=False,
+        verbose_name="ID de Video",
+        help_text="Calculado al guardar a partir de la URL de video"
+    )
+    video_embed_url = models.URLField(
+        blank=True,
+        editable=False,
+        verbose_name="URL de Inserción",
+        help_text="Calculado al guardar a partir de la URL de video"
+    )
     video_archivo = models.FileField(
         upload_to='materiales/videos/',
         verbose_name="Archivo de Video",
@@ -754,6 +988,7 @@ class MaterialVideo(models.Model):
         ordering = ['material', 'orden', 'nombre']
         indexes = [
             models.Index(fields=['material', 'orden', 'activo']),
+            models.Index(fields=['video_provider', 'video_id']),
         ]
 
     def __str__(self):
@@ -766,34 +1001,26 @@ class MaterialVideo(models.Model):
         if not self.video_url and not self.video_archivo:
             raise ValidationError('Debe proporcionar una URL de video o un archivo de video.')
 
+    def update_video_embed(self):
+        """Recalcula proveedor, ID y URL de inserción a partir de ``video_url``."""
+        for field, value in video_embed_fields(self.video_url).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        """Analiza la URL de video una sola vez, al guardar."""
+        self.update_video_embed()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'video_url' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | VIDEO_EMBED_FIELDS
+        super().save(*args, **kwargs)
+
     def get_youtube_video_id(self):
-        """Extrae el ID del video de YouTube desde la URL."""
-        if not self.video_url or 'youtube.com' not in self.video_url and 'youtu.be' not in self.video_url:
-            return None
-        
-        import re
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([a-zA-Z0-9_-]{11})',
-            r'youtube\.com\/embed\/([a-zA-Z0-9_-]{11})',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, self.video_url)
-            if match:
-                return match.group(1)
-        return None
+        """ID del video de YouTube (precalculado al guardar)."""
+        return self.video_id if self.video_provider == YOUTUBE else None
 
     def get_vimeo_video_id(self):
-        """Extrae el ID del video de Vimeo desde la URL."""
-        if not self.video_url or 'vimeo.com' not in self.video_url:
-            return None
-        
-        import re
-        pattern = r'vimeo\.com\/(?:.*\/)?(\d+)'
-        match = re.search(pattern, self.video_url)
-        if match:
-            return match.group(1)
-        return None
+        """ID del video de Vimeo (precalculado al guardar)."""
+        return self.video_id if self.video_provider == VIMEO else None
 
 
 class MaterialPresentacion(models.Model):
@@ -819,6 +1046,13 @@ class MaterialPresentacion(models.Model):
         help_text="Nombre descriptivo de la presentación (opcional)",
         blank=True
     )
+    nombre_archivo = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name="Nombre del archivo subido",
+        help_text="Nombre original del archivo (con media direccionada por contenido la ruta es su hash)"
+    )
     orden = models.IntegerField(
         default=0,
         verbose_name="Orden",
@@ -844,5 +1078,92 @@ class MaterialPresentacion(models.Model):
         ]
 
     def __str__(self):
-        nombre = self.nombre if self.nombre else self.archivo.name.split('/')[-1]
-        return f"{nombre} - {self.material.titulo}"
+        return f"{self.nombre or self.nombre_descarga} - {self.material.titulo}"
+
+    def save(self, *args, **kwargs):
+        """Recuerda el nombre original del archivo al subir uno nuevo."""
+        if self.archivo and not self.archivo._committed:
+            self.nombre_archivo = os.path.basename(self.archivo.name)[:255]
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'nombre_archivo'}
+        super().save(*args, **kwargs)
+
+    @property
+    def nombre_descarga(self):
+        """Nombre con que se descarga el archivo (el original si se conoce)."""
+        return self.nombre_archivo or os.path.basename(self.archivo.name)
+
+
+class MediaBlob(models.Model):
+    """
+    Archivo de media guardado por ``ContentAddressedStorage`` (``core/storage.py``).
+    Las filas que lo usan se buscan en la base de datos al borrarlo (``is_referenced``).
+    """
+    nombre = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name="Nombre",
+        help_text="Ruta dentro de MEDIA_ROOT (cas/<h[:2]>/<sha256><ext>)"
+    )
+    hash = models.CharField(
+        max_length=64,
+        db_index=True,
+        verbose_name="SHA-256"
+    )
+    tamaño = models.BigIntegerField(
+        verbose_name="Tamaño (bytes)"
+    )
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Fecha de creación"
+    )
+
+    class Meta:
+        verbose_name = "Blob de Media"
+        verbose_name_plural = "Blobs de Media"
+        ordering = ['nombre']
+
+    def __str__(self):
+        return self.nombre
+
+
+class SearchIndexEntry(models.Model):
+    """
+    Entrada del índice invertido de búsqueda (``core/search.py``): un término
+    normalizado de un documento y su peso. Se mantiene desde ``core.signals``.
+    """
+    TIPO_CHOICES = [
+        ('tematica', 'Temática'),
+        ('material', 'Material'),
+        ('hito', 'Hito'),
+    ]
+
+    termino = models.CharField(
+        max_length=64,
+        verbose_name="Término"
+    )
+    tipo = models.CharField(
+        max_length=10,
+        choices=TIPO_CHOICES,
+        verbose_name="Tipo de documento"
+    )
+    objeto_id = models.PositiveIntegerField(
+        verbose_name="ID del documento"
+    )
+    peso = models.PositiveIntegerField(
+        default=1,
+        verbose_name="Peso"
+    )
+
+    class Meta:
+        verbose_name = "Entrada del Índice de Búsqueda"
+        verbose_name_plural = "Entradas del Índice de Búsqueda"
+        constraints = [
+            models.UniqueConstraint(fields=['termino', 'tipo', 'objeto_id'], name='core_searchindex_unique_term'),
+        ]
+        indexes = [
+            models.Index(fields=['tipo', 'objeto_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.termino} -> {self.tipo} #{self.objeto_id} ({self.peso})"
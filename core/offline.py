@@ -0,0 +1,62 @@
+"""
+Manifiesto de precaché del material de clase para el service worker (``/sw.js``).
+
+El manifiesto lista la URL de cada ``MaterialPDF`` y ``MaterialPresentacion``
+activos junto con una revisión de su contenido. El service worker sirve esos
+archivos desde su caché y solo los vuelve a descargar cuando cambia la revisión.
+
+Se guarda en la caché de Django bajo la versión del espacio ``'material'``, que
+``core.signals`` incrementa cada vez que se guarda o borra una temática, un
+material o uno de sus archivos. Su ``version`` (y el ETag) es un hash de la
+lista de archivos, de modo que cambia exactamente cuando cambia el contenido,
+sea cual sea el proceso que lo reconstruye.
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+
+from .caching import versioned_key
+from .models import MaterialPDF, MaterialPresentacion
+from .storage import digest_from_name, is_cas_name
+
+NAMESPACE = 'material'
+# Con LocMemCache cada proceso tiene su propia versión y no ve los cambios hechos
+# en otro: hasta que caduque, ese worker sirve (y valida con su ETag) el manifiesto anterior
+MANIFEST_TIMEOUT = 60 * 5
+
+
+def file_revision(field_file):
+    """Revisión del contenido: el hash si es CAS, si no tamaño y fecha de modificación."""
+    if is_cas_name(field_file.name):
+        return digest_from_name(field_file.name)
+    storage = field_file.storage
+    modified = storage.get_modified_time(field_file.name)
+    return f'{storage.size(field_file.name)}-{int(modified.timestamp())}'
+
+
+def build_manifest():
+    files = []
+    for model in (MaterialPDF, MaterialPresentacion):
+        rows = model.objects.filter(
+            activo=True, material__activo=True, material__tematica__activo=True,
+        ).exclude(archivo='').order_by('material__tematica__orden', 'material__orden', 'orden')
+        for row in rows.only('archivo').iterator():
+            try:
+                revision = file_revision(row.archivo)
+            except OSError:
+                # Archivo ausente en disco: mejor no precachear un 404
+                continue
+            files.append({'url': row.archivo.url, 'revision': revision})
+    digest = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:16]
+    return {'version': digest, 'files': files}
+
+
+def get_manifest():
+    """Manifiesto actual, reconstruido solo cuando cambia la versión del material."""
+    key = versioned_key(NAMESPACE, 'precache')
+    manifest = cache.get(key)
+    if manifest is None:
+        manifest = build_manifest()
+        cache.set(key, manifest, MANIFEST_TIMEOUT)
+    return manifest
@@ -0,0 +1,184 @@
+"""
+Perfilado bajo demanda de peticiones concretas, solo para staff.
+
+Una petición se perfila cuando trae un token firmado en el parámetro
+``?_profile=`` o en la cabecera ``X-Profile-Token`` y el usuario autenticado es
+el mismo miembro del staff que generó el token. Se ejecuta bajo ``cProfile``
+(o bajo ``pyinstrument`` si está instalado y se pide ``_profile_mode=sample``) y
+el resultado se guarda en ``PROFILING_ROOT`` junto a un JSON con las funciones
+más costosas, que se listan en el panel de staff.
+"""
+import cProfile
+import json
+import logging
+import pstats
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None  # pyinstrument es opcional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PARAM = '_profile'
+MODE_PARAM = '_profile_mode'
+TOKEN_HEADER = 'HTTP_X_PROFILE_TOKEN'
+TOKEN_SALT = 'core.profiling'
+TOP_FUNCTIONS = 25
+
+
+def get_profiles_root():
+    return Path(getattr(settings, 'PROFILING_ROOT', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def make_token(user):
+    """Token firmado que solo sirve para el usuario que lo generó."""
+    return signing.dumps({'u': user.pk}, salt=TOKEN_SALT)
+
+
+def token_is_valid(token, user):
+    max_age = getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600)
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    return data.get('u') == user.pk
+
+
+def top_functions(profiler, limit=TOP_FUNCTIONS):
+    """Funciones ordenadas por tiempo acumulado."""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': function,
+            'location': f'{filename}:{line}',
+            'ncalls': ncalls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['cumtime_ms'], reverse=True)
+    return rows[:limit]
+
+
+def list_profiles(limit=100):
+    """Metadatos de los perfiles guardados, del más reciente al más antiguo."""
+    root = get_profiles_root()
+    if not root.exists():
+        return []
+    profiles = []
+    for meta_path in sorted(root.glob('*.json'), reverse=True)[:limit]:
+        try:
+            profiles.append(json.loads(meta_path.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def get_profile_file(profile_id):
+    """Ruta del .prof/.html de un perfil, o None si no existe o el id no es válido."""
+    if not profile_id.replace('-', '').isalnum():
+        return None
+    root = get_profiles_root()
+    for suffix in ('.prof', '.html'):
+        path = root / f'{profile_id}{suffix}'
+        if path.exists():
+            return path
+    return None
+
+
+def _prune(root):
+    keep = getattr(settings, 'PROFILING_MAX_FILES', 50)
+    metas = sorted(root.glob('*.json'), reverse=True)
+    for meta_path in metas[keep:]:
+        for suffix in ('.json', '.prof', '.html'):
+            meta_path.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def _consume_streaming(response):
+    """Materializa una respuesta streaming para que su generación quede dentro del perfil."""
+    if getattr(response, 'streaming', False) and not getattr(response, 'is_async', False):
+        response.streaming_content = [b''.join(response.streaming_content)]
+
+
+class ProfilingMiddleware:
+    """Va después de AuthenticationMiddleware; sin token no añade ningún coste."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.GET.get(TOKEN_PARAM) or request.META.get(TOKEN_HEADER)
+        if not token or not request.user.is_staff or not token_is_valid(token, request.user):
+            return self.get_response(request)
+
+        mode = request.GET.get(MODE_PARAM, 'cprofile')
+        if mode == 'sample' and SamplingProfiler is not None:
+            return self._profile_sampling(request)
+        return self._profile_cprofile(request)
+
+    def _profile_cprofile(self, request):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Otro perfilador activo en este hilo: atender la petición sin perfilar
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+            _consume_streaming(response)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - start
+
+        profile_id, root = self._new_profile_id()
+        profiler.dump_stats(str(root / f'{profile_id}.prof'))
+        self._save_meta(root, profile_id, request, response, duration, 'cprofile', top_functions(profiler))
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    def _profile_sampling(self, request):
+        profiler = SamplingProfiler()
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+            _consume_streaming(response)
+        finally:
+            profiler.stop()
+        duration = time.perf_counter() - start
+
+        profile_id, root = self._new_profile_id()
+        (root / f'{profile_id}.html').write_text(profiler.output_html(), encoding='utf-8')
+        self._save_meta(root, profile_id, request, response, duration, 'sample', [])
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    def _new_profile_id(self):
+        root = get_profiles_root()
+        root.mkdir(parents=True, exist_ok=True)
+        return f'{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}', root
+
+    def _save_meta(self, root, profile_id, request, response, duration, mode, functions):
+        meta = {
+            'id': profile_id,
+            'mode': mode,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'user': request.user.get_username(),
+            'duration_ms': round(duration * 1000, 2),
+            'created': timezone.now().isoformat(),
+            'top_functions': functions,
+        }
+        (root / f'{profile_id}.json').write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+        _prune(root)
+        logger.info('Perfil %s capturado para %s %s', profile_id, request.method, request.path)
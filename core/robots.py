@@ -1,7 +1,10 @@
 from django.http import HttpResponse
 from django.views.decorators.http import require_GET
 
+from .compression import compressed_page
+
 @require_GET
+@compressed_page(lambda request: [])
 def robots_txt(request):
     """Generate robots.txt file."""
     lines = [
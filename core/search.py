@@ -0,0 +1,192 @@
+"""
+Búsqueda de texto sobre el material de clase y los hitos.
+
+Índice invertido propio (``SearchIndexEntry``): una fila por término y
+documento con un peso según el campo donde aparece. Funciona igual en MySQL y
+en SQLite y se mantiene al día desde ``core.signals`` cada vez que se guarda o
+borra una temática, un material (o uno de sus archivos), un hito o una faceta.
+``manage.py rebuild_search_index`` lo reconstruye desde cero.
+
+Los términos se normalizan sin tildes y en minúsculas; todos los términos de la
+consulta deben aparecer en el documento y el último se busca como prefijo para
+que funcione mientras se escribe.
+"""
+import re
+import unicodedata
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.apps import apps as global_apps
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+
+TEMATICA = 'tematica'
+MATERIAL = 'material'
+HITO = 'hito'
+
+# Peso de cada campo en la puntuación
+WEIGHTS = {'titulo': 5, 'nombre': 3, 'descripcion': 1}
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+STOPWORDS = {
+    'al', 'como', 'con', 'de', 'del', 'el', 'en', 'es', 'la', 'las', 'lo', 'los',
+    'mas', 'no', 'or', 'para', 'por', 'que', 'se', 'sin', 'su', 'sus', 'un', 'una', 'y',
+}
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Minúsculas y sin tildes ("Técnica" -> "tecnica")."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(normalize(text))
+        if len(token) >= MIN_TERM_LENGTH and token not in STOPWORDS
+    ]
+
+
+def weigh(fields):
+    """``{término: peso}`` a partir de pares ``(texto, campo)``."""
+    weights = Counter()
+    for text, field in fields:
+        for token in tokenize(text):
+            weights[token] += WEIGHTS[field]
+    return weights
+
+
+# ==================== DOCUMENTOS ====================
+
+def tematica_fields(tematica):
+    return [(tematica.titulo, 'titulo'), (tematica.descripcion, 'descripcion')]
+
+
+def material_fields(material):
+    fields = [(material.titulo, 'titulo'), (material.descripcion, 'descripcion')]
+    for related in ('pdfs', 'videos', 'presentaciones'):
+        for nombre in getattr(material, related).filter(activo=True).exclude(nombre='').values_list('nombre', flat=True):
+            fields.append((nombre, 'nombre'))
+    return fields
+
+
+def milestone_fields(milestone):
+    return [(milestone.titulo, 'titulo'), (milestone.descripcion, 'descripcion')]
+
+
+def _entries(apps, tipo, pk, fields):
+    SearchIndexEntry = apps.get_model('core', 'SearchIndexEntry')
+    return [
+        SearchIndexEntry(termino=term, tipo=tipo, objeto_id=pk, peso=peso)
+        for term, peso in weigh(fields).items()
+    ]
+
+
+def remove(tipo, pk, apps=global_apps):
+    apps.get_model('core', 'SearchIndexEntry').objects.filter(tipo=tipo, objeto_id=pk).delete()
+
+
+def index_material(material, apps=global_apps):
+    """(Re)indexa un material; los inactivos (o de una temática inactiva) salen del índice."""
+    with transaction.atomic():
+        remove(MATERIAL, material.pk, apps)
+        if material.activo and material.tematica.activo:
+            apps.get_model('core', 'SearchIndexEntry').objects.bulk_create(
+                _entries(apps, MATERIAL, material.pk, material_fields(material))
+            )
+
+
+def index_tematica(tematica, apps=global_apps):
+    """(Re)indexa una temática y sus materiales, que dependen de que esté activa."""
+    with transaction.atomic():
+        remove(TEMATICA, tematica.pk, apps)
+        if tematica.activo:
+            apps.get_model('core', 'SearchIndexEntry').objects.bulk_create(
+                _entries(apps, TEMATICA, tematica.pk, tematica_fields(tematica))
+            )
+        for material in tematica.materiales.all():
+            material.tematica = tematica
+            index_material(material, apps)
+
+
+def index_milestone(milestone, apps=global_apps):
+    """(Re)indexa un hito; los inactivos (o de una faceta inactiva) salen del índice."""
+    with transaction.atomic():
+        remove(HITO, milestone.pk, apps)
+        if milestone.activo and milestone.faceta.activo:
+            apps.get_model('core', 'SearchIndexEntry').objects.bulk_create(
+                _entries(apps, HITO, milestone.pk, milestone_fields(milestone))
+            )
+
+
+def index_facet(facet, apps=global_apps):
+    """Reindexa los hitos de una faceta (su visibilidad depende de la faceta)."""
+    with transaction.atomic():
+        for milestone in facet.hitos.all():
+            milestone.faceta = facet
+            index_milestone(milestone, apps)
+
+
+def rebuild(apps=global_apps):
+    """Reconstruye el índice completo. Devuelve el número de entradas creadas."""
+    SearchIndexEntry = apps.get_model('core', 'SearchIndexEntry')
+    Tematica = apps.get_model('core', 'Tematica')
+    Material = apps.get_model('core', 'Material')
+    Milestone = apps.get_model('core', 'Milestone')
+    entries = []
+    for tematica in Tematica.objects.filter(activo=True).iterator():
+        entries.extend(_entries(apps, TEMATICA, tematica.pk, tematica_fields(tematica)))
+    materiales = Material.objects.filter(activo=True, tematica__activo=True).prefetch_related('pdfs', 'videos', 'presentaciones')
+    for material in materiales:
+        entries.extend(_entries(apps, MATERIAL, material.pk, material_fields(material)))
+    for milestone in Milestone.objects.filter(activo=True, faceta__activo=True).iterator():
+        entries.extend(_entries(apps, HITO, milestone.pk, milestone_fields(milestone)))
+    with transaction.atomic():
+        SearchIndexEntry.objects.all().delete()
+        SearchIndexEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+# ==================== CONSULTA ====================
+
+def ranked(query, tipos):
+    """
+    Queryset de ``{'tipo', 'objeto_id', 'score'}`` de los documentos de ``tipos``
+    que contienen todos los términos de ``query``, sin ordenar. None si la
+    consulta no tiene términos útiles.
+    """
+    from .models import SearchIndexEntry
+
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not tokens:
+        return None
+    conditions = [Q(termino=token) for token in tokens[:-1]] + [Q(termino__startswith=tokens[-1])]
+    matches = {
+        f'match_{i}': Max(Case(When(condition, then=1), default=0, output_field=IntegerField()))
+        for i, condition in enumerate(conditions)
+    }
+    return (
+        SearchIndexEntry.objects
+        .filter(reduce(or_, conditions), tipo__in=tipos)
+        .values('tipo', 'objeto_id')
+        .annotate(score=Sum('peso'), **matches)
+        .filter(**{name: 1 for name in matches})
+    )
+
+
+def search(query, page=1, per_page=10, tipos=(TEMATICA, MATERIAL)):
+    """
+    Página (``django.core.paginator.Page``) de ``{'tipo', 'objeto_id', 'score'}``
+    ordenados por relevancia, o None si la consulta no tiene términos útiles.
+    """
+    results = ranked(query, tipos)
+    if results is None:
+        return None
+    return Paginator(results.order_by('-score', 'tipo', 'objeto_id'), per_page).get_page(page)
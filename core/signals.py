@@ -0,0 +1,147 @@
+"""
+Receptores de señales de la app ``core``.
+Se registran en ``CoreConfig.ready()``.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import catalog, offline, search, sitemaps, timeline, transcoding
+from .caching import bump_version
+from .facet_sections import facet_namespace
+from .models import (
+    ContactMessage, Facet, Material, MaterialPDF, MaterialPresentacion, MaterialVideo, Milestone, MilestoneImage,
+    SiteSettings, Tematica,
+)
+
+
+@receiver(post_save, sender=Milestone)
+@receiver(post_save, sender=SiteSettings)
+def schedule_video_transcode(sender, instance, raw=False, **kwargs):
+    """Encola la generación de versiones comprimidas si cambió el video subido."""
+    if not raw:
+        transcoding.schedule(instance)
+
+
+@receiver([post_save, post_delete], sender=Tematica)
+@receiver([post_save, post_delete], sender=Material)
+@receiver([post_save, post_delete], sender=MaterialPDF)
+@receiver([post_save, post_delete], sender=MaterialVideo)
+@receiver([post_save, post_delete], sender=MaterialPresentacion)
+def invalidate_material_precache(sender, **kwargs):
+    """Fuerza a regenerar el manifiesto de precaché del material de clase."""
+    bump_version(offline.NAMESPACE)
+
+
+@receiver(post_save, sender=Tematica)
+def index_tematica(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_tematica(instance)
+
+
+@receiver(post_save, sender=Material)
+def index_material(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_material(instance)
+
+
+@receiver(post_save, sender=MaterialPDF)
+@receiver(post_save, sender=MaterialVideo)
+@receiver(post_save, sender=MaterialPresentacion)
+@receiver(post_delete, sender=MaterialPDF)
+@receiver(post_delete, sender=MaterialVideo)
+@receiver(post_delete, sender=MaterialPresentacion)
+def index_material_attachment(sender, instance, raw=False, **kwargs):
+    """Los nombres de los archivos se indexan dentro de su material."""
+    if raw:
+        return
+    material = Material.objects.select_related('tematica').filter(pk=instance.material_id).first()
+    if material is not None:
+        search.index_material(material)
+
+
+@receiver(post_delete, sender=Tematica)
+def unindex_tematica(sender, instance, **kwargs):
+    search.remove(search.TEMATICA, instance.pk)
+
+
+@receiver(post_delete, sender=Material)
+def unindex_material(sender, instance, **kwargs):
+    search.remove(search.MATERIAL, instance.pk)
+
+
+@receiver(post_save, sender=Milestone)
+def index_milestone(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_milestone(instance)
+
+
+@receiver(post_save, sender=Facet)
+def index_facet(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_facet(instance)
+
+
+@receiver(post_delete, sender=Milestone)
+def unindex_milestone(sender, instance, **kwargs):
+    search.remove(search.HITO, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Facet)
+@receiver([post_save, post_delete], sender=Milestone)
+def invalidate_timeline(sender, **kwargs):
+    """Invalida los recuentos por año y las páginas de la línea de tiempo en caché."""
+    bump_version(timeline.NAMESPACE)
+
+
+@receiver([post_save, post_delete], sender=SiteSettings)
+def invalidate_site_settings(sender, **kwargs):
+    bump_version(SiteSettings.CACHE_NAMESPACE)
+
+
+@receiver([post_save, post_delete], sender=Facet)
+@receiver([post_save, post_delete], sender=Milestone)
+def invalidate_facet_catalog(sender, **kwargs):
+    bump_version(catalog.NAMESPACE)
+
+
+@receiver([post_save, post_delete], sender=Facet)
+@receiver([post_save, post_delete], sender=Milestone)
+def invalidate_sitemap(sender, **kwargs):
+    bump_version(sitemaps.NAMESPACE)
+
+
+@receiver([post_save, post_delete], sender=Facet)
+@receiver([post_save, post_delete], sender=Milestone)
+@receiver([post_save, post_delete], sender=ContactMessage)
+def invalidate_staff_dashboard(sender, **kwargs):
+    """Invalida los recuentos y últimas entradas del dashboard de staff."""
+    bump_version('dashboard')
+
+
+@receiver([post_save, post_delete], sender=Facet)
+def invalidate_facet_section(sender, instance, **kwargs):
+    bump_version(facet_namespace(instance.pk))
+
+
+@receiver(pre_save, sender=Milestone)
+def remember_milestone_facet(sender, instance, raw=False, **kwargs):
+    """Guarda la faceta anterior: si el hito cambia de faceta hay que invalidar las dos."""
+    if instance.pk and not raw:
+        instance._faceta_anterior_id = (
+            Milestone.objects.filter(pk=instance.pk).values_list('faceta_id', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Milestone)
+def invalidate_milestone_facet_section(sender, instance, **kwargs):
+    bump_version(facet_namespace(instance.faceta_id))
+    previous = getattr(instance, '_faceta_anterior_id', None)
+    if previous is not None and previous != instance.faceta_id:
+        bump_version(facet_namespace(previous))
+
+
+@receiver([post_save, post_delete], sender=MilestoneImage)
+def invalidate_image_facet_section(sender, instance, **kwargs):
+    faceta_id = Milestone.objects.filter(pk=instance.hito_id).values_list('faceta_id', flat=True).first()
+    if faceta_id is not None:
+        bump_version(facet_namespace(faceta_id))
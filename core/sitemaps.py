@@ -1,6 +1,14 @@
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps.views import sitemap
 from django.urls import reverse
-from .models import Facet
+from django.views.decorators.http import require_GET
+
+from .caching import get_version
+from .catalog import get_catalog
+from .compression import compressed_page
+
+NAMESPACE = 'sitemap'
+CACHE_TIMEOUT = 60 * 60
 
 class StaticViewSitemap(Sitemap):
     """Sitemap para páginas estáticas."""
@@ -19,10 +27,26 @@ class FacetSitemap(Sitemap):
     priority = 0.8
 
     def items(self):
-        return Facet.objects.filter(activo=True)
+        return list(get_catalog())
 
     def location(self, obj):
-        return reverse('core:index') + f'#facet-{obj.slug}'
+        return reverse('core:facet_detail', args=[obj.slug])
     
     def lastmod(self, obj):
-        return obj.fecha_actualizacion
+        return obj.actualizado
+
+
+sitemaps = {
+    'static': StaticViewSitemap,
+    'facets': FacetSitemap,
+}
+
+
+@require_GET
+@compressed_page(lambda request: [get_version(NAMESPACE)], CACHE_TIMEOUT, query_params=('p',))
+def sitemap_xml(request):
+    """
+    ``sitemap.xml`` en la caché de páginas comprimidas hasta que cambia una
+    faceta o un hito (versión ``'sitemap'``).
+    """
+    return sitemap(request, sitemaps)
@@ -0,0 +1,138 @@
+"""
+Almacenamiento de media direccionado por contenido.
+
+``ContentAddressedStorage`` guarda cada archivo como ``cas/<h[:2]>/<sha256><ext>``
+e ignora la ruta de ``upload_to``: dos subidas idénticas (el mismo PDF en dos
+materiales, la misma foto en dos hitos) comparten un único archivo en disco.
+Cada blob se registra en ``MediaBlob``. No se llevan contadores (Django no
+avisa al storage al borrar o reemplazar filas): ``delete()`` comprueba en la
+base de datos que ninguna fila use ya el archivo, igual que ``gc_media``.
+
+Como el nombre depende del contenido, las URLs bajo ``MEDIA_URL + 'cas/'`` son
+inmutables y pueden servirse con ``Cache-Control: public, max-age=31536000,
+immutable``. Los archivos subidos antes de activarlo siguen funcionando; ``manage.py
+dedupe_media`` los migra al esquema direccionado por contenido.
+"""
+import hashlib
+import os
+import shutil
+import uuid
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db.models import FileField
+
+CAS_PREFIX = 'cas/'
+
+
+def hash_file(file):
+    """SHA-256 de un ``File`` de Django (o cualquier objeto con ``chunks()``)."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cas_name(digest, original_name):
+    extension = os.path.splitext(original_name)[1].lower()
+    return f'{CAS_PREFIX}{digest[:2]}/{digest}{extension}'
+
+
+def is_cas_name(name):
+    return bool(name) and name.startswith(CAS_PREFIX)
+
+
+def digest_from_name(name):
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def file_fields():
+    """``(modelo, campo)`` de todos los FileField/ImageField de los modelos instalados."""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, FileField):
+                yield model, field
+
+
+def is_referenced(name):
+    """True si alguna fila de algún FileField/ImageField usa ``name``."""
+    return any(model._default_manager.filter(**{field.name: name}).exists() for model, field in file_fields())
+
+
+def iter_references():
+    """Nombre de cada archivo referenciado desde la base de datos (con repeticiones)."""
+    for model, field in file_fields():
+        queryset = model._default_manager.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+        yield from queryset.values_list(field.name, flat=True).iterator()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """``FileSystemStorage`` que deduplica por SHA-256."""
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre definitivo se decide en _save a partir del contenido
+        return name
+
+    def _save(self, name, content):
+        digest = hash_file(content)
+        name = cas_name(digest, name)
+        if not self.exists(name):
+            # Se escribe a un temporal y se renombra: dos subidas simultáneas del
+            # mismo contenido terminan en el mismo archivo sin pisarse a medias
+            temp_name = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+            os.replace(self.path(temp_name), self.path(name))
+        else:
+            self.touch(name)
+        self.register(name, content.size)
+        return name
+
+    def adopt(self, name):
+        """
+        Copia un archivo existente fuera de ``cas/`` a su ruta direccionada por
+        contenido y devuelve el nuevo nombre. No toca el original.
+        """
+        with self.open(name, 'rb') as fh:
+            digest = hash_file(fh)
+        new_name = cas_name(digest, name)
+        if not self.exists(new_name):
+            target = self.path(new_name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temp = f'{target}.{uuid.uuid4().hex}.tmp'
+            try:
+                os.link(self.path(name), temp)
+            except OSError:
+                shutil.copy2(self.path(name), temp)
+            os.replace(temp, target)
+        else:
+            self.touch(new_name)
+        return new_name
+
+    def touch(self, name):
+        """
+        Actualiza la fecha de modificación de un blob reutilizado: ``gc_media``
+        no borra archivos dentro del periodo de gracia, y un blob huérfano que se
+        vuelve a subir deja así de parecer antiguo.
+        """
+        try:
+            os.utime(self.path(name))
+        except OSError:
+            pass
+
+    def register(self, name, size=None):
+        MediaBlob = apps.get_model('core', 'MediaBlob')
+        MediaBlob.objects.get_or_create(
+            nombre=name,
+            defaults={'hash': digest_from_name(name), 'tamaño': size if size is not None else self.size(name)},
+        )
+
+    def delete(self, name):
+        """
+        Borra el archivo solo si ya no lo referencia ninguna fila (otro hito o
+        material puede compartirlo). Hay que llamarlo después de guardar la fila
+        que dejó de usarlo; si no, el archivo queda para ``gc_media``.
+        """
+        if is_referenced(name):
+            return
+        if is_cas_name(name):
+            apps.get_model('core', 'MediaBlob').objects.filter(nombre=name).delete()
+        super().delete(name)
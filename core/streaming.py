@@ -0,0 +1,57 @@
+"""
+Renderizado en streaming de páginas con secciones pesadas.
+
+``stream_template`` renderiza la plantilla con ``SECTIONS_MARKER`` en la
+variable ``streamed_sections`` y devuelve una ``StreamingHttpResponse`` que
+envía primero lo anterior al marcador (``<head>``, pantalla de carga y hero: el
+navegador ya puede pedir CSS, scripts e imágenes), después cada fragmento de
+``sections`` según se genera y por último el resto de la página.
+
+Con ASGI el iterador se consume de forma asíncrona, pidiendo cada fragmento
+con ``sync_to_async``; si no, Django lo acumularía entero antes de enviarlo.
+Cuando ``compressed_page`` va a guardar la respuesta la pide completa
+(``request._buffer_streaming``) y se devuelve una ``HttpResponse`` normal.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# Etiqueta (no comentario) para que sobreviva a la minificación del HTML
+SECTIONS_MARKER = mark_safe('<streamed-sections></streamed-sections>')
+
+
+def _chunks(head, sections, tail):
+    yield head
+    yield from sections
+    yield tail
+
+
+async def _async_chunks(chunks):
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # Cierra el generador (y libera sus locks) también si el cliente se desconecta
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def stream_template(request, template_name, context, sections):
+    """
+    Respuesta de ``template_name`` con los fragmentos de ``sections`` (iterable de
+    cadenas, que puede consultar la base de datos) en el lugar de ``streamed_sections``.
+    """
+    html = render_to_string(template_name, {**context, 'streamed_sections': SECTIONS_MARKER}, request)
+    head, marker, tail = html.partition(SECTIONS_MARKER)
+    if not marker:
+        raise ValueError(f'{template_name} no muestra la variable streamed_sections.')
+
+    chunks = _chunks(head, sections, tail)
+    if getattr(request, '_buffer_streaming', False):
+        return HttpResponse(''.join(chunks))
+    response = StreamingHttpResponse(_async_chunks(chunks) if isinstance(request, ASGIRequest) else chunks)
+    # Que nginx no acumule la respuesta antes de reenviarla
+    response['X-Accel-Buffering'] = 'no'
+    return response
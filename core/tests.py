@@ -1,3 +1,943 @@
-from django.test import TestCase
+import io
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zipfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from PIL import Image
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages import get_messages
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import parse_http_date
+
+from .caching import LocalCache, bump_version, get_or_set, get_version, local_cache, local_get_or_set
+from . import offline, profiling, search, timeline, transcoding
+from .catalog import NAMESPACE as CATALOG_NAMESPACE, get_catalog
+from .early_hints import EARLY_HINT, EarlyHintsASGIMiddleware
+from .embeds import parse_video_url, video_embed_fields
+from .facet_sections import iter_facet_sections
+from .forms import CustomUserCreationForm, FacetSelectionForm
+from .images import validate_image
+from .sitemaps import FacetSitemap
+from .compression import compressed_page, negotiate
+from .minify import minify_html
+from .models import (
+    Facet, Material, MaterialPDF, MaterialPresentacion, MediaBlob, Milestone, SearchIndexEntry, Tematica, UserProfile,
+)
+from .storage import is_cas_name
+from .streaming import stream_template
+from .timing import RequestTimer, ServerTimingMiddleware
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests'}}
+
+
+@override_settings(CACHES=LOCMEM)
+class GetOrSetStampedeTests(SimpleTestCase):
+    """Muchas peticiones a la vez sobre la misma clave solo recalculan una vez."""
+
+    THREADS = 16
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def compute(self, value):
+        def compute():
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(0.2)
+            return value
+        return compute
+
+    def run_concurrently(self, version, value):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(get_or_set('clave', self.compute(value), version=version))
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_cold_miss_computes_once(self):
+        results = self.run_concurrently(1, 'v1')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['v1'] * self.THREADS)
+
+    def test_new_version_serves_stale_while_one_recomputes(self):
+        get_or_set('clave', self.compute('v1'), version=1)
+        self.calls = 0
+        results = self.run_concurrently(2, 'v2')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results.count('v2'), 1)
+        self.assertEqual(results.count('v1'), self.THREADS - 1)
+        self.assertEqual(get_or_set('clave', self.compute('v3'), version=2), 'v2')
+
+    def test_expired_entry_is_recomputed(self):
+        get_or_set('clave', self.compute('v1'), timeout=0.1, version=1)
+        time.sleep(0.15)
+        self.assertEqual(get_or_set('clave', self.compute('v2'), timeout=0.1, version=1), 'v2')
+        self.assertEqual(self.calls, 2)
+
+
+@override_settings(CACHES=LOCMEM)
+class LocalCacheTests(SimpleTestCase):
+    """La LRU del proceso evita la caché compartida y respeta versiones y tamaño."""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+    def test_hot_key_does_not_leave_the_process(self):
+        self.assertEqual(local_get_or_set('ns', 'k', lambda: 'v1'), 'v1')
+        cache.clear()  # ni la versión ni el valor siguen en la caché compartida
+        self.assertEqual(local_get_or_set('ns', 'k', lambda: 'v2'), 'v1')
+        self.assertEqual(local_cache.stats()['hits'], 1)
+
+    def test_version_bump_from_another_worker_is_seen_after_ttl(self):
+        local_get_or_set('ns', 'k', lambda: 'v1')
+        local_cache.touch('ns', 'k')
+        cache.incr('version:ns')  # otro proceso incrementa la versión
+        self.assertEqual(local_get_or_set('ns', 'k', lambda: 'v2'), 'v1')
+        ttl, local_cache.ttl = local_cache.ttl, 0
+        try:
+            self.assertEqual(local_get_or_set('ns', 'k', lambda: 'v2'), 'v2')
+        finally:
+            local_cache.ttl = ttl
+
+    def test_bump_version_invalidates_local_copy(self):
+        local_get_or_set('ns', 'k', lambda: 'v1')
+        bump_version('ns')
+        self.assertEqual(local_get_or_set('ns', 'k', lambda: 'v2'), 'v2')
+
+    def test_lru_eviction(self):
+        lru = LocalCache(maxsize=2, ttl=60)
+        lru.set('ns', 'a', 1, 'a')
+        lru.set('ns', 'b', 1, 'b')
+        lru.get('ns', 'a')
+        lru.set('ns', 'c', 1, 'c')
+        self.assertIsNone(lru.get('ns', 'b'))
+        self.assertIsNotNone(lru.get('ns', 'a'))
+        self.assertEqual(lru.stats()['evictions'], 1)
+
+
+class AcceptEncodingTests(SimpleTestCase):
+    """Negociación de la variante comprimida según ``Accept-Encoding``."""
+
+    def negotiate(self, header):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header)
+        return negotiate(request, {'gzip': b'', 'br': b''})
+
+    def test_prefers_brotli(self):
+        self.assertEqual(self.negotiate('gzip, deflate, br'), 'br')
+
+    def test_respects_q_zero(self):
+        self.assertEqual(self.negotiate('br;q=0, gzip;q=0.5'), 'gzip')
+        self.assertIsNone(self.negotiate('gzip;q=0'))
+
+    def test_wildcard_and_missing_header(self):
+        self.assertEqual(self.negotiate('*'), 'br')
+        self.assertIsNone(self.negotiate(''))
+
+
+class MinifyHtmlTests(SimpleTestCase):
+    """La minificación no altera bloques donde los espacios importan."""
+
+    def test_collapses_whitespace_and_comments(self):
+        html = '<div>\n    <p>a    b</p>   <!-- nota -->\n</div>'
+        self.assertEqual(minify_html(html), '<div>\n<p>a b</p>\n</div>')
+
+    def test_preserves_pre_textarea_and_script(self):
+        html = '<pre>  x\n  y</pre> <textarea>\n  t</textarea> <script>\n  var a = 1 // c\n  a++</script>'
+        self.assertEqual(minify_html(html), html)
+
+    def test_style_keeps_strings(self):
+        html = '<style>\n  a  {  content: "  /* x */ ";  /* c */ }\n</style>'
+        self.assertEqual(minify_html(html), '<style>a { content: "  /* x */ "; }</style>')
+
+    def test_keeps_conditional_comments(self):
+        self.assertEqual(minify_html('<!--[if IE]><p>x</p><![endif]-->'), '<!--[if IE]><p>x</p><![endif]-->')
+
+
+STREAM_TEMPLATES = [{
+    'BACKEND': 'core.minify.MinifyingDjangoTemplates',
+    'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+        'page.html': '<head>  </head>\n<main>{{ streamed_sections }}</main>  <footer></footer>',
+    })]},
+}]
+
+
+@override_settings(TEMPLATES=STREAM_TEMPLATES, HTML_MINIFY=True)
+class StreamTemplateTests(SimpleTestCase):
+    """La cabecera sale antes de generar las secciones, con WSGI y con ASGI."""
+
+    def sections(self, log):
+        for name in ('a', 'b'):
+            log.append(name)
+            yield f'<section>{name}</section>'
+
+    def test_head_is_sent_before_sections_are_generated(self):
+        log = []
+        response = stream_template(RequestFactory().get('/'), 'page.html', {}, self.sections(log))
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks), b'<head> </head>\n<main>')
+        self.assertEqual(log, [])
+        self.assertEqual(b''.join(chunks), b'<section>a</section><section>b</section></main> <footer></footer>')
+
+    def test_asgi_streams_asynchronously(self):
+        response = stream_template(AsyncRequestFactory().get('/'), 'page.html', {}, self.sections([]))
+        self.assertTrue(response.is_async)
+
+        async def consume():
+            return [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(async_to_sync(consume)()), 4)
+
+    def test_buffered_for_compressed_page(self):
+        request = RequestFactory().get('/')
+        request._buffer_streaming = True
+        response = stream_template(request, 'page.html', {}, self.sections([]))
+        self.assertFalse(response.streaming)
+        self.assertIn(b'<section>b</section></main>', response.content)
+
+
+@override_settings(SERVER_TIMING_ENABLED=True, SERVER_TIMING_PUBLIC=False)
+class ServerTimingVisibilityTests(SimpleTestCase):
+    """``Server-Timing`` solo para el staff, salvo ``SERVER_TIMING_PUBLIC``."""
+
+    def get(self, is_staff):
+        request = RequestFactory().get('/')
+        request.user = type('User', (), {'is_staff': is_staff, 'is_authenticated': is_staff, 'pk': None})()
+        return ServerTimingMiddleware(lambda request: HttpResponse('ok'))(request)
+
+    def test_hidden_from_visitors(self):
+        self.assertFalse(self.get(is_staff=False).has_header('Server-Timing'))
+
+    def test_sent_to_staff(self):
+        self.assertTrue(self.get(is_staff=True).has_header('Server-Timing'))
+
+    @override_settings(SERVER_TIMING_PUBLIC=True)
+    def test_public_setting(self):
+        self.assertTrue(self.get(is_staff=False).has_header('Server-Timing'))
+
+
+class RequestTimerTests(SimpleTestCase):
+    def test_summary_is_in_milliseconds(self):
+        timer = RequestTimer()
+        timer.enter('db')
+        time.sleep(0.02)
+        timer.exit()
+        phases = timer.summary()
+        self.assertGreaterEqual(phases['db'], 20)
+        self.assertLess(phases['db'], 1000)
+        self.assertGreaterEqual(phases['total'], phases['db'])
+
+
+class VideoEmbedTests(SimpleTestCase):
+    def test_youtube_urls(self):
+        for url in (
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42',
+            'https://youtu.be/dQw4w9WgXcQ',
+            'https://www.youtube.com/embed/dQw4w9WgXcQ',
+        ):
+            self.assertEqual(parse_video_url(url), ('youtube', 'dQw4w9WgXcQ'), url)
+        self.assertEqual(
+            video_embed_fields('https://youtu.be/dQw4w9WgXcQ')['video_embed_url'],
+            'https://www.youtube.com/embed/dQw4w9WgXcQ',
+        )
+
+    def test_vimeo_urls(self):
+        self.assertEqual(parse_video_url('https://vimeo.com/76979871'), ('vimeo', '76979871'))
+        self.assertEqual(parse_video_url('https://vimeo.com/channels/staffpicks/76979871'), ('vimeo', '76979871'))
+        self.assertEqual(
+            video_embed_fields('https://vimeo.com/76979871')['video_embed_url'],
+            'https://player.vimeo.com/video/76979871',
+        )
+
+    def test_unknown_or_empty_url(self):
+        empty = {'video_provider': '', 'video_id': '', 'video_embed_url': ''}
+        for url in ('https://example.com/video.mp4', 'https://www.youtube.com/channel/abc', '', None):
+            self.assertEqual(video_embed_fields(url), empty, url)
+
+
+@override_settings(PROFILING_TOKEN_MAX_AGE=3600, PROFILING_MAX_FILES=3)
+class ProfilingTests(TestCase):
+    """Solo el miembro del staff que generó el token perfila sus peticiones."""
+
+    def setUp(self):
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(PROFILING_ROOT=self.root))
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.middleware = profiling.ProfilingMiddleware(lambda request: HttpResponse('ok'))
+
+    def get(self, user, token):
+        request = RequestFactory().get('/', {profiling.TOKEN_PARAM: token})
+        request.user = user
+        return self.middleware(request)
+
+    def test_valid_token_from_staff_is_profiled(self):
+        response = self.get(self.staff, profiling.make_token(self.staff))
+        profile_id = response['X-Profile-Id']
+        self.assertTrue((self.root / f'{profile_id}.prof').exists())
+        self.assertEqual(profiling.list_profiles()[0]['user'], 'staff')
+
+    def test_token_of_another_user_is_ignored(self):
+        other = User.objects.create_user('otro', is_staff=True)
+        self.assertFalse(profiling.token_is_valid(profiling.make_token(other), self.staff))
+        self.assertFalse(self.get(self.staff, profiling.make_token(other)).has_header('X-Profile-Id'))
+
+    def test_expired_token_is_ignored(self):
+        token = profiling.make_token(self.staff)
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 3601):
+            self.assertFalse(profiling.token_is_valid(token, self.staff))
+            self.assertFalse(self.get(self.staff, token).has_header('X-Profile-Id'))
+
+    def test_non_staff_user_is_not_profiled(self):
+        user = User.objects.create_user('visitante')
+        self.assertTrue(profiling.token_is_valid(profiling.make_token(user), user))
+        self.assertFalse(self.get(user, profiling.make_token(user)).has_header('X-Profile-Id'))
+        self.assertEqual(list(self.root.iterdir()), [])
+
+    def test_prune_keeps_the_newest_files(self):
+        for n in range(5):
+            for suffix in ('.json', '.prof'):
+                (self.root / f'2024010{n}-000000-perfil{suffix}').write_text('{}')
+        profiling._prune(self.root)
+        self.assertEqual(
+            sorted(path.name for path in self.root.glob('*.json')),
+            [f'2024010{n}-000000-perfil.json' for n in (2, 3, 4)],
+        )
+        self.assertEqual(len(list(self.root.glob('*.prof'))), 3)
+
+
+class TempMediaMixin:
+    """``MEDIA_ROOT`` en un directorio temporal con ``storage_backend`` como storage por defecto."""
+
+    storage_backend = 'django.core.files.storage.FileSystemStorage'
+
+    def setUp(self):
+        super().setUp()
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media_root,
+            STORAGES={**settings.STORAGES, 'default': {'BACKEND': self.storage_backend}},
+        ))
+        self.media_root = Path(media_root)
+
+
+@override_settings(CACHES=LOCMEM, VIDEO_TRANSCODER='fake')
+class TranscodingTests(TempMediaMixin, TestCase):
+    """Las versiones de un video subido se generan tras el commit con el transcodificador de pruebas."""
+
+    def setUp(self):
+        super().setUp()
+        self.facet = Facet.objects.create(titulo='Música', slug='musica')
+
+    def test_schedule_runs_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            milestone = Milestone.objects.create(faceta=self.facet, titulo='Concierto')
+            milestone.video.save('concierto.mp4', ContentFile(b'video' * 100))
+        self.assertEqual(len(callbacks), 1)
+
+        # Lo mismo que hace el job encolado, pero en este hilo (y esta transacción)
+        self.assertTrue(transcoding.process('core.Milestone', milestone.pk))
+        milestone.refresh_from_db()
+        self.assertEqual(milestone.video_origen, milestone.video.name)
+        for name in transcoding.DERIVATIVES:
+            self.assertTrue(getattr(milestone, f'video_{name}'), name)
+        self.assertFalse(transcoding.needs_transcode(milestone))
+
+        # Al retranscodificar (o con force) las versiones anteriores salen del storage
+        old_names = [getattr(milestone, f'video_{name}').name for name in transcoding.DERIVATIVES]
+        self.assertTrue(transcoding.process('core.Milestone', milestone.pk, force=True))
+        milestone.refresh_from_db()
+        for name, old_name in zip(transcoding.DERIVATIVES, old_names):
+            self.assertNotEqual(getattr(milestone, f'video_{name}').name, old_name)
+            self.assertTrue(default_storage.exists(getattr(milestone, f'video_{name}').name))
+            self.assertFalse(default_storage.exists(old_name), old_name)
+
+        # Sin video, las versiones se vacían y también se borran
+        current = [getattr(milestone, f'video_{name}').name for name in transcoding.DERIVATIVES]
+        Milestone.objects.filter(pk=milestone.pk).update(video='')
+        self.assertTrue(transcoding.process('core.Milestone', milestone.pk))
+        self.assertFalse(any(default_storage.exists(name) for name in current))
+
+    @override_settings(VIDEO_TRANSCODER='off')
+    def test_disabled_transcoder_schedules_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            milestone = Milestone.objects.create(faceta=self.facet, titulo='Concierto')
+            milestone.video.save('concierto.mp4', ContentFile(b'video' * 100))
+        self.assertEqual(callbacks, [])
+
+
+def image_upload(name, size=(40, 20), fmt='JPEG', orientation=None):
+    image = Image.new('RGB', size, 'red')
+    image.paste('blue', (0, 0, size[0] // 2, size[1]))
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{fmt.lower()}')
+
+
+@override_settings(CACHES=LOCMEM, IMAGE_MAX_PIXELS=10_000)
+class ImageUploadTests(TempMediaMixin, TestCase):
+    """La validación va en el campo (antes de crear filas); ``save()`` solo normaliza."""
+
+    def setUp(self):
+        super().setUp()
+        self.facet = Facet.objects.create(titulo='Música', slug='musica')
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+
+    def create_milestone(self, imagen):
+        return self.client.post(reverse('core:staff_milestone_create'), {
+            'faceta': self.facet.pk, 'titulo': 'Concierto', 'imagen': imagen,
+        })
+
+    def assert_rejected(self, imagen, message):
+        response = self.create_milestone(imagen)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(message, [str(m) for m in get_messages(response.wsgi_request)][0])
+        self.assertFalse(Milestone.objects.exists())
+
+    def test_oversized_image_creates_no_row(self):
+        self.assert_rejected(image_upload('grande.jpg', size=(200, 100)), 'el máximo permitido es')
+
+    def test_non_image_file_creates_no_row(self):
+        self.assert_rejected(SimpleUploadedFile('foto.jpg', b'no soy una imagen'), 'no es una imagen válida')
+        with self.assertRaises(ValidationError):
+            validate_image(SimpleUploadedFile('foto.png', b'\x89PNG roto'))
+
+    def test_exif_rotation_is_applied_and_stripped(self):
+        self.assertEqual(self.create_milestone(image_upload('foto.jpg', orientation=6)).status_code, 302)
+        milestone = Milestone.objects.get()
+        self.assertEqual((milestone.imagen_ancho, milestone.imagen_alto), (20, 40))
+        with Image.open(milestone.imagen.path) as stored:
+            self.assertEqual(stored.size, (20, 40))
+            self.assertNotIn(0x0112, stored.getexif())
+
+    def test_webp_stays_webp_with_placeholder(self):
+        milestone = Milestone.objects.create(
+            faceta=self.facet, titulo='Concierto', imagen=image_upload('foto.webp', fmt='WEBP', orientation=3),
+        )
+        self.assertTrue(milestone.imagen.name.endswith('.webp'))
+        with Image.open(milestone.imagen.path) as stored:
+            self.assertEqual(stored.format, 'WEBP')
+        # LQIP: WebP diminuto embebido para reservar el hueco mientras carga la imagen
+        self.assertTrue(milestone.imagen_placeholder.startswith('data:image/webp;base64,'))
+        self.assertLess(len(milestone.imagen_placeholder), 1000)
+
+
+@override_settings(CACHES=LOCMEM)
+class MaterialZipTests(TempMediaMixin, TestCase):
+    """La descarga de una temática es un ZIP válido con sus archivos y se revalida por ETag."""
+
+    def setUp(self):
+        super().setUp()
+        self.tematica = Tematica.objects.create(titulo='Química Orgánica')
+        material = Material.objects.create(tematica=self.tematica, titulo='Ácidos', orden=1)
+        self.files = {
+            '01_Ácidos/Guía.pdf': b'%PDF guia ' * 50,
+            '01_Ácidos/Guía_2.pdf': b'%PDF otra guia',
+            '01_Ácidos/Clase.pptx': b'PK presentacion',
+        }
+        MaterialPDF.objects.create(material=material, nombre='Guía', orden=1,
+                                   archivo=SimpleUploadedFile('a.pdf', self.files['01_Ácidos/Guía.pdf']))
+        MaterialPDF.objects.create(material=material, nombre='Guía', orden=2,
+                                   archivo=SimpleUploadedFile('b.pdf', self.files['01_Ácidos/Guía_2.pdf']))
+        MaterialPresentacion.objects.create(material=material, nombre='Clase',
+                                            archivo=SimpleUploadedFile('c.pptx', self.files['01_Ácidos/Clase.pptx']))
+        user = User.objects.create_user('alumna')
+        UserProfile.objects.create(usuario=user, rol='estudiante')
+        self.client.force_login(user)
+        self.url = reverse('core:material_clase_zip', args=[self.tematica.pk])
+
+    def test_streamed_body_is_a_zip_with_the_material_files(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), list(self.files))
+            for name, content in self.files.items():
+                self.assertEqual(archive.read(name), content)
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"otro"').status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM)
+class ContentAddressedStorageTests(TempMediaMixin, TestCase):
+    """Blobs compartidos entre filas y migración de la media antigua a ``cas/``."""
+
+    storage_backend = 'core.storage.ContentAddressedStorage'
+
+    def setUp(self):
+        super().setUp()
+        tematica = Tematica.objects.create(titulo='Química')
+        self.material = Material.objects.create(tematica=tematica, titulo='Ácidos')
+
+    def pdf(self, archivo):
+        return MaterialPDF.objects.create(material=self.material, archivo=archivo)
+
+    def test_shared_blob_is_deleted_with_its_last_reference(self):
+        first = self.pdf(SimpleUploadedFile('tema1.pdf', b'%PDF mismo contenido'))
+        second = self.pdf(SimpleUploadedFile('tema2.pdf', b'%PDF mismo contenido'))
+        third = self.pdf(first.archivo.name)  # FieldFile existente asignado a otra fila
+        self.assertEqual({first.archivo.name, second.archivo.name}, {third.archivo.name})
+        self.assertEqual(MediaBlob.objects.count(), 1)
+        path = Path(first.archivo.path)
+
+        for row in (first, second):
+            row.delete()
+            default_storage.delete(row.archivo.name)
+            self.assertTrue(path.exists())
+
+        third.delete()
+        default_storage.delete(third.archivo.name)
+        self.assertFalse(path.exists())
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_original_name_is_kept_for_download(self):
+        pdf = self.pdf(SimpleUploadedFile('Guía de ácidos.pdf', b'%PDF guia'))
+        self.assertTrue(is_cas_name(pdf.archivo.name))
+        self.assertEqual(pdf.nombre_descarga, 'Guía de ácidos.pdf')
+
+    def test_dedupe_media_rewrites_references(self):
+        for name in ('materiales/pdfs/a.pdf', 'materiales/pdfs/b.pdf'):
+            path = self.media_root / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b'%PDF copia')
+            self.pdf(name)
+        version = get_version(offline.NAMESPACE)
+
+        call_command('dedupe_media', stdout=StringIO())
+
+        names = set(MaterialPDF.objects.values_list('archivo', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(is_cas_name(name))
+        self.assertTrue((self.media_root / name).exists())
+        self.assertFalse((self.media_root / 'materiales/pdfs/a.pdf').exists())
+        self.assertEqual(set(MaterialPDF.objects.values_list('nombre_archivo', flat=True)), {'a.pdf', 'b.pdf'})
+        self.assertTrue(MediaBlob.objects.filter(nombre=name).exists())
+        # Las filas se reescribieron sin señales: el comando invalida la caché
+        self.assertGreater(get_version(offline.NAMESPACE), version)
+
+
+@override_settings(CACHES=LOCMEM)
+class GcMediaTests(TempMediaMixin, TestCase):
+    """``gc_media`` solo toca huérfanos fuera del periodo de gracia y que haya podido borrar."""
+
+    storage_backend = 'core.storage.ContentAddressedStorage'
+
+    def setUp(self):
+        super().setUp()
+        tematica = Tematica.objects.create(titulo='Química')
+        material = Material.objects.create(tematica=tematica, titulo='Ácidos')
+        self.kept = MaterialPDF.objects.create(material=material, archivo=SimpleUploadedFile('a.pdf', b'%PDF usado'))
+        self.old = self.orphan(b'%PDF viejo', age_hours=48)
+        self.other = self.orphan(b'%PDF otro', age_hours=48)
+        self.recent = self.orphan(b'%PDF reciente', age_hours=1)
+
+    def orphan(self, content, age_hours):
+        name = default_storage.save('materiales/pdfs/x.pdf', ContentFile(content))
+        old = time.time() - age_hours * 3600
+        os.utime(default_storage.path(name), (old, old))
+        return name
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_media', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def exists(self, name):
+        return (self.media_root / name).exists()
+
+    def test_dry_run_only_reports(self):
+        output = self.gc()
+        self.assertIn('Recuperables: 2 archivos', output)
+        self.assertTrue(all(self.exists(name) for name in (self.old, self.other, self.recent)))
+
+    def test_delete_respects_grace_period(self):
+        self.gc('--delete')
+        self.assertFalse(self.exists(self.old))
+        self.assertFalse(self.exists(self.other))
+        self.assertTrue(self.exists(self.recent))
+        self.assertTrue(self.exists(self.kept.archivo.name))
+        self.assertFalse(MediaBlob.objects.filter(nombre__in=[self.old, self.other]).exists())
+
+    def test_reuploaded_blob_is_not_deleted(self):
+        self.assertEqual(default_storage.save('materiales/pdfs/y.pdf', ContentFile(b'%PDF viejo')), self.old)
+        self.gc('--delete')
+        self.assertTrue(self.exists(self.old))
+
+    def test_failed_unlink_keeps_blob_row_and_is_not_counted(self):
+        unlink = Path.unlink
+
+        def failing_unlink(path, *args, **kwargs):
+            if path.name == Path(self.old).name:
+                raise PermissionError('sin permiso')
+            return unlink(path, *args, **kwargs)
+
+        with mock.patch.object(Path, 'unlink', failing_unlink):
+            output = self.gc('--delete')
+        self.assertIn('1 archivos borrados', output)
+        self.assertTrue(self.exists(self.old))
+        self.assertTrue(MediaBlob.objects.filter(nombre=self.old).exists())
+        self.assertFalse(MediaBlob.objects.filter(nombre=self.other).exists())
+
+
+@override_settings(CACHES=LOCMEM)
+class PrecacheManifestTests(TempMediaMixin, TestCase):
+    """La versión del manifiesto depende solo de los archivos listados."""
+
+    def test_version_follows_content(self):
+        tematica = Tematica.objects.create(titulo='Química')
+        material = Material.objects.create(tematica=tematica, titulo='Ácidos')
+        MaterialPDF.objects.create(material=material, archivo=SimpleUploadedFile('a.pdf', b'%PDF a'))
+        first = offline.build_manifest()
+        self.assertEqual(offline.build_manifest()['version'], first['version'])
+
+        MaterialPDF.objects.create(material=material, archivo=SimpleUploadedFile('b.pdf', b'%PDF b'))
+        self.assertNotEqual(offline.build_manifest()['version'], first['version'])
+
+
+class TokenizeTests(SimpleTestCase):
+    def test_normalizes_accents_case_and_stopwords(self):
+        self.assertEqual(search.tokenize('La Técnica del CANTO, y 2 ñandúes'), ['tecnica', 'canto', 'nandues'])
+
+    def test_weights_by_field(self):
+        weights = search.weigh([('Química', 'titulo'), ('química orgánica', 'descripcion')])
+        self.assertEqual(weights, {'quimica': 6, 'organica': 1})
+
+
+@override_settings(CACHES=LOCMEM)
+class SearchIndexTests(TestCase):
+    """Ranking del índice invertido y reindexado desde las señales."""
+
+    def setUp(self):
+        self.tematica = Tematica.objects.create(titulo='Química', descripcion='Reacciones y enlaces')
+        self.material = Material.objects.create(tematica=self.tematica, titulo='Ácidos', descripcion='Química de ácidos')
+
+    def found(self, query, tipos=(search.TEMATICA, search.MATERIAL)):
+        return [(row['tipo'], row['objeto_id']) for row in search.search(query, tipos=tipos).object_list]
+
+    def test_title_ranks_above_description_and_last_term_is_a_prefix(self):
+        self.assertEqual(self.found('quim'), [
+            (search.TEMATICA, self.tematica.pk), (search.MATERIAL, self.material.pk),
+        ])
+        self.assertEqual(self.found('acidos quimica'), [(search.MATERIAL, self.material.pk)])
+        self.assertIsNone(search.search('de la'))
+
+    def test_attachment_names_are_indexed(self):
+        MaterialPDF.objects.create(material=self.material, nombre='Tabla periódica', archivo='a.pdf')
+        self.assertEqual(self.found('periodica'), [(search.MATERIAL, self.material.pk)])
+
+    def test_save_and_delete_reindex(self):
+        self.material.titulo = 'Bases'
+        self.material.save()
+        self.assertEqual(self.found('bases'), [(search.MATERIAL, self.material.pk)])
+        self.assertEqual(self.found('acidos'), [(search.MATERIAL, self.material.pk)])  # sigue en la descripción
+
+        self.tematica.activo = False
+        self.tematica.save()
+        self.assertEqual(self.found('quimica'), [])
+
+        self.tematica.delete()
+        self.assertFalse(SearchIndexEntry.objects.exists())
+
+    def test_milestones_follow_their_facet(self):
+        facet = Facet.objects.create(titulo='Música', slug='musica')
+        milestone = Milestone.objects.create(faceta=facet, titulo='Concierto sinfónico')
+        self.assertEqual(self.found('sinfonico', tipos=[search.HITO]), [(search.HITO, milestone.pk)])
+        milestone.delete()
+        self.assertEqual(self.found('sinfonico', tipos=[search.HITO]), [])
+
+
+@override_settings(CACHES=LOCMEM)
+class MaterialPageSectionsTests(TestCase):
+    def test_each_tematica_is_streamed_after_the_head(self):
+        for orden, titulo in enumerate(('Química', 'Física')):
+            tematica = Tematica.objects.create(titulo=titulo, orden=orden)
+            Material.objects.create(tematica=tematica, titulo=f'Intro {titulo}')
+        user = User.objects.create_user('alumna')
+        UserProfile.objects.create(usuario=user, rol='estudiante')
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('core:material_clase'))
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 4)
+        self.assertIn('materialSearchInput', chunks[0])
+        self.assertIn('Intro Química', chunks[1])
+        self.assertIn('tematica-accordion active', chunks[1])
+        self.assertIn('Intro Física', chunks[2])
+        self.assertNotIn('tematica-accordion active', chunks[2])
+
+
+@override_settings(CACHES=LOCMEM)
+class FacetSectionCacheTests(TestCase):
+    """Un fragmento por faceta, válido en cualquier posición e invalidado por ``facet:<pk>``."""
+
+    def setUp(self):
+        cache.clear()
+        self.musica = Facet.objects.create(titulo='Música', slug='musica', orden=1)
+        self.teatro = Facet.objects.create(titulo='Teatro', slug='teatro', orden=2)
+        self.hito = Milestone.objects.create(faceta=self.teatro, titulo='Estreno')
+
+    def sections(self, *slugs):
+        facets = [Facet.objects.get(slug=slug) for slug in slugs]
+        return list(iter_facet_sections(facets))
+
+    def test_cached_section_is_reused_at_another_position(self):
+        self.assertIn('id="facetContainer1"', self.sections('musica', 'teatro')[1])
+        facet = Facet.objects.get(slug='teatro')
+        with self.assertNumQueries(0):
+            html = list(iter_facet_sections([facet]))[0]
+        self.assertIn('id="facetContainer0"', html)
+        self.assertIn('id="facetGallery0"', html)
+        self.assertIn('Estreno', html)
+        self.assertEqual(len([key for key in cache._cache if 'facet_section:' in key]), 2)
+
+    def test_facet_version_bump_rerenders_only_that_facet(self):
+        self.sections('musica', 'teatro')
+        self.hito.titulo = 'Reestreno'
+        self.hito.save()
+        facets = [Facet.objects.get(slug=slug) for slug in ('musica', 'teatro')]
+        with self.assertNumQueries(2):  # hitos e imágenes de la faceta editada
+            html = list(iter_facet_sections(facets))
+        self.assertIn('Reestreno', html[1])
+
+    def test_facet_page_revalidates_with_304(self):
+        url = reverse('core:facet_detail', args=['teatro'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Estreno')
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.hito.titulo = 'Reestreno'
+        self.hito.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Reestreno')
+
+    def test_facet_page_revalidates_when_the_menu_changes(self):
+        url = reverse('core:facet_detail', args=['teatro'])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Otra faceta cambia de título: la sección de teatro es la misma, pero el menú no
+        self.musica.titulo = 'Música antigua'
+        self.musica.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Música antigua')
+        self.assertEqual(
+            parse_http_date(response['Last-Modified']),
+            int(Facet.objects.get(slug='musica').fecha_actualizacion.timestamp()),
+        )
+
+
+@override_settings(CACHES=LOCMEM)
+class FacetCatalogTests(TestCase):
+    """Un único catálogo de facetas activas por versión de ``facet_catalog``."""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.musica = Facet.objects.create(titulo='Música', slug='musica', orden=1)
+        self.teatro = Facet.objects.create(titulo='Teatro', slug='teatro', orden=2)
+        Facet.objects.create(titulo='Oculta', slug='oculta', activo=False)
+
+    def test_shared_by_forms_views_and_sitemap(self):
+        catalog = get_catalog()
+        self.assertEqual([entry.slug for entry in catalog], ['musica', 'teatro'])
+        with self.assertNumQueries(0):
+            self.assertIs(FacetSelectionForm().facets, catalog)
+            self.assertIs(CustomUserCreationForm().facets, catalog)
+            self.assertEqual(FacetSitemap().items(), list(catalog))
+        response = self.client.get(reverse('core:facet_detail', args=['teatro']))
+        self.assertIs(response.context['menu_facets'], catalog)
+
+    def test_rebuilt_after_facet_save_and_delete(self):
+        catalog = get_catalog()
+        self.musica.titulo = 'Música antigua'
+        self.musica.save()
+        updated = get_catalog()
+        self.assertIsNot(updated, catalog)
+        self.assertEqual(updated.version, get_version(CATALOG_NAMESPACE))
+        self.assertEqual(updated.get(self.musica.pk).titulo, 'Música antigua')
+
+        self.teatro.delete()
+        self.assertNotIn(self.teatro.pk, get_catalog())
+        self.assertEqual(len(get_catalog()), 1)
+
+    def test_pickle_round_trip(self):
+        catalog = get_catalog()
+        restored = pickle.loads(pickle.dumps(catalog))
+        self.assertEqual(restored.version, catalog.version)
+        self.assertEqual(restored.facets, catalog.facets)
+        self.assertIn(self.musica.pk, restored)
+        self.assertEqual(restored.get(self.teatro.pk).slug, 'teatro')
+
+
+@override_settings(CACHES=LOCMEM)
+class TimelineCacheKeyTests(TestCase):
+    """Los parámetros de la línea de tiempo no generan claves de caché arbitrarias."""
+
+    def setUp(self):
+        cache.clear()
+        facet = Facet.objects.create(titulo='Música', slug='musica')
+        Milestone.objects.create(faceta=facet, titulo='Concierto', año=2001)
+
+    def test_unknown_facet_and_bad_cursor_do_not_touch_the_cache(self):
+        get_catalog()
+        before = len(cache._cache)
+        self.assertEqual(timeline.list_milestones(faceta='no existe\x00')['results'], [])
+        with self.assertRaises(ValueError):
+            timeline.list_milestones(cursor='no es un cursor')
+        self.assertEqual(len(cache._cache), before)
+
+    def test_valid_request_is_cached_under_a_hashed_key(self):
+        self.assertEqual(len(timeline.list_milestones(faceta='musica')['results']), 1)
+        keys = [key for key in cache._cache if ':timeline:' in key and ':list:' in key]
+        self.assertEqual(len(keys), 1)
+        self.assertNotIn('musica', keys[0])
+
+
+@override_settings(CACHES=LOCMEM)
+class CompressedPageKeyTests(SimpleTestCase):
+    """Solo los parámetros admitidos crean entradas nuevas en la caché de páginas."""
+
+    def setUp(self):
+        cache.clear()
+        self.renders = 0
+
+        @compressed_page(lambda request: [], query_params=('p',))
+        def view(request):
+            self.renders += 1
+            return HttpResponse('<p>página</p>' * 100)
+        self.view = view
+
+    def get(self, path):
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING='gzip')
+        request.user = AnonymousUser()
+        return self.view(request)
+
+    def test_unknown_query_parameters_bypass_the_cache(self):
+        self.assertEqual(self.get('/').get('Content-Encoding'), 'gzip')
+        entries = len(cache._cache)
+        for n in range(5):
+            response = self.get(f'/?junk={n}')
+            self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(cache._cache), entries)
+        self.assertEqual(self.renders, 6)
+
+    def test_allowed_parameter_is_part_of_the_key(self):
+        self.get('/?p=2')
+        self.get('/?p=2')
+        self.get('/')
+        self.assertEqual(self.renders, 2)
+
+
+@override_settings(CACHES=LOCMEM)
+class BenchmarkCommandTests(TestCase):
+    """``benchmark`` recorre los escenarios con el cliente de pruebas y compara contra la línea base."""
+
+    def setUp(self):
+        cache.clear()
+        self.tmp = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def benchmark(self, *args):
+        out = StringIO()
+        call_command(
+            'benchmark', '--current-db', '--scales', '1', '--iterations', '2', '--warmup', '0',
+            '--only', 'index_anon,material_clase,staff_dashboard',
+            '--output', str(self.tmp / 'results.json'), '--baseline', str(self.tmp / 'baseline.json'),
+            *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_smoke_run_against_baseline(self):
+        self.assertIn('Línea base actualizada', self.benchmark('--update-baseline'))
+        results = json.loads((self.tmp / 'baseline.json').read_text(encoding='utf-8'))['results']['1']
+        self.assertEqual(set(results), {'index_anon', 'material_clase', 'staff_dashboard'})
+        for name, metrics in results.items():
+            self.assertEqual(metrics['status'], 200, name)
+            self.assertEqual(metrics['samples'], 2)
+            self.assertGreater(metrics['bytes'], 0)
+
+        self.assertIn('Sin regresiones', self.benchmark('--threshold', '1000'))
+
+
+@override_settings(CACHES=LOCMEM)
+class EarlyHintsTests(TestCase):
+    """Solo las vistas con ``@critical_assets`` anuncian sus recursos."""
+
+    def setUp(self):
+        cache.clear()
+        Facet.objects.create(titulo='Música', slug='musica')
+
+    def test_decorated_view_gets_link_header(self):
+        response = self.client.get(reverse('core:facet_detail', args=['musica']))
+        self.assertIn('gsap.min.js>; rel=preload; as=script', response['Link'])
+        self.assertFalse(self.client.get(reverse('core:contact')).has_header('Link'))
+
+    def asgi(self, path, extensions=None):
+        sent = []
+
+        async def app(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'ok'})
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': path, 'root_path': '',
+            'extensions': {EARLY_HINT: {}} if extensions is None else extensions,
+        }
+        async_to_sync(EarlyHintsASGIMiddleware(app))(scope, None, send)
+        return sent
+
+    def test_asgi_sends_103_before_the_response(self):
+        sent = self.asgi(reverse('core:facet_detail', args=['musica']))
+        self.assertEqual([message['type'] for message in sent], [EARLY_HINT, 'http.response.start', 'http.response.body'])
+        self.assertIn(
+            b'<https://cdnjs.cloudflare.com/ajax/libs/gsap/3.12.5/gsap.min.js>; rel=preload; as=script', sent[0]['links'],
+        )
+
+    def test_asgi_skips_undecorated_routes_and_servers_without_the_extension(self):
+        for path, extensions in ((reverse('core:contact'), None), ('/no-existe/', None),
+                                 (reverse('core:facet_detail', args=['musica']), {})):
+            sent = self.asgi(path, extensions)
+            self.assertEqual(sent[0]['type'], 'http.response.start', path)
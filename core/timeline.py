@@ -0,0 +1,142 @@
+"""
+Línea de tiempo pública de hitos.
+
+- ``list_milestones``: búsqueda por palabras (índice de ``core.search``) y/o
+  filtro por rango de años y faceta, con paginación por cursor (keyset): cada
+  página continúa desde la última fila de la anterior en lugar de usar OFFSET.
+- ``year_counts``: número de hitos por año y faceta.
+
+Los recuentos y las páginas sin búsqueda se guardan en caché bajo la versión del
+espacio ``'timeline'``, que ``core.signals`` incrementa al guardar o borrar
+hitos y facetas. Antes de tocar la caché se valida el cursor y la faceta (debe
+ser una faceta activa), y los parámetros entran en la clave como un hash.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import search
+from .caching import versioned_key
+from .catalog import get_catalog
+from .models import Milestone
+
+NAMESPACE = 'timeline'
+CACHE_TIMEOUT = 60 * 10
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor):
+    """``[a, b]`` enteros codificados en ``cursor``; ValueError si no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Cursor no válido.')
+    if not (isinstance(values, list) and len(values) == 2 and all(isinstance(v, int) for v in values)):
+        raise ValueError('Cursor no válido.')
+    return values
+
+
+def visible_milestones():
+    return Milestone.objects.filter(activo=True, faceta__activo=True)
+
+
+def serialize(milestone):
+    return {
+        'id': milestone.pk,
+        'titulo': milestone.titulo,
+        'año': milestone.año,
+        'faceta': milestone.faceta.slug,
+        'imagen': milestone.imagen.url if milestone.imagen else None,
+    }
+
+
+def _search_page(query, milestones, cursor, limit):
+    results = search.ranked(query, [search.HITO])
+    if results is None:
+        return [], None
+    results = results.filter(objeto_id__in=milestones.values('pk')).order_by('-score', 'objeto_id')
+    if cursor:
+        score, pk = cursor
+        results = results.filter(Q(score__lt=score) | Q(score=score, objeto_id__gt=pk))
+    rows = list(results[:limit + 1])
+    next_cursor = encode_cursor([rows[limit - 1]['score'], rows[limit - 1]['objeto_id']]) if len(rows) > limit else None
+    rows = rows[:limit]
+    objects = milestones.select_related('faceta').in_bulk([row['objeto_id'] for row in rows])
+    return [objects[row['objeto_id']] for row in rows if row['objeto_id'] in objects], next_cursor
+
+
+def _year_page(milestones, cursor, limit):
+    milestones = milestones.filter(año__isnull=False).select_related('faceta').order_by('año', 'pk')
+    if cursor:
+        año, pk = cursor
+        milestones = milestones.filter(Q(año__gt=año) | Q(año=año, pk__gt=pk))
+    rows = list(milestones[:limit + 1])
+    next_cursor = encode_cursor([rows[limit - 1].año, rows[limit - 1].pk]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def list_milestones(query='', desde=None, hasta=None, faceta=None, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    ``{'results': [...], 'next_cursor': str|None}``. Con ``query`` se ordena por
+    relevancia; sin ella, cronológicamente (solo hitos con año). ValueError si
+    el cursor no es válido.
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    cursor = decode_cursor(cursor) if cursor else None
+    if faceta and not any(facet.slug == faceta for facet in get_catalog()):
+        # Faceta inexistente o inactiva: no hay hitos visibles (y no se guarda nada)
+        return {'results': [], 'next_cursor': None}
+    key = None
+    if not query:
+        params = json.dumps([desde, hasta, faceta, cursor, limit])
+        key = versioned_key(NAMESPACE, 'list', hashlib.md5(params.encode()).hexdigest())
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    milestones = visible_milestones()
+    if desde is not None:
+        milestones = milestones.filter(año__gte=desde)
+    if hasta is not None:
+        milestones = milestones.filter(año__lte=hasta)
+    if faceta:
+        milestones = milestones.filter(faceta__slug=faceta)
+
+    if query:
+        rows, next_cursor = _search_page(query, milestones, cursor, limit)
+    else:
+        rows, next_cursor = _year_page(milestones, cursor, limit)
+    data = {'results': [serialize(milestone) for milestone in rows], 'next_cursor': next_cursor}
+    if key:
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
+
+
+def year_counts():
+    """``[{'año', 'total', 'facetas': {slug: n}}]`` ordenado por año (en caché)."""
+    key = versioned_key(NAMESPACE, 'years')
+    years = cache.get(key)
+    if years is None:
+        by_year = {}
+        rows = (
+            visible_milestones().filter(año__isnull=False)
+            .values('año', 'faceta__slug').annotate(total=Count('pk')).order_by('año', 'faceta__slug')
+        )
+        for row in rows:
+            entry = by_year.setdefault(row['año'], {'año': row['año'], 'total': 0, 'facetas': {}})
+            entry['total'] += row['total']
+            entry['facetas'][row['faceta__slug']] = row['total']
+        years = list(by_year.values())
+        cache.set(key, years, CACHE_TIMEOUT)
+    return years
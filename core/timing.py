@@ -0,0 +1,211 @@
+"""
+Instrumentación de tiempos por petición.
+
+``ServerTimingMiddleware`` reparte la duración de cada petición en fases
+(base de datos, plantillas, context processors, caché y el resto de la vista),
+la expone en la cabecera ``Server-Timing`` (solo al staff, salvo
+``SERVER_TIMING_PUBLIC``) y escribe una línea JSON por petición en el logger
+``core.timing``.
+
+Las fases son exclusivas: el tiempo de una consulta ejecutada mientras se
+renderiza una plantilla cuenta como ``db`` y no como ``tpl``, de modo que la
+suma de las fases nunca supera el total.
+"""
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+_current_timer = contextvars.ContextVar('core_request_timer', default=None)
+
+# Descripción legible de cada fase en Server-Timing (orden de aparición)
+PHASES = {
+    'db': 'Base de datos',
+    'cache': 'Caché',
+    'cp': 'Context processors',
+    'tpl': 'Plantillas',
+    'view': 'Vista',
+}
+
+
+class RequestTimer:
+    """Acumula el tiempo exclusivo y el número de llamadas de cada fase."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = {}  # segundos
+        self.counts = {}
+        self._stack = []
+
+    def enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, start, children = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self.durations[name] = self.durations.get(name, 0.0) + elapsed - children
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def summary(self):
+        """Duraciones en milisegundos; ``view`` es el tiempo no atribuido a otra fase."""
+        total = (time.perf_counter() - self.start) * 1000
+        phases = {name: seconds * 1000 for name, seconds in self.durations.items()}
+        phases['view'] = max(total - sum(phases.values()), 0.0)
+        phases['total'] = total
+        return phases
+
+
+@contextmanager
+def phase(name):
+    """Atribuye el bloque a la fase ``name`` de la petición en curso (si se está midiendo)."""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    timer.enter(name)
+    try:
+        yield
+    finally:
+        timer.exit()
+
+
+def count(name):
+    """Suma uno al contador ``name`` de la petición en curso (si se está midiendo)."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.counts[name] = timer.counts.get(name, 0) + 1
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    with phase('db'):
+        return execute(sql, params, many, context)
+
+
+def _timed_processor(processor):
+    @functools.wraps(processor)
+    def wrapper(request):
+        with phase('cp'):
+            return processor(request)
+    return wrapper
+
+
+class _TimedTemplate:
+    """Envoltorio de la plantilla del backend que mide ``render``."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with phase('tpl'):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Backend DjangoTemplates que mide el render de plantillas y cada context processor.
+    Sin una petición en medición el coste añadido es una lectura de ContextVar.
+    """
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.engine.template_context_processors = tuple(
+            _timed_processor(processor) for processor in self.engine.template_context_processors
+        )
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class QueueStreamHandler(logging.handlers.QueueHandler):
+    """
+    Handler no bloqueante: encola el registro y un hilo aparte lo escribe en
+    stderr. Si la cola se llena se descarta el registro en lugar de frenar la petición.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.listener = logging.handlers.QueueListener(self.queue, logging.StreamHandler(stream))
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def format_server_timing(phases, counts):
+    entries = []
+    for name, description in PHASES.items():
+        if name not in phases:
+            continue
+        if name == 'db':
+            description = f'{description} ({counts.get("db", 0)} consultas)'
+        entries.append(f'{name};dur={phases[name]:.1f};desc="{description}"')
+    entries.append(f'total;dur={phases["total"]:.1f}')
+    return ', '.join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Debe ir primero en MIDDLEWARE para que ``total`` incluya todo el stack.
+    En respuestas streaming solo se mide hasta que la vista devuelve la respuesta.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = RequestTimer()
+        token = _current_timer.set(timer)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_db_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+
+        phases = timer.summary()
+        user = getattr(request, 'user', None)
+        # Los tiempos por fase y el número de consultas son detalles internos: no se
+        # enseñan a cualquier visitante
+        if getattr(settings, 'SERVER_TIMING_PUBLIC', False) or (user is not None and user.is_staff):
+            response['Server-Timing'] = format_server_timing(phases, timer.counts)
+
+        payload = {
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'db_queries': timer.counts.get('db', 0),
+            'local_cache_hits': timer.counts.get('local_hits', 0) + timer.counts.get('local_revalidations', 0),
+            'local_cache_misses': timer.counts.get('local_misses', 0),
+        }
+        payload.update({f'{name}_ms': round(ms, 2) for name, ms in phases.items()})
+        logger.info(json.dumps(payload))
+        return response
@@ -0,0 +1,241 @@
+"""
+Transcodificación en segundo plano de los videos subidos.
+
+Por cada video (``Milestone.video`` y ``SiteSettings.video_hero``) se genera un
+par MP4 (H.264) / WebM (VP9) comprimido y limitado a ``VIDEO_MAX_WIDTH``, más
+un póster JPEG y WebP. Las versiones se guardan en campos ``<prefijo>mp4``,
+``<prefijo>webm``, ``<prefijo>poster`` y ``<prefijo>poster_webp`` del propio
+modelo, y ``<prefijo>origen`` recuerda de qué archivo salieron para no repetir
+el trabajo.
+
+El trabajo se encola tras el commit de la transacción (ver ``core.signals``) en
+un ``ThreadPoolExecutor`` del propio proceso; ``manage.py transcode_videos``
+procesa el backlog de forma síncrona.
+"""
+import logging
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Modelo -> (campo del video original, prefijo de los campos derivados)
+VIDEO_SOURCES = {
+    'core.Milestone': ('video', 'video_'),
+    'core.SiteSettings': ('video_hero', 'video_hero_'),
+}
+DERIVATIVES = ('mp4', 'webm', 'poster', 'poster_webp')
+
+FFMPEG_TIMEOUT = 60 * 30  # segundos por paso
+POSTER_QUALITY = 80
+
+
+class TranscodeError(Exception):
+    """Fallo al generar alguna de las versiones de un video."""
+
+
+def _poster_to_webp(jpeg_path, webp_path):
+    from PIL import Image
+
+    with Image.open(jpeg_path) as image:
+        image.save(webp_path, 'WEBP', quality=POSTER_QUALITY, method=6)
+    return webp_path
+
+
+class FFmpegTranscoder:
+    """Genera las versiones con el binario ``ffmpeg`` instalado en el sistema."""
+
+    def __init__(self, binary='ffmpeg', max_width=1280):
+        self.binary = binary
+        self.max_width = max_width
+
+    def transcode(self, source, out_dir):
+        scale = f"scale='min({self.max_width},iw)':-2"
+
+        mp4 = out_dir / 'video.mp4'
+        self._run([
+            '-i', str(source), '-vf', scale,
+            '-c:v', 'libx264', '-preset', 'slow', '-crf', '28',
+            '-maxrate', '1500k', '-bufsize', '3000k', '-pix_fmt', 'yuv420p',
+            '-movflags', '+faststart', '-c:a', 'aac', '-b:a', '96k', str(mp4),
+        ])
+        webm = out_dir / 'video.webm'
+        self._run([
+            '-i', str(source), '-vf', scale,
+            '-c:v', 'libvpx-vp9', '-crf', '36', '-b:v', '0', '-row-mt', '1',
+            '-deadline', 'good', '-cpu-used', '4', '-c:a', 'libopus', '-b:a', '64k', str(webm),
+        ])
+
+        poster = out_dir / 'poster.jpg'
+        # Fotograma del segundo 1 (evita fundidos a negro); videos más cortos usan el primero
+        for seek in ('1', '0'):
+            try:
+                self._run(['-ss', seek, '-i', str(source), '-frames:v', '1', '-vf', scale, '-q:v', '4', str(poster)])
+            except TranscodeError:
+                continue
+            if poster.exists() and poster.stat().st_size:
+                break
+        else:
+            raise TranscodeError(f'No se pudo extraer un póster de {source.name}')
+
+        return {
+            'mp4': mp4,
+            'webm': webm,
+            'poster': poster,
+            'poster_webp': _poster_to_webp(poster, out_dir / 'poster.webp'),
+        }
+
+    def _run(self, args):
+        command = [self.binary, '-hide_banner', '-loglevel', 'error', '-y', *args]
+        try:
+            result = subprocess.run(command, capture_output=True, timeout=FFMPEG_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise TranscodeError(str(e)) from e
+        if result.returncode != 0:
+            raise TranscodeError(result.stderr.decode('utf-8', 'replace').strip()[-2000:])
+
+
+class FakeTranscoder:
+    """
+    Doble para desarrollo y tests cuando no hay ffmpeg: copia el original como
+    MP4/WebM y genera un póster negro. No comprime nada.
+    """
+
+    def transcode(self, source, out_dir):
+        from PIL import Image
+
+        outputs = {}
+        for name in ('mp4', 'webm'):
+            outputs[name] = out_dir / f'video.{name}'
+            shutil.copyfile(source, outputs[name])
+        outputs['poster'] = out_dir / 'poster.jpg'
+        Image.new('RGB', (16, 9)).save(outputs['poster'], 'JPEG', quality=POSTER_QUALITY)
+        outputs['poster_webp'] = _poster_to_webp(outputs['poster'], out_dir / 'poster.webp')
+        return outputs
+
+
+def get_transcoder():
+    """Transcodificador según ``VIDEO_TRANSCODER``, o None si está desactivado o no hay ffmpeg."""
+    mode = getattr(settings, 'VIDEO_TRANSCODER', 'auto')
+    if mode == 'fake':
+        return FakeTranscoder()
+    if mode not in ('auto', 'ffmpeg'):
+        return None
+    binary = getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+    if shutil.which(binary) is None:
+        if mode == 'ffmpeg':
+            logger.warning('VIDEO_TRANSCODER=ffmpeg pero no se encontró %s', binary)
+        return None
+    return FFmpegTranscoder(binary, getattr(settings, 'VIDEO_MAX_WIDTH', 1280))
+
+
+def needs_transcode(instance):
+    """True si el video actual no coincide con el que originó las versiones guardadas."""
+    source_field, prefix = VIDEO_SOURCES[instance._meta.label]
+    source = getattr(instance, source_field)
+    return (source.name or '') != getattr(instance, f'{prefix}origen')
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'VIDEO_TRANSCODE_WORKERS', 1),
+                thread_name_prefix='transcode',
+            )
+        return _executor
+
+
+def _run_job(label, pk):
+    close_old_connections()
+    try:
+        process(label, pk)
+    except Exception:
+        logger.exception('Error transcodificando %s #%s', label, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule(instance):
+    """Encola la transcodificación de ``instance`` cuando se confirme la transacción."""
+    if instance._meta.label not in VIDEO_SOURCES or not needs_transcode(instance):
+        return
+    if get_transcoder() is None:
+        return
+    label, pk = instance._meta.label, instance.pk
+    transaction.on_commit(lambda: _get_executor().submit(_run_job, label, pk))
+
+
+def process(label, pk, force=False, transcoder=None):
+    """
+    Genera (o limpia, si se quitó el video) las versiones de una fila.
+    Devuelve True si se guardaron cambios.
+    """
+    model = apps.get_model(label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not (force or needs_transcode(instance)):
+        return False
+
+    source_field, prefix = VIDEO_SOURCES[label]
+    source = getattr(instance, source_field)
+    fields = [f'{prefix}{name}' for name in DERIVATIVES]
+    previous = {field: getattr(instance, field).name for field in fields}
+
+    if not source:
+        for field in fields:
+            setattr(instance, field, None)
+    else:
+        transcoder = transcoder or get_transcoder()
+        if transcoder is None:
+            return False
+        with tempfile.TemporaryDirectory(prefix='transcode-') as tmp:
+            tmp = Path(tmp)
+            local_source = tmp / f'source{Path(source.name).suffix}'
+            with source.open('rb') as src, open(local_source, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            outputs = transcoder.transcode(local_source, tmp)
+
+            # Si el video cambió mientras se transcodificaba, el resultado ya no sirve
+            current = model.objects.filter(pk=pk).values_list(source_field, flat=True).first()
+            if (current or '') != source.name:
+                return False
+
+            stem = Path(source.name).stem
+            for name, path in outputs.items():
+                with open(path, 'rb') as fh:
+                    getattr(instance, f'{prefix}{name}').save(f'{stem}{path.suffix}', File(fh), save=False)
+
+    setattr(instance, f'{prefix}origen', source.name or '')
+    update_fields = [*fields, f'{prefix}origen']
+    if hasattr(instance, 'fecha_actualizacion'):
+        # auto_now solo se escribe si está en update_fields; invalida el HTML en caché
+        update_fields.append('fecha_actualizacion')
+    instance.save(update_fields=update_fields)
+    _delete_superseded(instance, previous)
+    logger.info('Versiones de video actualizadas para %s #%s', label, pk)
+    return True
+
+
+def _delete_superseded(instance, previous):
+    """Borra del storage las versiones anteriores que la fila ya no usa."""
+    for field, old_name in previous.items():
+        file = getattr(instance, field)
+        if not old_name or old_name == file.name:
+            continue
+        try:
+            file.storage.delete(old_name)
+        except OSError:
+            logger.warning('No se pudo borrar la versión antigua %s', old_name, exc_info=True)
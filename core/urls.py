@@ -1,26 +1,25 @@
 from django.urls import path, include
-from django.contrib.sitemaps.views import sitemap
 from django.contrib.auth import views as auth_views
 from . import views
 from .robots import robots_txt
-from .sitemaps import StaticViewSitemap, FacetSitemap
+from .sitemaps import sitemap_xml
 
 app_name = 'core'
 
-# Sitemap configuration
-sitemaps = {
-    'static': StaticViewSitemap,
-    'facets': FacetSitemap,
-}
-
 urlpatterns = [
     # Público
     path('', views.index, name='index'),
     path('contact/', views.contact, name='contact'),
+    path('faceta/<slug:slug>/', views.facet_detail, name='facet_detail'),
     
     # SEO
     path('robots.txt', robots_txt, name='robots_txt'),
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', sitemap_xml, name='django.contrib.sitemaps.views.sitemap'),
+    
+    # API pública de hitos (línea de tiempo)
+    path('api/hitos/', views.api_milestones, name='api_milestones'),
+    path('api/hitos/anios/', views.api_milestone_years, name='api_milestone_years'),
+    path('api/hitos/<int:año>/', views.api_milestones, name='api_milestones_year'),
     
     # Autenticación
     path('register/', views.register, name='register'),
@@ -56,6 +55,10 @@ urlpatterns = [
     
     # Contenido Estudiantil
     path('material-clase/', views.material_clase, name='material_clase'),
+    path('material-clase/<int:tematica_id>/descargar.zip', views.material_clase_zip, name='material_clase_zip'),
+    path('material-clase/buscar/', views.material_clase_search, name='material_clase_search'),
+    path('material-clase/precache.json', views.material_precache_manifest, name='material_precache'),
+    path('sw.js', views.service_worker, name='service_worker'),
     
     # Staff - Dashboard
     path('staff/', views.staff_dashboard, name='staff_dashboard'),
@@ -97,5 +100,9 @@ urlpatterns = [
     # Staff - Usuarios
     path('staff/usuarios/', views.staff_users_list, name='staff_users_list'),
     path('staff/usuarios/<int:pk>/permisos/', views.staff_user_edit_permissions, name='staff_user_edit_permissions'),
+    
+    # Staff - Perfilado
+    path('staff/perfiles/', views.staff_profiles_list, name='staff_profiles_list'),
+    path('staff/perfiles/<str:profile_id>/descargar/', views.staff_profile_download, name='staff_profile_download'),
 ]
 
@@ -2,14 +2,46 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q, Prefetch
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max, Q, Prefetch
 from django.http import HttpResponse
 from django.urls import reverse
 from .models import Facet, Milestone, ContactMessage, SiteSettings, MilestoneImage, UserFacetPreference, Tematica, Material, MaterialPDF, MaterialVideo, MaterialPresentacion, UserProfile
 from django.contrib.auth.models import User
 from .decorators import staff_required, estudiante_required
 from .forms import CustomUserCreationForm, FacetSelectionForm, LoginForm, FacetManagementForm
+from .timing import phase
+from .catalog import get_catalog
+from .compression import compressed_page
+from .early_hints import critical_assets, hero_image, loading_image
+from .facet_sections import facet_namespace, iter_facet_sections, render_facet_sections
+from .streaming import stream_template
 
+def _facet_last_modified(facet):
+    """Última modificación de la faceta o de sus hitos e imágenes (anotada en la consulta)."""
+    return max(d for d in (facet.fecha_actualizacion, facet.hitos_actualizacion, facet.imagenes_creacion) if d)
+
+
+def _index_versions(request):
+    """Versiones de caché de las que depende la portada anónima."""
+    from .caching import get_versions
+    from .catalog import NAMESPACE as CATALOG_NAMESPACE
+    
+    namespaces = [SiteSettings.CACHE_NAMESPACE, CATALOG_NAMESPACE]
+    namespaces += [facet_namespace(facet.id) for facet in get_catalog()]
+    versions = get_versions(namespaces)
+    return [versions[namespace] for namespace in namespaces]
+
+
+# Scripts de la cabecera de index.html que se precargan con Early Hints / Link
+GSAP_SCRIPTS = tuple(
+    (f'https://cdnjs.cloudflare.com/ajax/libs/gsap/3.12.5/{name}', 'script')
+    for name in ('gsap.min.js', 'ScrollTrigger.min.js', 'ScrollToPlugin.min.js')
+)
+
+
+@critical_assets(loading_image, hero_image, *GSAP_SCRIPTS)
+@compressed_page(_index_versions)
 def index(request):
     """
     Vista principal del sitio público.
@@ -34,16 +66,6 @@ def index(request):
             facets = Facet.objects.filter(
                 id__in=facet_ids,
                 activo=True
-            ).prefetch_related(
-                Prefetch(
-                    'hitos',
-                    queryset=Milestone.objects.filter(activo=True).order_by('orden', 'año').prefetch_related(
-                        Prefetch(
-                            'imagenes',
-                            queryset=MilestoneImage.objects.filter(activo=True).order_by('orden')
-                        )
-                    )
-                )
             )
             
             # Crear un diccionario para mantener el orden de prioridad del usuario
@@ -56,29 +78,67 @@ def index(request):
             facets = []
     else:
         # Usuario no autenticado: mostrar todas las facetas activas
-        facets = Facet.objects.filter(activo=True).order_by('orden').prefetch_related(
-            Prefetch(
-                'hitos',
-                queryset=Milestone.objects.filter(activo=True).order_by('orden', 'año').prefetch_related(
-                    Prefetch(
-                        'imagenes',
-                        queryset=MilestoneImage.objects.filter(activo=True).order_by('orden')
-                    )
-                )
-            )
-        )
-    
-    # Para cada faceta, obtener sus hitos activos ordenados y calcular total de slides
-    for facet in facets:
-        facet.hitos_activos = list(facet.hitos.all())
-        # Calcular total de slides para esta faceta: 1 (título) + hitos
-        facet.total_slides = 1 + len(facet.hitos_activos)
+        facets = Facet.objects.filter(activo=True).order_by('orden')
     
     context = {
-        'facets': facets,
+        'facets': list(facets),
         'site_settings': site_settings,
     }
-    return render(request, 'core/index.html', context)
+    if not context['facets']:
+        return render(request, 'core/index.html', context)
+    # Cabecera, pantalla de carga y hero primero; luego el HTML de cada faceta (desde la
+    # caché o renderizado en su turno) según se genera
+    return stream_template(request, 'core/index.html', context, iter_facet_sections(context['facets']))
+
+@critical_assets(loading_image, *GSAP_SCRIPTS)
+def facet_detail(request, slug):
+    """
+    Página propia de una faceta: solo sus hitos, sin la intro de la portada.
+    Es la URL canónica del sitemap y responde 304 si nada cambió.
+    """
+    import hashlib
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    from django.utils.http import http_date
+    from .caching import get_version
+    
+    site_settings = SiteSettings.load()
+    facet = get_object_or_404(
+        Facet.objects.filter(activo=True).annotate(
+            hitos_actualizacion=Max('hitos__fecha_actualizacion'),
+            imagenes_creacion=Max('hitos__imagenes__fecha_creacion'),
+        ),
+        slug=slug,
+    )
+    # El menú sale del catálogo: su versión (la de facet_catalog al construirlo) y
+    # sus fechas también cuentan para el 304
+    menu_facets = get_catalog()
+    last_modified = max(
+        _facet_last_modified(facet), site_settings.fecha_actualizacion,
+        *(entry.actualizado for entry in menu_facets),
+    )
+    # El menú cambia según la sesión (enlaces de cuenta), así que el usuario entra en el ETag
+    version = get_version(facet_namespace(facet.pk))
+    etag = '"{}"'.format(hashlib.md5(
+        f'{version}:{menu_facets.version}:{site_settings.fecha_actualizacion.timestamp()}:{request.user.pk or 0}'.encode()
+    ).hexdigest())
+    
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp()),
+    )
+    if response is None:
+        context = {
+            'facets': render_facet_sections([facet]),
+            'page_facet': facet,
+            'menu_facets': menu_facets,
+            'site_settings': site_settings,
+        }
+        response = render(request, 'core/index.html', context)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, max_age=0, must_revalidate=True, **(
+        {'private': True} if request.user.is_authenticated else {'public': True}
+    ))
+    return response
 
 def contact(request):
     """
@@ -94,7 +154,8 @@ def contact(request):
         
         ip_address = request.META.get('REMOTE_ADDR', '')
         cache_key = f'contact_rate_limit_{ip_address}'
-        message_count = cache.get(cache_key, 0)
+        with phase('cache'):
+            message_count = cache.get(cache_key, 0)
         
         if message_count >= 10:
             messages.error(request, 'Has enviado demasiados mensajes. Por favor intenta más tarde.')
@@ -134,7 +195,8 @@ def contact(request):
         try:
             ContactMessage.objects.create(nombre=nombre, email=email, mensaje=mensaje)
             # Incrementar contador de rate limiting
-            cache.set(cache_key, message_count + 1, 3600)  # 1 hora
+            with phase('cache'):
+                cache.set(cache_key, message_count + 1, 3600)  # 1 hora
             messages.success(request, '¡Mensaje enviado correctamente! Te responderemos pronto.')
         except Exception as e:
             messages.error(request, 'Hubo un error al enviar el mensaje. Por favor intenta nuevamente.')
@@ -145,35 +207,101 @@ def contact(request):
     return render(request, 'core/contact.html', {'site_settings': site_settings})
 
 
+# ==================== API PÚBLICA DE HITOS ====================
+
+def _int_param(request, name):
+    value = request.GET.get(name, '').strip()
+    return int(value) if value else None
+
+
+def api_milestones(request, año=None):
+    """
+    Hitos en JSON para el navegador de la línea de tiempo.
+    
+    Parámetros: ``q`` (palabras), ``desde``/``hasta`` (años), ``faceta`` (slug),
+    ``limit`` y ``cursor`` (el ``next_cursor`` de la página anterior).
+    Con ``año`` en la URL se devuelven solo los hitos de ese año.
+    """
+    from django.http import JsonResponse
+    from django.utils.cache import patch_cache_control
+    from . import timeline
+    
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido.'}, status=405)
+    try:
+        desde = año if año is not None else _int_param(request, 'desde')
+        hasta = año if año is not None else _int_param(request, 'hasta')
+        limit = _int_param(request, 'limit') or timeline.DEFAULT_LIMIT
+        data = timeline.list_milestones(
+            query=request.GET.get('q', '').strip()[:200],
+            desde=desde,
+            hasta=hasta,
+            faceta=request.GET.get('faceta', '').strip() or None,
+            cursor=request.GET.get('cursor') or None,
+            limit=limit,
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros no válidos.'}, status=400)
+    
+    response = JsonResponse(data)
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
+def api_milestone_years(request):
+    """Recuento de hitos por año (y por faceta) para dibujar la línea de tiempo."""
+    from django.http import JsonResponse
+    from django.utils.cache import patch_cache_control
+    from . import timeline
+    
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido.'}, status=405)
+    response = JsonResponse({'años': timeline.year_counts()})
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
 # ==================== VISTAS DEL PANEL DE STAFF ====================
 
 @staff_required
 def staff_dashboard(request):
     """Dashboard principal del panel de staff."""
-    stats = {
-        'total_facetas': Facet.objects.count(),
-        'facetas_activas': Facet.objects.filter(activo=True).count(),
-        'total_hitos': Milestone.objects.count(),
-        'hitos_activos': Milestone.objects.filter(activo=True).count(),
-        'mensajes_no_leidos': ContactMessage.objects.filter(leido=False).count(),
-        'total_mensajes': ContactMessage.objects.count(),
-    }
-    
-    # Últimas facetas
-    ultimas_facetas = Facet.objects.all().order_by('-fecha_creacion')[:5]
+    from .caching import get_or_set, get_version
     
-    # Últimos mensajes
-    ultimos_mensajes = ContactMessage.objects.all().order_by('-fecha_creacion')[:5]
+    def load_dashboard():
+        return {
+            'stats': {
+                'total_facetas': Facet.objects.count(),
+                'facetas_activas': Facet.objects.filter(activo=True).count(),
+                'total_hitos': Milestone.objects.count(),
+                'hitos_activos': Milestone.objects.filter(activo=True).count(),
+                'mensajes_no_leidos': ContactMessage.objects.filter(leido=False).count(),
+                'total_mensajes': ContactMessage.objects.count(),
+            },
+            # Últimas facetas y últimos mensajes
+            'ultimas_facetas': list(Facet.objects.all().order_by('-fecha_creacion')[:5]),
+            'ultimos_mensajes': list(ContactMessage.objects.all().order_by('-fecha_creacion')[:5]),
+        }
     
+    # Se invalida al cambiar facetas, hitos o mensajes; el timeout cubre cambios hechos con update()
+    with phase('cache'):
+        context = get_or_set(
+            'staff_dashboard', load_dashboard, timeout=300, version=get_version('dashboard'), early_beta=1.0,
+        )
     context = {
-        'stats': stats,
-        'ultimas_facetas': ultimas_facetas,
-        'ultimos_mensajes': ultimos_mensajes,
-        'unread_count': stats['mensajes_no_leidos'],  # Para el template base
+        **context,
+        'unread_count': context['stats']['mensajes_no_leidos'],  # Para el template base
     }
     return render(request, 'staff/dashboard.html', context)
 
 
+def _clean_images(request, model, *field_names):
+    """Valida las imágenes subidas con los validadores del campo antes de crear o modificar la fila."""
+    for name in field_names:
+        if name in request.FILES:
+            model._meta.get_field(name).clean(request.FILES[name], None)
+
+
 # ==================== CONFIGURACIÓN GENERAL DEL SITIO ====================
 
 @staff_required
@@ -232,6 +360,7 @@ def staff_facet_create(request):
     """Crear una nueva faceta."""
     if request.method == 'POST':
         try:
+            _clean_images(request, Facet, 'imagen_hero')
             facet = Facet.objects.create(
                 titulo=request.POST.get('titulo'),
                 descripcion=request.POST.get('descripcion', ''),
@@ -244,6 +373,8 @@ def staff_facet_create(request):
                 facet.save()
             messages.success(request, f'Faceta "{facet.titulo}" creada exitosamente.')
             return redirect('core:staff_facets_list')
+        except ValidationError as e:
+            messages.error(request, ' '.join(e.messages))
         except Exception as e:
             messages.error(request, f'Error al crear la faceta: {str(e)}')
     return render(request, 'staff/facet_form.html', {'form_action': 'create'})
@@ -254,6 +385,7 @@ def staff_facet_edit(request, pk):
     facet = get_object_or_404(Facet, pk=pk)
     if request.method == 'POST':
         try:
+            _clean_images(request, Facet, 'imagen_hero')
             facet.titulo = request.POST.get('titulo')
             facet.descripcion = request.POST.get('descripcion', '')
             facet.orden = int(request.POST.get('orden', 0))
@@ -264,6 +396,8 @@ def staff_facet_edit(request, pk):
             facet.save()
             messages.success(request, f'Faceta "{facet.titulo}" actualizada exitosamente.')
             return redirect('core:staff_facets_list')
+        except ValidationError as e:
+            messages.error(request, ' '.join(e.messages))
         except Exception as e:
             messages.error(request, f'Error al actualizar la faceta: {str(e)}')
     return render(request, 'staff/facet_form.html', {'facet': facet, 'form_action': 'edit'})
@@ -306,6 +440,7 @@ def staff_milestone_create(request, facet_id=None):
         try:
             faceta_id = request.POST.get('faceta')
             faceta_obj = get_object_or_404(Facet, pk=faceta_id)
+            _clean_images(request, Milestone, 'imagen')
             
             milestone = Milestone.objects.create(
                 faceta=faceta_obj,
@@ -327,6 +462,8 @@ def staff_milestone_create(request, facet_id=None):
             milestone.save()
             messages.success(request, f'Hito "{milestone.titulo}" creado exitosamente.')
             return redirect('core:staff_milestones_list_by_facet', facet_id=faceta_obj.id)
+        except ValidationError as e:
+            messages.error(request, ' '.join(e.messages))
         except Exception as e:
             messages.error(request, f'Error al crear el hito: {str(e)}')
     
@@ -343,6 +480,7 @@ def staff_milestone_edit(request, pk):
     milestone = get_object_or_404(Milestone, pk=pk)
     if request.method == 'POST':
         try:
+            _clean_images(request, Milestone, 'imagen')
             faceta_id = request.POST.get('faceta')
             milestone.faceta = get_object_or_404(Facet, pk=faceta_id)
             milestone.titulo = request.POST.get('titulo')
@@ -364,6 +502,8 @@ def staff_milestone_edit(request, pk):
             milestone.save()
             messages.success(request, f'Hito "{milestone.titulo}" actualizado exitosamente.')
             return redirect('core:staff_milestones_list_by_facet', facet_id=milestone.faceta.id)
+        except ValidationError as e:
+            messages.error(request, ' '.join(e.messages))
         except Exception as e:
             messages.error(request, f'Error al actualizar el hito: {str(e)}')
     
@@ -459,17 +599,13 @@ def register(request):
                     priority = int(request.POST.get(f'priority_{facet_id}', 0))
                     selected_facets.append((facet_id, priority))
             
-            # Crear preferencias de facetas
-            for facet_id, priority in selected_facets:
-                try:
-                    facet = Facet.objects.get(id=facet_id, activo=True)
-                    UserFacetPreference.objects.create(
-                        usuario=user,
-                        faceta=facet,
-                        prioridad=priority
-                    )
-                except Facet.DoesNotExist:
-                    pass
+            # Crear preferencias de facetas (solo de facetas activas)
+            catalog = get_catalog()
+            UserFacetPreference.objects.bulk_create([
+                UserFacetPreference(usuario=user, faceta_id=facet_id, prioridad=priority)
+                for facet_id, priority in selected_facets
+                if facet_id in catalog
+            ])
             
             # Enviar email de bienvenida
             try:
@@ -599,13 +735,15 @@ def manage_facets(request):
     if request.method == 'POST':
         form = FacetManagementForm(request.user, request.POST)
         
-        # Obtener facetas seleccionadas y sus prioridades
+        # Obtener facetas seleccionadas (solo activas) y sus prioridades
+        catalog = get_catalog()
         selected_facets = {}
         for key, value in request.POST.items():
             if key.startswith('facet_') and value == 'on':
                 facet_id = int(key.replace('facet_', ''))
                 priority = int(request.POST.get(f'priority_{facet_id}', 0))
-                selected_facets[facet_id] = priority
+                if facet_id in catalog:
+                    selected_facets[facet_id] = priority
         
         # Eliminar preferencias de facetas no seleccionadas
         UserFacetPreference.objects.filter(usuario=request.user).exclude(
@@ -625,24 +763,10 @@ def manage_facets(request):
     
     # GET
     form = FacetManagementForm(request.user)
-    # Obtener facetas para el template
-    facets = Facet.objects.filter(activo=True).order_by('orden')
-    user_preferences = {
-        pref.faceta_id: pref.prioridad 
-        for pref in UserFacetPreference.objects.filter(usuario=request.user)
-    }
-    
-    facets_data = []
-    for facet in facets:
-        facets_data.append({
-            'facet': facet,
-            'is_selected': facet.id in user_preferences,
-            'priority': user_preferences.get(facet.id, 0)
-        })
     
     return render(request, 'core/manage_facets.html', {
         'form': form,
-        'facets_data': facets_data,
+        'facets_data': form.facets_list,  # Facetas del catálogo con la selección del usuario
         'site_settings': site_settings,
     })
 
@@ -654,32 +778,202 @@ def material_clase(request):
     """
     Vista para mostrar el material de clase exclusivo para estudiantes.
     """
+    from django.template.loader import render_to_string
+    from .caching import get_or_set, get_version
+    from .offline import MANIFEST_TIMEOUT, NAMESPACE as MATERIAL_NAMESPACE
+    
     site_settings = SiteSettings.load()
-    tematicas = Tematica.objects.filter(activo=True).order_by('orden').prefetch_related(
-        Prefetch(
-            'materiales',
-            queryset=Material.objects.filter(activo=True).order_by('orden').prefetch_related(
-                Prefetch(
-                    'pdfs',
-                    queryset=MaterialPDF.objects.filter(activo=True).order_by('orden')
-                ),
-                Prefetch(
-                    'videos',
-                    queryset=MaterialVideo.objects.filter(activo=True).order_by('orden')
-                ),
-                Prefetch(
-                    'presentaciones',
-                    queryset=MaterialPresentacion.objects.filter(activo=True).order_by('orden')
+    
+    def load_tematicas():
+        return list(Tematica.objects.filter(activo=True).order_by('orden').prefetch_related(
+            Prefetch(
+                'materiales',
+                queryset=Material.objects.filter(activo=True).order_by('orden').prefetch_related(
+                    Prefetch(
+                        'pdfs',
+                        queryset=MaterialPDF.objects.filter(activo=True).order_by('orden')
+                    ),
+                    Prefetch(
+                        'videos',
+                        queryset=MaterialVideo.objects.filter(activo=True).order_by('orden')
+                    ),
+                    Prefetch(
+                        'presentaciones',
+                        queryset=MaterialPresentacion.objects.filter(activo=True).order_by('orden')
+                    )
                 )
             )
+        ))
+    
+    # El árbol es el mismo para todos los estudiantes; se invalida con la versión del material
+    with phase('cache'):
+        tematicas = get_or_set(
+            'material_clase:tematicas', load_tematicas, MANIFEST_TIMEOUT, version=get_version(MATERIAL_NAMESPACE),
         )
-    )
     
     context = {
         'tematicas': tematicas,
         'site_settings': site_settings,
     }
-    return render(request, 'core/material_clase.html', context)
+    if not tematicas:
+        return render(request, 'core/material_clase.html', context)
+    # Cabecera y buscador salen antes; después cada temática según se renderiza
+    sections = (
+        render_to_string('core/includes/tematica_section.html', {'tematica': tematica, 'first': i == 0})
+        for i, tematica in enumerate(tematicas)
+    )
+    return stream_template(request, 'core/material_clase.html', context, sections)
+
+
+@estudiante_required
+def material_clase_search(request):
+    """
+    Búsqueda en temáticas y materiales (títulos, descripciones y nombres de los
+    archivos). Devuelve JSON paginado y ordenado por relevancia.
+    """
+    from django.http import JsonResponse
+    from django.utils.text import Truncator
+    from . import search
+    
+    query = request.GET.get('q', '').strip()[:200]
+    page = search.search(query, request.GET.get('page', 1)) if query else None
+    if page is None:
+        return JsonResponse({'query': query, 'count': 0, 'page': 1, 'num_pages': 0, 'results': []})
+    
+    rows = list(page.object_list)
+    ids = {search.TEMATICA: set(), search.MATERIAL: set()}
+    for row in rows:
+        ids[row['tipo']].add(row['objeto_id'])
+    tematicas = Tematica.objects.in_bulk(ids[search.TEMATICA])
+    materiales = Material.objects.select_related('tematica').in_bulk(ids[search.MATERIAL])
+    
+    base_url = reverse('core:material_clase')
+    results = []
+    for row in rows:
+        if row['tipo'] == search.TEMATICA:
+            obj = tematicas.get(row['objeto_id'])
+            tematica = obj
+            anchor = f'tematica-{row["objeto_id"]}'
+        else:
+            obj = materiales.get(row['objeto_id'])
+            tematica = obj.tematica if obj else None
+            anchor = f'material-{row["objeto_id"]}'
+        if obj is None:
+            continue
+        results.append({
+            'tipo': row['tipo'],
+            'id': obj.pk,
+            'titulo': obj.titulo,
+            'descripcion': Truncator(obj.descripcion).chars(160),
+            'tematica_id': tematica.pk,
+            'tematica_titulo': tematica.titulo,
+            'url': f'{base_url}#{anchor}',
+            'score': row['score'],
+        })
+    
+    return JsonResponse({
+        'query': query,
+        'count': page.paginator.count,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'results': results,
+    })
+
+
+@estudiante_required
+def material_precache_manifest(request):
+    """
+    Manifiesto JSON con las URLs y revisiones de los PDFs y presentaciones activos,
+    consumido por el service worker. El ETag es el hash de la lista de archivos.
+    """
+    from django.http import JsonResponse
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    from .offline import get_manifest
+    
+    manifest = get_manifest()
+    etag = f'"{manifest["version"]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(manifest)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def service_worker(request):
+    """
+    Service worker del material de clase. Se sirve desde la raíz para que su
+    alcance cubra tanto ``/material-clase/`` como ``MEDIA_URL``.
+    """
+    response = render(request, 'core/sw.js', content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _tematica_zip_members(tematica):
+    """Archivos activos (PDFs, presentaciones y videos subidos) de una temática, en orden."""
+    import logging
+    import os
+    from django.utils import timezone
+    from django.utils.text import get_valid_filename
+    from .zipstream import ZipMember
+    
+    materiales = tematica.materiales.filter(activo=True).order_by('orden').prefetch_related(
+        Prefetch('pdfs', queryset=MaterialPDF.objects.filter(activo=True).order_by('orden')),
+        Prefetch('presentaciones', queryset=MaterialPresentacion.objects.filter(activo=True).order_by('orden')),
+        Prefetch('videos', queryset=MaterialVideo.objects.filter(activo=True).exclude(video_archivo='').exclude(video_archivo__isnull=True).order_by('orden')),
+    )
+    members = []
+    used_names = set()
+    for material_index, material in enumerate(materiales, start=1):
+        folder = get_valid_filename(f'{material_index:02d} {material.titulo}')
+        files = (
+            [(pdf.archivo, pdf.nombre or f'PDF {i}') for i, pdf in enumerate(material.pdfs.all(), start=1)]
+            + [(p.archivo, p.nombre or f'Presentación {i}') for i, p in enumerate(material.presentaciones.all(), start=1)]
+            + [(v.video_archivo, v.nombre or f'Video {i}') for i, v in enumerate(material.videos.all(), start=1)]
+        )
+        for field_file, label in files:
+            try:
+                size = field_file.size
+                modified = timezone.localtime(field_file.storage.get_modified_time(field_file.name))
+            except OSError:
+                logging.getLogger(__name__).warning('Archivo de material no encontrado: %s', field_file.name)
+                continue
+            extension = os.path.splitext(field_file.name)[1].lower()
+            arcname = f'{folder}/{get_valid_filename(label)}{extension}'
+            suffix = 2
+            while arcname in used_names:
+                arcname = f'{folder}/{get_valid_filename(label)}_{suffix}{extension}'
+                suffix += 1
+            used_names.add(arcname)
+            members.append(ZipMember(arcname, field_file, size, modified))
+    return members
+
+
+@estudiante_required
+def material_clase_zip(request, tematica_id):
+    """
+    Descarga en un único ZIP todos los archivos activos de una temática.
+    Se genera en streaming (memoria constante) y se puede revalidar por ETag.
+    """
+    from django.http import Http404, StreamingHttpResponse
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    from django.utils.text import slugify
+    from .zipstream import members_etag, stream_zip
+    
+    tematica = get_object_or_404(Tematica, pk=tematica_id, activo=True)
+    members = _tematica_zip_members(tematica)
+    if not members:
+        raise Http404('Esta temática no tiene archivos para descargar.')
+    
+    etag = members_etag(members)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = StreamingHttpResponse(stream_zip(members), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{slugify(tematica.titulo) or "tematica"}.zip"'
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    return response
 
 
 # ==================== STAFF - GESTIÓN DE TEMÁTICAS Y MATERIALES ====================
@@ -1093,3 +1387,41 @@ def staff_user_edit_permissions(request, pk):
         'profile': profile,
         'can_edit_superuser': can_edit_superuser,
     })
+
+
+# ==================== STAFF - PERFILADO BAJO DEMANDA ====================
+
+@staff_required
+def staff_profiles_list(request):
+    """Lista los perfiles capturados y genera enlaces firmados para perfilar una URL."""
+    from .profiling import MODE_PARAM, TOKEN_PARAM, SamplingProfiler, list_profiles, make_token
+    from django.utils.http import url_has_allowed_host_and_scheme
+    
+    profile_url = None
+    target = request.POST.get('path', '/').strip() or '/'
+    if request.method == 'POST':
+        if not target.startswith('/') or not url_has_allowed_host_and_scheme(target, allowed_hosts=None):
+            messages.error(request, 'La ruta debe ser relativa al sitio (ej. /material-clase/).')
+        else:
+            separator = '&' if '?' in target else '?'
+            profile_url = f'{target}{separator}{TOKEN_PARAM}={make_token(request.user)}'
+            if request.POST.get('mode') == 'sample' and SamplingProfiler is not None:
+                profile_url += f'&{MODE_PARAM}=sample'
+    
+    return render(request, 'staff/profiles_list.html', {
+        'profiles': list_profiles(),
+        'profile_url': profile_url,
+        'target': target,
+        'sampling_available': SamplingProfiler is not None,
+    })
+
+@staff_required
+def staff_profile_download(request, profile_id):
+    """Descarga el archivo .prof (o el HTML del perfilador por muestreo) de un perfil."""
+    from django.http import FileResponse, Http404
+    from .profiling import get_profile_file
+    
+    path = get_profile_file(profile_id)
+    if path is None:
+        raise Http404('Perfil no encontrado')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
@@ -0,0 +1,75 @@
+"""
+Generación de archivos ZIP en streaming.
+
+``stream_zip`` escribe el ZIP sobre un buffer no posicionable y va entregando
+los bytes según se producen, de modo que la memoria usada no depende del
+tamaño del archivo. Los formatos que ya vienen comprimidos (PDF, Office,
+imágenes, video...) se guardan sin recomprimir (``ZIP_STORED``).
+"""
+import hashlib
+import io
+import os
+import zipfile
+from collections import namedtuple
+
+CHUNK_SIZE = 64 * 1024
+
+# Extensiones cuyo contenido ya está comprimido: deflate solo gastaría CPU
+STORED_EXTENSIONS = {
+    '.pdf', '.pptx', '.docx', '.xlsx', '.odp', '.odt', '.ods', '.zip', '.gz', '.rar', '.7z',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.webm', '.mov', '.mp3', '.m4a',
+}
+
+# Miembro del ZIP: nombre dentro del archivo y FieldFile de origen
+ZipMember = namedtuple('ZipMember', ['arcname', 'field_file', 'size', 'modified'])
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Buffer de solo escritura y no posicionable: zipfile usa data descriptors."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def members_etag(members):
+    """ETag fuerte derivado del nombre, tamaño y fecha de cada miembro."""
+    digest = hashlib.sha256()
+    for member in members:
+        digest.update(f'{member.arcname}\0{member.field_file.name}\0{member.size}\0{member.modified.timestamp()}\n'.encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def stream_zip(members):
+    """Generador con los bytes del ZIP que contiene ``members``."""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for member in members:
+            info = zipfile.ZipInfo(member.arcname, date_time=member.modified.timetuple()[:6])
+            info.file_size = member.size
+            extension = os.path.splitext(member.arcname)[1].lower()
+            info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            with member.field_file.open('rb') as source, archive.open(info, 'w') as target:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    yield buffer.drain()
@@ -0,0 +1,150 @@
+// Service worker del material de clase.
+//
+// - Los PDFs y presentaciones del manifiesto se sirven desde caché (cache-first)
+//   y solo se vuelven a descargar cuando cambia su revisión.
+// - La página de material se sirve de red y, sin conexión, desde la última copia.
+// - El resto de peticiones no se intercepta.
+const FILES_CACHE = 'material-files-v1';
+const PAGES_CACHE = 'material-pages-v1';
+const MANIFEST_URL = new URL('{% url "core:material_precache" %}', self.location).href;
+const MATERIAL_PAGE_URL = new URL('{% url "core:material_clase" %}', self.location).href;
+const REVISION_HEADER = 'X-Precache-Revision';
+const MEDIA_PATH = '{{ MEDIA_URL }}';
+// Solo se interceptan los tipos de archivo que puede listar el manifiesto
+const MATERIAL_FILE_RE = /\.(pdf|pptx?|odp|key)$/i;
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const keep = [FILES_CACHE, PAGES_CACHE];
+        for (const key of await caches.keys()) {
+            if (!keep.includes(key)) {
+                await caches.delete(key);
+            }
+        }
+        await self.clients.claim();
+    })());
+});
+
+// Último manifiesto conocido como Map url -> revisión (se guarda en PAGES_CACHE
+// porque el service worker puede reiniciarse en cualquier momento)
+async function loadManifest() {
+    const cached = await (await caches.open(PAGES_CACHE)).match(MANIFEST_URL);
+    if (!cached) {
+        return new Map();
+    }
+    const manifest = await cached.json();
+    return new Map(manifest.files.map(file => [new URL(file.url, self.location).href, file.revision]));
+}
+
+// Guarda la respuesta marcada con su revisión (consume `response`)
+function store(cache, url, revision, response) {
+    const headers = new Headers(response.headers);
+    headers.set(REVISION_HEADER, revision);
+    return cache.put(url, new Response(response.body, {
+        status: response.status,
+        statusText: response.statusText,
+        headers,
+    }));
+}
+
+function isStorable(response) {
+    return response.status === 200 && !response.redirected;
+}
+
+// Sincroniza la caché con el manifiesto: borra lo obsoleto y, si `precacheAll`,
+// descarga de uno en uno los archivos que falten para no saturar la conexión
+async function syncMaterial(precacheAll) {
+    const pages = await caches.open(PAGES_CACHE);
+    const previous = await pages.match(MANIFEST_URL);
+    const headers = previous ? { 'If-None-Match': previous.headers.get('ETag') || '' } : {};
+    const response = await fetch(MANIFEST_URL, { credentials: 'same-origin', cache: 'no-store', headers });
+    if (response.status === 200 && !response.redirected) {
+        await pages.put(MANIFEST_URL, response);
+    } else if (response.status !== 304) {
+        return;
+    }
+
+    const wanted = await loadManifest();
+    const files = await caches.open(FILES_CACHE);
+    for (const request of await files.keys()) {
+        const cached = await files.match(request);
+        if (!wanted.has(request.url) || cached.headers.get(REVISION_HEADER) !== wanted.get(request.url)) {
+            await files.delete(request);
+        }
+    }
+    if (!precacheAll) {
+        return;
+    }
+    for (const [url, revision] of wanted) {
+        if (await files.match(url)) {
+            continue;
+        }
+        try {
+            const response = await fetch(url, { credentials: 'same-origin' });
+            if (isStorable(response)) {
+                await store(files, url, revision, response);
+            }
+        } catch (error) {
+            return; // Sin conexión: se reintentará en la próxima visita
+        }
+    }
+}
+
+async function serveFile(event) {
+    const request = event.request;
+    const files = await caches.open(FILES_CACHE);
+    const cached = await files.match(request.url);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    const revision = (await loadManifest()).get(request.url);
+    // Las peticiones Range devuelven 206, que no se puede guardar en caché
+    if (revision !== undefined && !request.headers.has('Range') && isStorable(response)) {
+        // Se guarda en segundo plano para no retrasar la respuesta hasta el último byte
+        event.waitUntil(store(files, request.url, revision, response.clone()));
+    }
+    return response;
+}
+
+async function servePage(request) {
+    const pages = await caches.open(PAGES_CACHE);
+    try {
+        const response = await fetch(request);
+        if (isStorable(response)) {
+            await pages.put(MATERIAL_PAGE_URL, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await pages.match(MATERIAL_PAGE_URL);
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    url.hash = '';
+    if (request.mode === 'navigate' && url.origin === self.location.origin && url.pathname === new URL(MATERIAL_PAGE_URL).pathname) {
+        event.respondWith(servePage(request));
+    } else if (url.origin === self.location.origin && url.pathname.startsWith(MEDIA_PATH) && MATERIAL_FILE_RE.test(url.pathname)) {
+        event.respondWith(serveFile(event));
+    }
+});
+
+self.addEventListener('message', event => {
+    const data = event.data || {};
+    if (data.type === 'sync-material') {
+        event.waitUntil(syncMaterial(Boolean(data.precache)));
+    } else if (data.type === 'clear-material') {
+        event.waitUntil(Promise.all([caches.delete(FILES_CACHE), caches.delete(PAGES_CACHE)]));
+    }
+});